@@ -32,8 +32,8 @@ DB_HOST = os.getenv("DB_HOST", "localhost")
 DB_PORT = os.getenv("DB_PORT", "5432")
 DB_NAME = os.getenv("DB_NAME", "deribit_prices")
 
-# Формируем строку подключения БЕЗ пароля в коде
-DATABASE_URL = (
+# Формируем строку подключения БЕЗ пароля в коде; миграции — только на основной БД
+DATABASE_URL = os.getenv("DB_PRIMARY_URL") or (
     f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
 )
 
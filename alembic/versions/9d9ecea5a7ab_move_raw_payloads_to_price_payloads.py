@@ -0,0 +1,142 @@
+"""Move raw payloads to price_payloads
+
+Revision ID: 9d9ecea5a7ab
+Revises: afffabf853c6
+Create Date: 2026-10-17 16:02:19.547120
+
+"""
+
+import zlib
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import context, op
+
+# revision identifiers, used by Alembic.
+revision: str = "9d9ecea5a7ab"
+down_revision: Union[str, None] = "afffabf853c6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BATCH_SIZE = 5000
+
+
+def _require_online(action: str) -> None:
+    if context.is_offline_mode():
+        raise RuntimeError(f"{action} needs an online migration (without --sql)")
+
+
+def upgrade() -> None:
+    _require_online("Payload backfill")
+
+    op.add_column("prices", sa.Column("base_volume", sa.Float(), nullable=True))
+    op.add_column("prices", sa.Column("price_change", sa.Float(), nullable=True))
+
+    op.execute(
+        """
+        CREATE TABLE price_payloads (
+            price_id INTEGER NOT NULL,
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL,
+            payload BYTEA NOT NULL,
+            CONSTRAINT price_payloads_pkey PRIMARY KEY (price_id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    # Те же дневные диапазоны, что у prices: партиции удаляются вместе
+    op.execute(
+        """
+        DO $$
+        DECLARE
+            part RECORD;
+        BEGIN
+            FOR part IN
+                SELECT c.relname, pg_get_expr(c.relpartbound, c.oid) AS bound
+                FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+                WHERE i.inhparent = 'prices'::regclass
+            LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF price_payloads %s',
+                    regexp_replace(part.relname, '^prices_', 'price_payloads_'),
+                    part.bound
+                );
+            END LOOP;
+        END $$
+        """
+    )
+
+    # Поля, которые читает API, переезжают в колонки
+    op.execute(
+        """
+        UPDATE prices SET
+            base_volume = (additional_data -> 'stats' ->> 'volume')::double precision,
+            price_change =
+                (additional_data -> 'stats' ->> 'price_change')::double precision
+        WHERE additional_data IS NOT NULL
+        """
+    )
+
+    # Полный ответ — сжатым в price_payloads
+    connection = op.get_bind()
+    rows = connection.execution_options(stream_results=True).execute(
+        sa.text(
+            'SELECT id, "timestamp", additional_data::text FROM prices '
+            "WHERE additional_data IS NOT NULL"
+        )
+    )
+    insert_payload = sa.text(
+        'INSERT INTO price_payloads (price_id, "timestamp", payload) '
+        "VALUES (:price_id, :timestamp, :payload)"
+    )
+    while True:
+        chunk = rows.fetchmany(BATCH_SIZE)
+        if not chunk:
+            break
+        connection.execute(
+            insert_payload,
+            [
+                {
+                    "price_id": price_id,
+                    "timestamp": timestamp,
+                    "payload": zlib.compress(data.encode(), 6),
+                }
+                for price_id, timestamp, data in chunk
+            ],
+        )
+
+    op.drop_column("prices", "additional_data")
+
+
+def downgrade() -> None:
+    _require_online("Payload restore")
+
+    op.add_column("prices", sa.Column("additional_data", sa.JSON(), nullable=True))
+
+    connection = op.get_bind()
+    rows = connection.execution_options(stream_results=True).execute(
+        sa.text('SELECT price_id, "timestamp", payload FROM price_payloads')
+    )
+    restore_payload = sa.text(
+        "UPDATE prices SET additional_data = CAST(:data AS json) "
+        'WHERE id = :price_id AND "timestamp" = :timestamp'
+    )
+    while True:
+        chunk = rows.fetchmany(BATCH_SIZE)
+        if not chunk:
+            break
+        connection.execute(
+            restore_payload,
+            [
+                {
+                    "price_id": price_id,
+                    "timestamp": timestamp,
+                    "data": zlib.decompress(payload).decode(),
+                }
+                for price_id, timestamp, payload in chunk
+            ],
+        )
+
+    # Вместе с родительской таблицей удаляются все партиции
+    op.drop_table("price_payloads")
+    op.drop_column("prices", "price_change")
+    op.drop_column("prices", "base_volume")
@@ -0,0 +1,134 @@
+"""Partition prices by day
+
+Revision ID: afffabf853c6
+Revises: 4b0dbb320af6
+Create Date: 2026-10-17 15:10:42.118305
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "afffabf853c6"
+down_revision: Union[str, None] = "4b0dbb320af6"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+# Сколько дней вперед создать партиций сразу (дальше — задача обслуживания)
+PREMAKE_DAYS = 7
+
+COLUMNS = (
+    'id, instrument_name, price, "timestamp", source, mark_iv, volume, '
+    "additional_data"
+)
+
+
+def upgrade() -> None:
+    # Старая таблица уходит под другим именем; ее индексы не нужны
+    op.execute("ALTER TABLE prices RENAME TO prices_legacy")
+    op.execute(
+        "ALTER TABLE prices_legacy RENAME CONSTRAINT prices_pkey TO prices_legacy_pkey"
+    )
+    op.drop_index("ix_prices_instrument_name", table_name="prices_legacy")
+    op.drop_index("ix_prices_id", table_name="prices_legacy")
+    op.drop_index("idx_timestamp", table_name="prices_legacy")
+    op.drop_index("idx_instrument_timestamp", table_name="prices_legacy")
+
+    # Последовательность id переходит к новой таблице
+    op.execute("ALTER SEQUENCE prices_id_seq OWNED BY NONE")
+
+    # Первичный ключ партиционированной таблицы обязан включать ключ партиции
+    op.execute(
+        """
+        CREATE TABLE prices (
+            id INTEGER NOT NULL DEFAULT nextval('prices_id_seq'),
+            instrument_name VARCHAR(100) NOT NULL,
+            price DOUBLE PRECISION NOT NULL,
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            source VARCHAR(50),
+            mark_iv DOUBLE PRECISION,
+            volume DOUBLE PRECISION,
+            additional_data JSON,
+            CONSTRAINT prices_pkey PRIMARY KEY (id, "timestamp")
+        ) PARTITION BY RANGE ("timestamp")
+        """
+    )
+    op.create_index(
+        "idx_instrument_timestamp", "prices", ["instrument_name", "timestamp"]
+    )
+    op.create_index("idx_timestamp", "prices", ["timestamp"])
+    op.execute("CREATE TABLE prices_default PARTITION OF prices DEFAULT")
+
+    # Партиции на каждый день от первой записи до PREMAKE_DAYS дней вперед
+    op.execute(
+        f"""
+        DO $$
+        DECLARE
+            part_day DATE;
+            last_day DATE := (now() AT TIME ZONE 'UTC')::date + {PREMAKE_DAYS};
+        BEGIN
+            SELECT coalesce(
+                min(("timestamp" AT TIME ZONE 'UTC')::date),
+                (now() AT TIME ZONE 'UTC')::date
+            ) INTO part_day FROM prices_legacy;
+
+            WHILE part_day <= last_day LOOP
+                EXECUTE format(
+                    'CREATE TABLE %I PARTITION OF prices FOR VALUES FROM (%L) TO (%L)',
+                    'prices_p' || to_char(part_day, 'YYYYMMDD'),
+                    part_day::text || ' 00:00:00+00',
+                    (part_day + 1)::text || ' 00:00:00+00'
+                );
+                part_day := part_day + 1;
+            END LOOP;
+        END $$
+        """
+    )
+
+    op.execute(
+        f"INSERT INTO prices ({COLUMNS}) SELECT {COLUMNS} FROM prices_legacy"
+    )
+    op.execute("DROP TABLE prices_legacy")
+    op.execute("ALTER SEQUENCE prices_id_seq OWNED BY prices.id")
+
+
+def downgrade() -> None:
+    op.execute("ALTER SEQUENCE prices_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE prices RENAME TO prices_partitioned")
+    op.execute(
+        "ALTER TABLE prices_partitioned "
+        "RENAME CONSTRAINT prices_pkey TO prices_partitioned_pkey"
+    )
+    op.drop_index("idx_timestamp", table_name="prices_partitioned")
+    op.drop_index("idx_instrument_timestamp", table_name="prices_partitioned")
+
+    op.execute(
+        """
+        CREATE TABLE prices (
+            id INTEGER NOT NULL DEFAULT nextval('prices_id_seq'),
+            instrument_name VARCHAR(100) NOT NULL,
+            price DOUBLE PRECISION NOT NULL,
+            "timestamp" TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+            source VARCHAR(50),
+            mark_iv DOUBLE PRECISION,
+            volume DOUBLE PRECISION,
+            additional_data JSON,
+            CONSTRAINT prices_pkey PRIMARY KEY (id)
+        )
+        """
+    )
+    op.execute(
+        f"INSERT INTO prices ({COLUMNS}) SELECT {COLUMNS} FROM prices_partitioned"
+    )
+    # Вместе с родительской таблицей удаляются все партиции
+    op.execute("DROP TABLE prices_partitioned")
+    op.execute("ALTER SEQUENCE prices_id_seq OWNED BY prices.id")
+
+    op.create_index(
+        "idx_instrument_timestamp", "prices", ["instrument_name", "timestamp"]
+    )
+    op.create_index("idx_timestamp", "prices", ["timestamp"])
+    op.create_index("ix_prices_id", "prices", ["id"])
+    op.create_index("ix_prices_instrument_name", "prices", ["instrument_name"])
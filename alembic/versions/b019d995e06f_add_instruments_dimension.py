@@ -0,0 +1,109 @@
+"""Add instruments dimension
+
+Revision ID: b019d995e06f
+Revises: 9d9ecea5a7ab
+Create Date: 2026-10-17 16:48:05.630912
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "b019d995e06f"
+down_revision: Union[str, None] = "9d9ecea5a7ab"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "instruments",
+        sa.Column("id", sa.Integer(), nullable=False),
+        sa.Column("name", sa.String(length=100), nullable=False),
+        sa.Column("kind", sa.String(length=20), nullable=True),
+        sa.Column("currency", sa.String(length=10), nullable=True),
+        sa.Column("expiry", sa.DateTime(timezone=True), nullable=True),
+        sa.Column("strike", sa.Float(), nullable=True),
+        sa.Column(
+            "source",
+            sa.String(length=50),
+            server_default="deribit",
+            nullable=False,
+        ),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("name"),
+    )
+
+    # Справочник из уже собранных имен; вид, валюта, экспирация и страйк —
+    # по правилам именования Deribit (BTC-27DEC26-100000-C, BTC-PERPETUAL, btc_usd)
+    op.execute(
+        """
+        INSERT INTO instruments (name, kind, currency, expiry, strike, source)
+        SELECT
+            name,
+            CASE
+                WHEN name ~ '-[CP]$' THEN 'option'
+                WHEN name LIKE '%-%' THEN 'future'
+                WHEN name = lower(name) THEN 'index'
+                ELSE 'spot'
+            END,
+            upper(split_part(split_part(name, '-', 1), '_', 1)),
+            CASE
+                WHEN split_part(name, '-', 2) ~ '^[0-9]{1,2}[A-Z]{3}[0-9]{2}$'
+                THEN to_timestamp(split_part(name, '-', 2) || ' 08', 'DDMONYY HH24')
+                    ::timestamp AT TIME ZONE 'UTC'
+            END,
+            CASE
+                WHEN name ~ '-[CP]$'
+                THEN replace(split_part(name, '-', 3), 'd', '.')::double precision
+            END,
+            source
+        FROM (
+            SELECT instrument_name AS name, coalesce(min(source), 'deribit') AS source
+            FROM prices
+            GROUP BY instrument_name
+        ) AS names
+        """
+    )
+
+    op.add_column("prices", sa.Column("instrument_id", sa.Integer(), nullable=True))
+    op.execute(
+        "UPDATE prices SET instrument_id = instruments.id "
+        "FROM instruments WHERE instruments.name = prices.instrument_name"
+    )
+    op.alter_column("prices", "instrument_id", nullable=False)
+    op.create_foreign_key(
+        "prices_instrument_id_fkey", "prices", "instruments", ["instrument_id"], ["id"]
+    )
+
+    op.drop_index("idx_instrument_timestamp", table_name="prices")
+    op.create_index(
+        "idx_instrument_timestamp", "prices", ["instrument_id", "timestamp"]
+    )
+    op.drop_column("prices", "instrument_name")
+    op.drop_column("prices", "source")
+
+
+def downgrade() -> None:
+    op.add_column(
+        "prices", sa.Column("instrument_name", sa.String(length=100), nullable=True)
+    )
+    op.add_column("prices", sa.Column("source", sa.String(length=50), nullable=True))
+    op.execute(
+        "UPDATE prices SET instrument_name = instruments.name, "
+        "source = instruments.source "
+        "FROM instruments WHERE instruments.id = prices.instrument_id"
+    )
+    op.alter_column("prices", "instrument_name", nullable=False)
+
+    op.drop_index("idx_instrument_timestamp", table_name="prices")
+    op.create_index(
+        "idx_instrument_timestamp", "prices", ["instrument_name", "timestamp"]
+    )
+    op.drop_constraint("prices_instrument_id_fkey", "prices", type_="foreignkey")
+    op.drop_column("prices", "instrument_id")
+    op.drop_table("instruments")
@@ -0,0 +1,51 @@
+"""Unique instrument and exchange timestamp
+
+Revision ID: c41e7a2d9b53
+Revises: b019d995e06f
+Create Date: 2026-10-17 17:20:41.802264
+
+"""
+
+from typing import Sequence, Union
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "c41e7a2d9b53"
+down_revision: Union[str, None] = "b019d995e06f"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # Из повторов оставляем строку с меньшим id, вместе с ней — ее payload
+    op.execute(
+        """
+        WITH duplicates AS (
+            DELETE FROM prices p
+            USING prices keep
+            WHERE p.instrument_id = keep.instrument_id
+              AND p."timestamp" = keep."timestamp"
+              AND p.id > keep.id
+            RETURNING p.id, p."timestamp"
+        )
+        DELETE FROM price_payloads pp
+        USING duplicates d
+        WHERE pp.price_id = d.id AND pp."timestamp" = d."timestamp"
+        """
+    )
+
+    op.drop_index("idx_instrument_timestamp", table_name="prices")
+    op.create_index(
+        "idx_instrument_timestamp",
+        "prices",
+        ["instrument_id", "timestamp"],
+        unique=True,
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("idx_instrument_timestamp", table_name="prices")
+    op.create_index(
+        "idx_instrument_timestamp", "prices", ["instrument_id", "timestamp"]
+    )
@@ -0,0 +1,73 @@
+"""Add price candles
+
+Revision ID: d7f3a9c1e284
+Revises: c41e7a2d9b53
+Create Date: 2026-10-17 18:05:12.417530
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "d7f3a9c1e284"
+down_revision: Union[str, None] = "c41e7a2d9b53"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "price_candles",
+        sa.Column("instrument_id", sa.Integer(), nullable=False),
+        sa.Column("resolution", sa.String(length=3), nullable=False),
+        sa.Column("bucket", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("open", sa.Float(), nullable=False),
+        sa.Column("high", sa.Float(), nullable=False),
+        sa.Column("low", sa.Float(), nullable=False),
+        sa.Column("close", sa.Float(), nullable=False),
+        sa.Column("volume", sa.Float(), nullable=True),
+        sa.Column("ticks", sa.Integer(), nullable=False),
+        sa.Column("price_sum", sa.Float(), nullable=False),
+        sa.Column("open_time", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("close_time", sa.DateTime(timezone=True), nullable=False),
+        sa.ForeignKeyConstraint(["instrument_id"], ["instruments.id"]),
+        sa.PrimaryKeyConstraint("instrument_id", "resolution", "bucket"),
+    )
+
+    # Свечи по уже собранным тикам; дальше их ведет запись тиков
+    op.execute(
+        """
+        INSERT INTO price_candles (
+            instrument_id, resolution, bucket, open, high, low, close,
+            volume, ticks, price_sum, open_time, close_time
+        )
+        SELECT
+            p.instrument_id,
+            r.resolution,
+            to_timestamp(
+                floor(extract(epoch FROM p."timestamp") / r.seconds) * r.seconds
+            ),
+            (array_agg(p.price ORDER BY p."timestamp"))[1],
+            max(p.price),
+            min(p.price),
+            (array_agg(p.price ORDER BY p."timestamp" DESC))[1],
+            (array_agg(p.volume ORDER BY p."timestamp" DESC))[1],
+            count(*),
+            sum(p.price),
+            min(p."timestamp"),
+            max(p."timestamp")
+        FROM prices p
+        CROSS JOIN (
+            VALUES ('1m', 60), ('5m', 300), ('1h', 3600), ('1d', 86400)
+        ) AS r (resolution, seconds)
+        GROUP BY 1, 2, 3
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("price_candles")
@@ -0,0 +1,60 @@
+"""Add instrument stats
+
+Revision ID: e5b8c2f4a716
+Revises: d7f3a9c1e284
+Create Date: 2026-10-17 21:40:37.208164
+
+"""
+
+from typing import Sequence, Union
+
+import sqlalchemy as sa
+
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision: str = "e5b8c2f4a716"
+down_revision: Union[str, None] = "d7f3a9c1e284"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "instrument_stats",
+        sa.Column("instrument_id", sa.Integer(), nullable=False),
+        sa.Column("ticks", sa.BigInteger(), nullable=False),
+        sa.Column("first_timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("last_timestamp", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("min_price", sa.Float(), nullable=False),
+        sa.Column("max_price", sa.Float(), nullable=False),
+        sa.Column("last_price", sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(["instrument_id"], ["instruments.id"]),
+        sa.PrimaryKeyConstraint("instrument_id"),
+    )
+
+    # Начальные значения из дневных свечей (в них есть и архивные дни);
+    # дальше счетчики ведет запись тиков
+    op.execute(
+        """
+        INSERT INTO instrument_stats (
+            instrument_id, ticks, first_timestamp, last_timestamp,
+            min_price, max_price, last_price
+        )
+        SELECT
+            instrument_id,
+            sum(ticks),
+            min(open_time),
+            max(close_time),
+            min(low),
+            max(high),
+            (array_agg(close ORDER BY bucket DESC))[1]
+        FROM price_candles
+        WHERE resolution = '1d'
+        GROUP BY instrument_id
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("instrument_stats")
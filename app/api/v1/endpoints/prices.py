@@ -1,49 +1,185 @@
+from datetime import datetime, timezone
 from typing import List, Optional
 
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.db.session import get_db
-from app.schemas.price import PriceTick
-from app.services.price_service import PriceService
+from app.core.config import split_csv
+from app.db.session import get_read_db, read_session
+from app.schemas.price import Bar, Candle, LatestPriceTick, PriceTick
+from app.services.arrow_ipc import (
+    ARROW_MEDIA_TYPE,
+    arrow_available,
+    ticks_to_ipc,
+    wants_arrow,
+)
+from app.services.candles import CANDLE_RESOLUTIONS
+from app.services.pagination import decode_cursor
+from app.services.price_export import EXPORT_MEDIA_TYPES, stream_prices
+from app.services.price_service import SNAPSHOT_MAX_TICKERS, AsyncPriceService
 
 router = APIRouter()
 
 
 @router.get("/all", response_model=List[PriceTick])
-def get_all_prices(
-    ticker: str = Query(..., description="Тикер валюты (например, btc_usd)"),
+async def get_all_prices(
+    request: Request,
+    response: Response,
+    ticker: str = Query(..., description="Инструмент (например, BTC-PERPETUAL)"),
+    cursor: Optional[str] = Query(
+        None, description="Курсор из заголовка X-Next-Cursor или X-Prev-Cursor"
+    ),
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=1000),
-    db: Session = Depends(get_db),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Получение всех сохраненных данных по указанной валюте."""
-    service = PriceService(db)
-    return service.get_prices_by_ticker(ticker, skip=skip, limit=limit)
+    """Получение всех сохраненных данных по указанной валюте.
+
+    Страницы от новых к старым; курсоры соседних страниц — в заголовках
+    X-Next-Cursor (старше) и X-Prev-Cursor (новее). Дни старше самой
+    старой партиции дочитываются из архива Parquet. С Accept:
+    application/vnd.apache.arrow.stream ответ — Arrow IPC.
+    """
+    try:
+        page_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    service = AsyncPriceService(db)
+    page = await service.get_prices_page(
+        ticker,
+        cursor=page_cursor,
+        skip=skip,
+        limit=limit,
+        date_from=date_from,
+        date_to=date_to,
+    )
+    if wants_arrow(request.headers.get("accept")):
+        return Response(
+            ticks_to_ipc(page.items, ticker),
+            media_type=ARROW_MEDIA_TYPE,
+            headers=page.headers(),
+        )
+    response.headers.update(page.headers())
+    return page.items
 
-@router.get("/latest", response_model=PriceTick)
-def get_latest_price(
-    ticker: str = Query(..., description="Тикер валюты (например, btc_usd)"),
-    db: Session = Depends(get_db),
+
+@router.get("/latest", response_model=LatestPriceTick)
+async def get_latest_price(
+    ticker: str = Query(..., description="Инструмент (например, BTC-PERPETUAL)"),
+    db: AsyncSession = Depends(get_read_db),
 ):
     """Получение последней цены валюты."""
-    service = PriceService(db)
-    price = service.get_latest_price(ticker)
+    service = AsyncPriceService(db)
+    price = await service.get_latest_price(ticker)
     if not price:
         raise HTTPException(status_code=404, detail="Price not found for this ticker")
     return price
 
 
+@router.get("/snapshot", response_model=List[LatestPriceTick])
+async def get_snapshot(
+    tickers: Optional[str] = Query(
+        None, description="Инструменты через запятую; без параметра — все"
+    ),
+    at: Optional[int] = Query(
+        None, description="Цены на момент (UNIX timestamp); без параметра — последние"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Последние цены (или цены на момент at) списка инструментов за один запрос."""
+    names = split_csv(tickers) if tickers is not None else None
+    if names is not None and len(names) > SNAPSHOT_MAX_TICKERS:
+        raise HTTPException(status_code=400, detail="Too many tickers")
+    service = AsyncPriceService(db)
+    return await service.get_snapshot(names, at=at)
+
+
 @router.get("/by_date", response_model=List[PriceTick])
-def get_price_by_date(
-    ticker: str = Query(..., description="Тикер валюты (например, btc_usd)"),
+async def get_price_by_date(
+    request: Request,
+    ticker: str = Query(..., description="Инструмент (например, BTC-PERPETUAL)"),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    fmt: str = Query(
+        "json",
+        alias="format",
+        description="json — список; ndjson, csv или arrow — потоковая выгрузка",
+    ),
+):
+    """Получение цены валюты с фильтром по дате.
+
+    ndjson, csv и arrow отдаются потоком от старых тиков к новым с
+    ограниченной памятью при любом диапазоне дат. Accept:
+    application/vnd.apache.arrow.stream без format — тоже поток Arrow.
+    Поток открывает свою сессию, поэтому сессия зависимости здесь не берется.
+    """
+    if fmt == "json" and wants_arrow(request.headers.get("accept")):
+        fmt = "arrow"
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow format requires pyarrow")
+    if fmt in EXPORT_MEDIA_TYPES:
+        start, end = (
+            None if value is None else datetime.fromtimestamp(value, tz=timezone.utc)
+            for value in (date_from, date_to)
+        )
+        return StreamingResponse(
+            stream_prices(read_session, ticker, start, end, fmt),
+            media_type=EXPORT_MEDIA_TYPES[fmt],
+        )
+    if fmt != "json":
+        raise HTTPException(status_code=400, detail="Unknown format")
+
+    async with read_session() as db:
+        service = AsyncPriceService(db)
+        return await service.get_price_by_date(
+            ticker, date_from=date_from, date_to=date_to
+        )
+
+
+@router.get("/candles", response_model=List[Candle])
+async def get_candles(
+    ticker: str = Query(..., description="Инструмент (например, BTC-PERPETUAL)"),
+    resolution: str = Query("1h", description="Длительность свечи: 1m, 5m, 1h, 1d"),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Свечи OHLCV по инструменту."""
+    if resolution not in CANDLE_RESOLUTIONS:
+        raise HTTPException(status_code=400, detail="Unknown candle resolution")
+    service = AsyncPriceService(db)
+    return await service.get_candles(
+        ticker, resolution, date_from=date_from, date_to=date_to, limit=limit
+    )
+
+
+@router.get("/resample", response_model=List[Bar])
+async def get_resampled(
+    ticker: str = Query(..., description="Инструмент (например, BTC-PERPETUAL)"),
+    bucket: str = Query("1m", description="Ширина интервала: 15s, 5m, 4h, 1d"),
     date_from: Optional[int] = Query(
         None, description="Начальная дата (UNIX timestamp)"
     ),
     date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Получение цены валюты с фильтром по дате."""
-    service = PriceService(db)
-    return service.get_price_by_date(ticker, date_from=date_from, date_to=date_to)
+    """OHLC, средняя цена и число тиков по интервалам произвольной ширины."""
+    service = AsyncPriceService(db)
+    try:
+        bars, _ = await service.get_resampled(
+            ticker, bucket, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return bars
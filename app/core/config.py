@@ -1,4 +1,5 @@
 import os
+from typing import List
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -6,6 +7,17 @@ from pydantic_settings import BaseSettings
 load_dotenv()
 
 
+def split_csv(value: str) -> List[str]:
+    """Разбор списка через запятую из переменной окружения"""
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def to_async_url(url: str) -> str:
+    """URL PostgreSQL для драйвера asyncpg"""
+    scheme, _, rest = url.partition("://")
+    return f"postgresql+asyncpg://{rest}" if scheme.startswith("postgresql") else url
+
+
 class Settings(BaseSettings):
     """Настройки приложения"""
 
@@ -16,6 +28,23 @@ class Settings(BaseSettings):
     DB_USER: str = os.getenv("DB_USER", "user")
     DB_PASS: str = os.getenv("DB_PASS", "password")
 
+    # Пул соединений (синхронный и асинхронный движки)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", "10"))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # секунд
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+
+    # Основная БД целиком (иначе собирается из DB_HOST/DB_PORT/...): все записи
+    DB_PRIMARY_URL: str = os.getenv("DB_PRIMARY_URL", "")
+    # Реплики для чтения в API через запятую (пусто — читать с основной)
+    DB_REPLICA_URLS: str = os.getenv("DB_REPLICA_URLS", "")
+    # Реплика с отставанием больше порога пропускается, секунд
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", "5"))
+    # Как часто перепроверять отставание реплики, секунд
+    DB_REPLICA_CHECK_INTERVAL: float = float(
+        os.getenv("DB_REPLICA_CHECK_INTERVAL", "5")
+    )
+
     # Redis для Celery (из вашего .env)
     REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
     CELERY_BROKER_URL: str = os.getenv("CELERY_BROKER_URL", REDIS_URL)
@@ -25,12 +54,135 @@ class Settings(BaseSettings):
     DERIBIT_CLIENT_ID: str = os.getenv("DERIBIT_CLIENT_ID", "")
     DERIBIT_CLIENT_SECRET: str = os.getenv("DERIBIT_CLIENT_SECRET", "")
     DERIBIT_BASE_URL: str = "https://test.deribit.com/api/v2"
+    DERIBIT_WS_URL: str = os.getenv("DERIBIT_WS_URL", "wss://test.deribit.com/ws/api/v2")
+
+    # Потоковый сбор через WebSocket
+    # Инструменты через запятую, интервал канала ticker: 100ms / raw / agg2
+    STREAM_INSTRUMENTS: str = os.getenv(
+        "STREAM_INSTRUMENTS", "BTC-PERPETUAL,ETH-PERPETUAL"
+    )
+    STREAM_TICKER_INTERVAL: str = os.getenv("STREAM_TICKER_INTERVAL", "100ms")
+    STREAM_HEARTBEAT_INTERVAL: int = int(os.getenv("STREAM_HEARTBEAT_INTERVAL", "30"))
+    STREAM_MAX_RECONNECT_DELAY: float = float(
+        os.getenv("STREAM_MAX_RECONNECT_DELAY", "30")
+    )
+
+    # Дедлайны и повторы запросов тикеров
+    # Бюджет цикла меньше expires задачи в расписании (25s)
+    DERIBIT_REQUEST_TIMEOUT: float = float(os.getenv("DERIBIT_REQUEST_TIMEOUT", "5"))
+    DERIBIT_MAX_RETRIES: int = int(os.getenv("DERIBIT_MAX_RETRIES", "2"))
+    DERIBIT_RETRY_BACKOFF: float = float(os.getenv("DERIBIT_RETRY_BACKOFF", "0.25"))
+    DERIBIT_CYCLE_BUDGET: float = float(os.getenv("DERIBIT_CYCLE_BUDGET", "20"))
+
+    # Лимиты Deribit в кредитах: запрос стоит 500, пополнение 10000/с, запас 50000
+    # (20 запросов/с в среднем, всплеск до 100)
+    DERIBIT_RATE_CREDITS_PER_SEC: float = float(
+        os.getenv("DERIBIT_RATE_CREDITS_PER_SEC", "10000")
+    )
+    DERIBIT_RATE_MAX_CREDITS: float = float(
+        os.getenv("DERIBIT_RATE_MAX_CREDITS", "50000")
+    )
+    DERIBIT_REQUEST_COST: float = float(os.getenv("DERIBIT_REQUEST_COST", "500"))
+    DERIBIT_MAX_IN_FLIGHT: int = int(os.getenv("DERIBIT_MAX_IN_FLIGHT", "10"))
+    # Лимиты после авторизации (зависят от уровня аккаунта)
+    DERIBIT_AUTH_RATE_CREDITS_PER_SEC: float = float(
+        os.getenv("DERIBIT_AUTH_RATE_CREDITS_PER_SEC", "20000")
+    )
+    DERIBIT_AUTH_RATE_MAX_CREDITS: float = float(
+        os.getenv("DERIBIT_AUTH_RATE_MAX_CREDITS", "100000")
+    )
+
+    # Долгоживущий коллектор (app.worker.collector)
+    COLLECTOR_INSTRUMENTS: str = os.getenv(
+        "COLLECTOR_INSTRUMENTS", "BTC-PERPETUAL,ETH-PERPETUAL"
+    )
+    COLLECTOR_INTERVAL: float = float(os.getenv("COLLECTOR_INTERVAL", "30"))
+    # Запускать коллектор внутри Celery worker вместо задачи по расписанию
+    COLLECTOR_IN_WORKER: bool = (
+        os.getenv("COLLECTOR_IN_WORKER", "false").lower() == "true"
+    )
+    # keep-alive должен быть дольше интервала, иначе соединение закрывается между циклами
+    DERIBIT_KEEPALIVE_TIMEOUT: float = float(
+        os.getenv("DERIBIT_KEEPALIVE_TIMEOUT", "75")
+    )
+
+    # Буфер записи тиков в БД (коллектор и поток)
+    TICK_BUFFER_MAX_BATCH: int = int(os.getenv("TICK_BUFFER_MAX_BATCH", "1000"))
+    TICK_BUFFER_MAX_LATENCY: float = float(os.getenv("TICK_BUFFER_MAX_LATENCY", "1"))
+    TICK_BUFFER_MAX_PENDING: int = int(os.getenv("TICK_BUFFER_MAX_PENDING", "50000"))
+    TICK_BUFFER_SPILL_PATH: str = os.getenv(
+        "TICK_BUFFER_SPILL_PATH", "spill/prices.jsonl"
+    )
+    TICK_BUFFER_RETRY_INTERVAL: float = float(
+        os.getenv("TICK_BUFFER_RETRY_INTERVAL", "5")
+    )
+
+    # Сжатое хранилище тиков в памяти процесса (app/services/tick_store.py)
+    TICK_STORE_ENABLED: bool = os.getenv("TICK_STORE_ENABLED", "false").lower() == "true"
+    TICK_STORE_BLOCK_SIZE: int = int(os.getenv("TICK_STORE_BLOCK_SIZE", "1024"))
+    TICK_STORE_RETENTION_HOURS: float = float(
+        os.getenv("TICK_STORE_RETENTION_HOURS", "336")
+    )
+
+    # Кэш последней цены по инструменту в Redis (REDIS_URL)
+    LATEST_CACHE_ENABLED: bool = (
+        os.getenv("LATEST_CACHE_ENABLED", "true").lower() == "true"
+    )
+    # Время жизни кэша после последней записи, секунд
+    LATEST_CACHE_TTL: int = int(os.getenv("LATEST_CACHE_TTL", "3600"))
+    LATEST_CACHE_TIMEOUT: float = float(os.getenv("LATEST_CACHE_TIMEOUT", "0.5"))
+
+    # Дневные партиции prices: сколько дней создавать заранее и сколько хранить
+    PRICES_PARTITION_PREMAKE_DAYS: int = int(
+        os.getenv("PRICES_PARTITION_PREMAKE_DAYS", "7")
+    )
+    # 0 — хранить все (удаление старых данных включается явно)
+    PRICES_RETENTION_DAYS: int = int(os.getenv("PRICES_RETENTION_DAYS", "0"))
+
+    # Архив Parquet: дневные партиции старше PRICES_ARCHIVE_AFTER_DAYS
+    # выгружаются в файлы и удаляются из БД (0 — не архивировать)
+    PRICES_ARCHIVE_AFTER_DAYS: int = int(os.getenv("PRICES_ARCHIVE_AFTER_DAYS", "30"))
+    PRICES_ARCHIVE_PATH: str = os.getenv("PRICES_ARCHIVE_PATH", "archive/prices")
+
+    # Сохранять полный ответ API в price_payloads (сжатый zlib)
+    PRICE_PAYLOADS_ENABLED: bool = (
+        os.getenv("PRICE_PAYLOADS_ENABLED", "true").lower() == "true"
+    )
+
+    # Валюты, для которых задача sync_instruments обновляет справочник
+    INSTRUMENT_CURRENCIES: str = os.getenv("INSTRUMENT_CURRENCIES", "BTC,ETH")
+
+    # Снимок всего рынка через get_book_summary_by_currency
+    SNAPSHOT_ENABLED: bool = os.getenv("SNAPSHOT_ENABLED", "false").lower() == "true"
+    SNAPSHOT_CURRENCIES: str = os.getenv("SNAPSHOT_CURRENCIES", "BTC,ETH")
+    SNAPSHOT_KINDS: str = os.getenv("SNAPSHOT_KINDS", "future,option")
+    SNAPSHOT_INDICES: str = os.getenv("SNAPSHOT_INDICES", "btc_usd,eth_usd")
 
     # Сформированная DATABASE_URL для SQLAlchemy
     @property
     def DATABASE_URL(self) -> str:
+        if self.DB_PRIMARY_URL:
+            return self.DB_PRIMARY_URL
         return f"postgresql://{self.DB_USER}:{self.DB_PASS}@{self.DB_HOST}:{self.DB_PORT}/{self.DB_NAME}"
 
+    # Та же база через asyncpg для асинхронных обработчиков API
+    @property
+    def ASYNC_DATABASE_URL(self) -> str:
+        return to_async_url(self.DATABASE_URL)
+
+    @property
+    def DB_REPLICA_URL_LIST(self) -> List[str]:
+        return split_csv(self.DB_REPLICA_URLS)
+
+    # Список инструментов для потокового сбора
+    @property
+    def STREAM_INSTRUMENT_LIST(self) -> List[str]:
+        return split_csv(self.STREAM_INSTRUMENTS)
+
+    @property
+    def COLLECTOR_INSTRUMENT_LIST(self) -> List[str]:
+        return split_csv(self.COLLECTOR_INSTRUMENTS)
+
     class Config:
         env_file = ".env"
 
@@ -1,42 +1,158 @@
-from sqlalchemy import JSON, Column, DateTime, Float, Index, Integer, String
+from sqlalchemy import (
+    DDL,
+    BigInteger,
+    Column,
+    DateTime,
+    Float,
+    ForeignKey,
+    Index,
+    Integer,
+    LargeBinary,
+    String,
+    event,
+)
+from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 
 from app.db.session import Base
 
 
+class Instrument(Base):
+    """Справочник инструментов (prices ссылается на него по id)"""
+
+    __tablename__ = "instruments"
+
+    id = Column(Integer, primary_key=True)
+    name = Column(String(100), unique=True, nullable=False)
+    kind = Column(String(20), nullable=True)  # future / option / index / spot
+    currency = Column(String(10), nullable=True)  # Базовая валюта
+    expiry = Column(DateTime(timezone=True), nullable=True)  # Нет у бессрочных
+    strike = Column(Float, nullable=True)  # Только у опционов
+    source = Column(String(50), nullable=False, server_default="deribit")
+
+    def __repr__(self):
+        return f"<Instrument {self.id}: {self.name}>"
+
+
 class Price(Base):
     """Модель для хранения цен с Deribit"""
 
     __tablename__ = "prices"
 
-    id = Column(Integer, primary_key=True, index=True)
-    instrument_name = Column(String(100), index=True, nullable=False)
+    # Таблица секционирована по дням (app/db/partitions.py), поэтому
+    # первичный ключ включает timestamp
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), nullable=False)
     price = Column(Float, nullable=False)
     timestamp = Column(
-        DateTime(timezone=True), server_default=func.now(), nullable=False
+        DateTime(timezone=True),
+        primary_key=True,
+        server_default=func.now(),
+        nullable=False,
     )
-    source = Column(String(50), default="deribit")
     mark_iv = Column(Float, nullable=True)  # Волатильность (опционально)
-    volume = Column(Float, nullable=True)  # Объем (опционально)
-    additional_data = Column(JSON, nullable=True)  # Для хранения полного ответа API
+    volume = Column(Float, nullable=True)  # Объем за 24ч в USD
+    base_volume = Column(Float, nullable=True)  # Объем за 24ч в базовой валюте
+    price_change = Column(Float, nullable=True)  # Изменение цены за 24ч, %
+    # Полный ответ API хранится отдельно, в price_payloads
 
     # Индексы для быстрого поиска
     __table_args__ = (
-        Index("idx_instrument_timestamp", "instrument_name", "timestamp"),
+        # Один тик на инструмент и время биржи: повторная запись пропускается
+        Index("idx_instrument_timestamp", "instrument_id", "timestamp", unique=True),
         Index("idx_timestamp", "timestamp"),
+        {"postgresql_partition_by": "RANGE (timestamp)"},
     )
 
+    # Справочник маленький: загружаем вместе со строкой одним JOIN
+    instrument = relationship(Instrument, lazy="joined")
+
     def __repr__(self):
-        return f"<Price {self.instrument_name}: {self.price} at {self.timestamp}>"
+        return f"<Price {self.instrument_id}: {self.price} at {self.timestamp}>"
 
     def to_dict(self):
         """Конвертация в словарь"""
         return {
             "id": self.id,
-            "instrument_name": self.instrument_name,
+            "instrument_id": self.instrument_id,
+            "instrument_name": self.instrument.name if self.instrument else None,
             "price": self.price,
             "timestamp": self.timestamp.isoformat() if self.timestamp else None,
-            "source": self.source,
+            "source": self.instrument.source if self.instrument else None,
             "mark_iv": self.mark_iv,
             "volume": self.volume,
+            "base_volume": self.base_volume,
+            "price_change": self.price_change,
         }
+
+
+class PricePayload(Base):
+    """Исходный ответ API для строки prices (JSON, сжатый zlib).
+
+    Горячие запросы читают только prices; сюда обращаются за полным тикером.
+    Секционирована по дням так же, как prices, и удаляется вместе с ней.
+    """
+
+    __tablename__ = "price_payloads"
+
+    price_id = Column(Integer, primary_key=True, autoincrement=False)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, nullable=False)
+    payload = Column(LargeBinary, nullable=False)
+
+    __table_args__ = ({"postgresql_partition_by": "RANGE (timestamp)"},)
+
+
+class PriceCandle(Base):
+    """Свечи OHLCV по инструменту (app/services/candles.py)"""
+
+    __tablename__ = "price_candles"
+
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), primary_key=True)
+    resolution = Column(String(3), primary_key=True)  # 1m / 5m / 1h / 1d
+    bucket = Column(DateTime(timezone=True), primary_key=True)  # Начало свечи, UTC
+    open = Column(Float, nullable=False)
+    high = Column(Float, nullable=False)
+    low = Column(Float, nullable=False)
+    close = Column(Float, nullable=False)
+    # Тикер дает только суточный объем: значение на закрытии свечи, USD
+    volume = Column(Float, nullable=True)
+    ticks = Column(Integer, nullable=False)
+    price_sum = Column(Float, nullable=False)  # Для средней цены: price_sum / ticks
+    # Время первого и последнего тика: по ним сливаются open и close
+    open_time = Column(DateTime(timezone=True), nullable=False)
+    close_time = Column(DateTime(timezone=True), nullable=False)
+
+    def __repr__(self):
+        return f"<PriceCandle {self.instrument_id} {self.resolution} {self.bucket}>"
+
+
+class InstrumentStats(Base):
+    """Счетчики тиков по инструменту, ведутся при записи (app/services/stats.py)"""
+
+    __tablename__ = "instrument_stats"
+
+    instrument_id = Column(Integer, ForeignKey("instruments.id"), primary_key=True)
+    # Всего записано тиков, включая дни, перенесенные в архив
+    ticks = Column(BigInteger, nullable=False)
+    first_timestamp = Column(DateTime(timezone=True), nullable=False)
+    last_timestamp = Column(DateTime(timezone=True), nullable=False)
+    min_price = Column(Float, nullable=False)
+    max_price = Column(Float, nullable=False)
+    last_price = Column(Float, nullable=False)
+
+    def __repr__(self):
+        return f"<InstrumentStats {self.instrument_id}: {self.ticks} ticks>"
+
+
+# Без партиций вставка в секционированную таблицу невозможна: при create_all
+# создаем партицию по умолчанию, дневные добавит maintain_partitions (и
+# перенесет в них строки, успевшие попасть в партицию по умолчанию)
+for _table in (Price.__table__, PricePayload.__table__):
+    event.listen(
+        _table,
+        "after_create",
+        DDL(
+            f"CREATE TABLE IF NOT EXISTS {_table.name}_default "
+            f"PARTITION OF {_table.name} DEFAULT"
+        ).execute_if(dialect="postgresql"),
+    )
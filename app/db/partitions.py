@@ -0,0 +1,218 @@
+"""Дневные партиции таблиц prices и price_payloads.
+
+Обе таблицы секционированы по RANGE (timestamp): одна партиция
+``{table}_pYYYYMMDD`` на сутки UTC плюс ``{table}_default`` для строк вне
+созданных диапазонов. Партиции создаются заранее на
+PRICES_PARTITION_PREMAKE_DAYS дней вперед, старые удаляются целиком
+(DROP TABLE вместо DELETE) по PRICES_RETENTION_DAYS (по умолчанию 0 —
+хранить все). Дни, чьи тики попали в ``{table}_default`` (опоздавшие или
+загруженные задним числом), получают свою партицию при обслуживании, и
+строки переносятся в нее.
+"""
+
+import importlib.util
+import logging
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+PARENT_TABLE = "prices"
+# Секционированные по дням таблицы с одинаковым сроком хранения
+PARTITIONED_TABLES = (PARENT_TABLE, "price_payloads")
+
+
+def partition_name(day: date, parent: str = PARENT_TABLE) -> str:
+    return f"{parent}_p{day:%Y%m%d}"
+
+
+def default_partition(parent: str = PARENT_TABLE) -> str:
+    return f"{parent}_default"
+
+
+def partition_day(name: str, parent: str = PARENT_TABLE) -> Optional[date]:
+    """День партиции по имени (None для партиции по умолчанию и чужих таблиц)"""
+    prefix = f"{parent}_p"
+    suffix = name[len(prefix) :]
+    if not name.startswith(prefix) or len(suffix) != 8 or not suffix.isdigit():
+        return None
+    return datetime.strptime(suffix, "%Y%m%d").date()
+
+
+def list_partitions(connection: Connection, parent: str = PARENT_TABLE) -> List[str]:
+    """Имена всех партиций таблицы"""
+    rows = connection.execute(
+        text(
+            "SELECT c.relname FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent ORDER BY c.relname"
+        ),
+        {"parent": parent},
+    )
+    return [row[0] for row in rows]
+
+
+def partition_days(connection: Connection, parent: str = PARENT_TABLE) -> List[date]:
+    """Дни существующих дневных партиций по возрастанию"""
+    days = (partition_day(name, parent) for name in list_partitions(connection, parent))
+    return sorted(day for day in days if day is not None)
+
+
+def estimated_rows(connection: Connection, parent: str = PARENT_TABLE) -> int:
+    """Оценка планировщика (reltuples) числа строк во всех партициях таблицы.
+
+    Обновляется ANALYZE/autovacuum; -1 у еще не проанализированной партиции
+    считается нулем.
+    """
+    return connection.execute(
+        text(
+            "SELECT coalesce(sum(greatest(c.reltuples, 0)), 0)::bigint "
+            "FROM pg_inherits i "
+            "JOIN pg_class c ON c.oid = i.inhrelid "
+            "JOIN pg_class p ON p.oid = i.inhparent "
+            "WHERE p.relname = :parent"
+        ),
+        {"parent": parent},
+    ).scalar_one()
+
+
+def hot_horizon(connection: Connection) -> Optional[datetime]:
+    """Начало самой старой дневной партиции prices: раньше — только архив"""
+    days = partition_days(connection)
+    if not days:
+        return None
+    return datetime.combine(days[0], datetime.min.time(), tzinfo=timezone.utc)
+
+
+def _default_days(connection: Connection, parent: str) -> List[date]:
+    """Дни (UTC) строк, лежащих в партиции по умолчанию"""
+    rows = connection.execute(
+        text(
+            "SELECT DISTINCT (\"timestamp\" AT TIME ZONE 'UTC')::date "
+            f"FROM {default_partition(parent)}"
+        )
+    )
+    return [row[0] for row in rows]
+
+
+def create_partition(
+    connection: Connection, day: date, parent: str = PARENT_TABLE
+) -> str:
+    """Партиция на сутки [day, day + 1) UTC, если ее еще нет.
+
+    Если строки этих суток уже лежат в партиции по умолчанию, PostgreSQL
+    не создаст пересекающуюся с ними партицию: таблица создается отдельно,
+    строки переносятся в нее из default, и она подключается (ATTACH).
+    """
+    name = partition_name(day, parent)
+    start = f"{day.isoformat()} 00:00:00+00"
+    end = f"{(day + timedelta(days=1)).isoformat()} 00:00:00+00"
+    bounds = f"FOR VALUES FROM ('{start}') TO ('{end}')"
+    default = default_partition(parent)
+    in_range = f"\"timestamp\" >= '{start}' AND \"timestamp\" < '{end}'"
+
+    has_default = connection.execute(
+        text("SELECT to_regclass(:name) IS NOT NULL"), {"name": default}
+    ).scalar_one()
+    if (
+        not has_default
+        or not connection.execute(
+            text(f"SELECT EXISTS (SELECT 1 FROM {default} WHERE {in_range})")
+        ).scalar_one()
+    ):
+        connection.execute(
+            text(f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} {bounds}")
+        )
+        return name
+
+    # Новые строки в default ждут до конца транзакции, иначе ATTACH не пройдет
+    connection.execute(text(f"LOCK TABLE {default} IN SHARE ROW EXCLUSIVE MODE"))
+    connection.execute(text(f"CREATE TABLE {name} (LIKE {parent} INCLUDING DEFAULTS)"))
+    moved = connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {default} WHERE {in_range} RETURNING *) "
+            f"INSERT INTO {name} SELECT * FROM moved"
+        )
+    ).rowcount
+    connection.execute(text(f"ALTER TABLE {parent} ATTACH PARTITION {name} {bounds}"))
+    logger.warning(f"📦 Moved {moved} rows of {day} from {default} to {name}")
+    return name
+
+
+def ensure_partitions(
+    connection: Connection, days_ahead: Optional[int] = None
+) -> List[str]:
+    """Создать партиции с сегодняшнего дня на days_ahead дней вперед.
+
+    Заодно создаются партиции дней, чьи строки попали в партицию по
+    умолчанию: иначе они не архивируются и не удаляются по сроку хранения.
+    """
+    if days_ahead is None:
+        days_ahead = settings.PRICES_PARTITION_PREMAKE_DAYS
+
+    today = datetime.now(timezone.utc).date()
+
+    created = []
+    for parent in PARTITIONED_TABLES:
+        existing = set(list_partitions(connection, parent))
+        days = {today + timedelta(days=offset) for offset in range(days_ahead + 1)}
+        if default_partition(parent) in existing:
+            days.update(_default_days(connection, parent))
+        for day in sorted(days):
+            if partition_name(day, parent) not in existing:
+                created.append(create_partition(connection, day, parent))
+
+    if created:
+        logger.info(f"🧱 Created price partitions: {created}")
+    return created
+
+
+def archive_enabled() -> bool:
+    """Партиции выгружает архив: PRICES_ARCHIVE_AFTER_DAYS > 0 и есть pyarrow"""
+    return (
+        settings.PRICES_ARCHIVE_AFTER_DAYS > 0
+        and importlib.util.find_spec("pyarrow") is not None
+    )
+
+
+def drop_expired_partitions(
+    connection: Connection, retention_days: Optional[int] = None
+) -> List[str]:
+    """Удалить партиции старше retention_days дней (0 — хранить все).
+
+    При включенном архиве (PRICES_ARCHIVE_AFTER_DAYS) партиции удаляет
+    только archive_partitions, после выгрузки дня в Parquet: при сбое
+    выгрузки дни остаются в БД, а не пропадают. Без pyarrow архив не
+    ведется, и действует обычный срок хранения.
+    """
+    if retention_days is None:
+        retention_days = settings.PRICES_RETENTION_DAYS
+    if retention_days <= 0 or archive_enabled():
+        return []
+
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=retention_days)
+
+    dropped = []
+    for parent in PARTITIONED_TABLES:
+        for name in list_partitions(connection, parent):
+            day = partition_day(name, parent)
+            if day is not None and day < cutoff:
+                connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped.append(name)
+
+    if dropped:
+        logger.info(f"🗑️ Dropped expired price partitions: {dropped}")
+    return dropped
+
+
+def maintain_partitions(connection: Connection) -> Dict[str, Any]:
+    """Создание будущих партиций и удаление устаревших"""
+    created = ensure_partitions(connection)
+    dropped = drop_expired_partitions(connection)
+    return {"created": created, "dropped": dropped}
@@ -0,0 +1,118 @@
+"""Маршрутизация чтения API между репликами и основной БД.
+
+Запросы только на чтение идут на реплики по кругу (round-robin). Отставание
+каждой реплики проверяется не чаще DB_REPLICA_CHECK_INTERVAL и кэшируется;
+реплика недоступна или отстает больше DB_REPLICA_MAX_LAG — пропускается,
+а если подходящих нет, чтение уходит на основную БД. Запись (коллектор,
+Celery, миграции) всегда идет только на основную БД.
+
+Для локальной проверки репликой может служить любой PostgreSQL не в режиме
+восстановления (например, та же основная БД): его отставание равно нулю.
+"""
+
+import asyncio
+import itertools
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+# Отставание реплики, секунд: 0 на основной БД и на догнавшей реплике
+REPLICA_LAG_SQL = text(
+    "SELECT CASE "
+    "WHEN NOT pg_is_in_recovery() THEN 0 "
+    "WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+# Зависшая реплика не должна задерживать запрос дольше, секунд
+LAG_CHECK_TIMEOUT = 2.0
+
+
+@dataclass
+class ReplicaState:
+    engine: AsyncEngine
+    lag: Optional[float] = None  # None — недоступна или еще не проверялась
+    checked_at: float = float("-inf")
+    error: Optional[str] = None
+
+
+class ReplicaRouter:
+    """Выбор движка для чтения: реплики по кругу, основная БД как запасная"""
+
+    def __init__(
+        self,
+        primary: AsyncEngine,
+        replicas: Sequence[AsyncEngine] = (),
+        max_lag: float = 5.0,
+        check_interval: float = 5.0,
+    ):
+        self.primary = primary
+        self.replicas = [ReplicaState(engine) for engine in replicas]
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.fallbacks = 0  # чтений, ушедших на основную БД при наличии реплик
+        self._next = itertools.count()
+
+    @staticmethod
+    async def _query_lag(engine: AsyncEngine) -> Optional[float]:
+        async with engine.connect() as conn:
+            return await conn.scalar(REPLICA_LAG_SQL)
+
+    async def _check(self, replica: ReplicaState) -> None:
+        replica.checked_at = time.monotonic()
+        try:
+            lag = await asyncio.wait_for(
+                self._query_lag(replica.engine), timeout=LAG_CHECK_TIMEOUT
+            )
+        except Exception as e:
+            if replica.error is None:
+                logger.warning(f"⚠️ Replica {replica.engine.url!r} unavailable: {e!r}")
+            replica.lag, replica.error = None, repr(e)
+            return
+
+        if replica.error is not None:
+            logger.info(f"✅ Replica {replica.engine.url!r} is back")
+        replica.lag = None if lag is None else float(lag)
+        replica.error = None if lag is not None else "no replayed transactions"
+
+    async def _healthy(self, replica: ReplicaState) -> bool:
+        if time.monotonic() - replica.checked_at >= self.check_interval:
+            await self._check(replica)
+        return replica.lag is not None and replica.lag <= self.max_lag
+
+    async def read_engine(self) -> AsyncEngine:
+        """Движок для запроса на чтение"""
+        if not self.replicas:
+            return self.primary
+
+        start = next(self._next)
+        for offset in range(len(self.replicas)):
+            replica = self.replicas[(start + offset) % len(self.replicas)]
+            if await self._healthy(replica):
+                return replica.engine
+
+        self.fallbacks += 1
+        if self.fallbacks == 1 or self.fallbacks % 1000 == 0:
+            logger.warning(
+                f"⚠️ No replica within {self.max_lag}s lag, reading from primary "
+                f"({self.fallbacks} fallbacks)"
+            )
+        return self.primary
+
+    def status(self) -> Dict[str, Any]:
+        """Состояние реплик для /health"""
+        replicas: List[Dict[str, Any]] = [
+            {
+                "url": replica.engine.url.render_as_string(hide_password=True),
+                "lag_seconds": replica.lag,
+                "healthy": replica.lag is not None and replica.lag <= self.max_lag,
+                "error": replica.error,
+            }
+            for replica in self.replicas
+        ]
+        return {"replicas": replicas, "primary_fallbacks": self.fallbacks}
@@ -1,16 +1,49 @@
+from contextlib import asynccontextmanager
+
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
-from app.core.config import settings
+from app.core.config import settings, to_async_url
+from app.db.replicas import ReplicaRouter
 
 # Используем DATABASE_URL из настроек
 DATABASE_URL = settings.DATABASE_URL
 
+# Общие настройки пула для обоих движков
+POOL_OPTIONS = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    # Долгоживущий коллектор и API переживают перезапуск БД
+    "pool_pre_ping": True,
+}
+
 # Создаем движок
-engine = create_engine(DATABASE_URL)
+engine = create_engine(DATABASE_URL, **POOL_OPTIONS)
+
+# Асинхронный движок (asyncpg) для обработчиков API: запросы не блокируют
+# event loop, соединения берутся из собственного пула
+async_engine = create_async_engine(settings.ASYNC_DATABASE_URL, **POOL_OPTIONS)
+
+# Реплики только для чтения в API; запись всегда идет через engine/async_engine
+replica_engines = [
+    create_async_engine(to_async_url(url), **POOL_OPTIONS)
+    for url in settings.DB_REPLICA_URL_LIST
+]
+read_router = ReplicaRouter(
+    async_engine,
+    replica_engines,
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+)
 
 # Создаем фабрику сессий
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+AsyncSessionLocal = async_sessionmaker(
+    async_engine, autoflush=False, expire_on_commit=False
+)
 
 # Базовый класс для моделей
 Base = declarative_base()
@@ -25,6 +58,25 @@ def get_db():
         db.close()
 
 
+# Асинхронная сессия для async-обработчиков FastAPI
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# Сессия только для чтения: реплика по кругу или основная БД при отставании
+@asynccontextmanager
+async def read_session():
+    bind = await read_router.read_engine()
+    async with AsyncSessionLocal(bind=bind) as db:
+        yield db
+
+
+async def get_read_db():
+    async with read_session() as db:
+        yield db
+
+
 # Импортируем модели для Alembic
 # Этот импорт должен быть в конце файла, после определения Base
 from app.db import models  # noqa
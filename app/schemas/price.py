@@ -1,4 +1,5 @@
 from datetime import datetime
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -6,19 +7,81 @@ from pydantic import BaseModel
 class PriceTickBase(BaseModel):
     ticker: str
     price: float
-    timestamp: int
-
-
-class PriceTickCreate(PriceTickBase):
-    pass
+    timestamp: datetime
 
 
 class PriceTick(PriceTickBase):
     id: int
-    created_at: datetime
+    mark_iv: Optional[float] = None
+    volume: Optional[float] = None
+    price_change: Optional[float] = None
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "id": 1,
+                "ticker": "BTC-PERPETUAL",
+                "price": 45000.50,
+                "timestamp": "2026-01-14T18:56:45+00:00",
+                "mark_iv": None,
+                "volume": 1250000000.0,
+                "price_change": -1.25,
+            }
+        }
+
+
+class LatestPriceTick(PriceTick):
+    # Время записи в кэш последних цен (None — ответ из БД) и возраст цены
+    cached_at: Optional[datetime] = None
+    age_seconds: Optional[float] = None
+
+
+class Candle(BaseModel):
+    bucket: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    volume: Optional[float] = None
+    ticks: int
+
+    class Config:
+        from_attributes = True
+        json_schema_extra = {
+            "example": {
+                "bucket": "2026-01-14T18:00:00+00:00",
+                "open": 45000.5,
+                "high": 45210.0,
+                "low": 44980.25,
+                "close": 45120.0,
+                "volume": 1250000000.0,
+                "ticks": 3600,
+            }
+        }
+
+
+class Bar(BaseModel):
+    bucket: datetime
+    open: float
+    high: float
+    low: float
+    close: float
+    mean: float  # Средняя цена тиков интервала
+    volume: Optional[float] = None
+    ticks: int
 
     class Config:
         from_attributes = True
-        schema_extra = {
-            "example": {"ticker": "btc_usd", "price": 45000.50, "timestamp": 1678886400}
+        json_schema_extra = {
+            "example": {
+                "bucket": "2026-01-14T18:15:00+00:00",
+                "open": 45000.5,
+                "high": 45210.0,
+                "low": 44980.25,
+                "close": 45120.0,
+                "mean": 45090.4,
+                "volume": 1250000000.0,
+                "ticks": 900,
+            }
         }
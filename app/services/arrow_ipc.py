@@ -0,0 +1,92 @@
+"""Ответы с историей тиков в формате Apache Arrow IPC (stream).
+
+JSON повторяет имена полей в каждой строке, а клиенту на pandas/numpy
+приходится разбирать его построчно. Arrow передает колонки целиком:
+pyarrow.ipc.open_stream(...).read_pandas() читает их без разбора и
+копирования. Эндпоинты истории отдают Arrow, если клиент прислал
+``Accept: application/vnd.apache.arrow.stream``; имя инструмента — в
+метаданных схемы, а не в каждой строке. Поток пишет
+pyarrow.ipc.new_stream. Нужен pyarrow; без него — JSON.
+"""
+
+import io
+from operator import itemgetter
+from typing import Any, Iterable, Mapping, Optional
+
+try:
+    import pyarrow as pa
+except ImportError:  # pragma: no cover - зависит от окружения
+    pa = None
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+
+def arrow_available() -> bool:
+    return pa is not None
+
+
+def wants_arrow(accept: Optional[str]) -> bool:
+    """Клиент просит Arrow в заголовке Accept (и pyarrow установлен)"""
+    return arrow_available() and bool(accept) and ARROW_MEDIA_TYPE in accept
+
+
+def tick_schema(instrument: Optional[str] = None) -> "pa.Schema":
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("price", pa.float64()),
+            ("mark_iv", pa.float64()),
+            ("volume", pa.float64()),
+            ("price_change", pa.float64()),
+        ],
+        metadata={"instrument": instrument} if instrument else None,
+    )
+
+
+def _mapping(row: Any) -> Mapping[str, Any]:
+    # Row SQLAlchemy или словарь (строки из архива)
+    return getattr(row, "_mapping", row)
+
+
+def ticks_batch(rows: Iterable[Any], schema: "pa.Schema") -> "pa.RecordBatch":
+    """Колонки тиков из строк запроса (лишние поля строк отбрасываются)"""
+    # Поля схемы из строк и поворот в колонки — без словаря на строку
+    values = map(itemgetter(*schema.names), map(_mapping, rows))
+    columns = list(zip(*values)) or [()] * len(schema)
+    return pa.RecordBatch.from_arrays(
+        [pa.array(column, type=field.type) for column, field in zip(columns, schema)],
+        schema=schema,
+    )
+
+
+class TickStreamWriter:
+    """Поток IPC по кускам: new_stream пишет в буфер, он отдается после пачки"""
+
+    def __init__(self, instrument: Optional[str] = None):
+        self.schema = tick_schema(instrument)
+        self._sink = io.BytesIO()
+        self._writer = pa.ipc.new_stream(self._sink, self.schema)
+
+    def _flush(self) -> bytes:
+        chunk = self._sink.getvalue()
+        self._sink.seek(0)
+        self._sink.truncate()
+        return chunk
+
+    def write(self, rows: Iterable[Any]) -> bytes:
+        """Байты очередной пачки (в первой — и схема)"""
+        self._writer.write_batch(ticks_batch(rows, self.schema))
+        return self._flush()
+
+    def close(self) -> bytes:
+        """Конец потока (и схема, если пачек не было)"""
+        self._writer.close()
+        return self._flush()
+
+
+def ticks_to_ipc(rows: Iterable[Any], instrument: Optional[str] = None) -> bytes:
+    """Весь ответ одним потоком IPC"""
+    writer = TickStreamWriter(instrument)
+    rows = list(rows)
+    return (writer.write(rows) if rows else b"") + writer.close()
@@ -0,0 +1,274 @@
+"""Свечи OHLCV из тиков prices.
+
+Свечи 1m/5m/1h/1d обновляются в той же транзакции, что и запись тиков
+(bulk_insert_prices): новые тики пачки агрегируются в памяти и сливаются
+с существующими свечами через INSERT ... ON CONFLICT DO UPDATE. Повторные
+тики до свечей не доходят — их отсекает уникальный ключ prices.
+"""
+
+import re
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Float, Interval, bindparam, case, cast, func, literal, select
+from sqlalchemy.dialects.postgresql import ARRAY, array, insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import Instrument, Price, PriceCandle
+
+# Длительность свечи, секунд
+CANDLE_RESOLUTIONS = {"1m": 60, "5m": 300, "1h": 3600, "1d": 86400}
+
+# Свечи и интервалы пересчета отсчитываются от эпохи (UTC)
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+BUCKET_UNITS = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+RESAMPLE_MAX_BUCKETS = 10000
+
+
+def bucket_start(timestamp: datetime, seconds: int) -> datetime:
+    """Начало свечи: время, округленное вниз до длительности (от эпохи, UTC)"""
+    epoch = int(timestamp.timestamp())
+    return datetime.fromtimestamp(epoch - epoch % seconds, tz=timezone.utc)
+
+
+def build_candles(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Свечи всех длительностей по строкам prices (instrument_id, price, ...)"""
+    candles: Dict[Tuple[int, str, datetime], Dict[str, Any]] = {}
+
+    for row in rows:
+        timestamp = row["timestamp"]
+        price = row["price"]
+        for resolution, seconds in CANDLE_RESOLUTIONS.items():
+            key = (row["instrument_id"], resolution, bucket_start(timestamp, seconds))
+            candle = candles.get(key)
+            if candle is None:
+                candles[key] = {
+                    "instrument_id": key[0],
+                    "resolution": resolution,
+                    "bucket": key[2],
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "volume": row["volume"],
+                    "ticks": 1,
+                    "price_sum": price,
+                    "open_time": timestamp,
+                    "close_time": timestamp,
+                }
+                continue
+
+            candle["high"] = max(candle["high"], price)
+            candle["low"] = min(candle["low"], price)
+            candle["ticks"] += 1
+            candle["price_sum"] += price
+            if timestamp < candle["open_time"]:
+                candle["open"] = price
+                candle["open_time"] = timestamp
+            if timestamp >= candle["close_time"]:
+                candle["close"] = price
+                candle["volume"] = row["volume"]
+                candle["close_time"] = timestamp
+
+    # Один порядок строк у всех писателей — без взаимных блокировок
+    return [candles[key] for key in sorted(candles)]
+
+
+def upsert_candles(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Слить новые тики со свечами в текущей транзакции"""
+    candles = build_candles(rows)
+    if not candles:
+        return 0
+
+    table = PriceCandle.__table__
+    statement = insert(table).values(candles)
+    new = statement.excluded
+    is_earlier = new.open_time < table.c.open_time
+    is_later = new.close_time >= table.c.close_time
+    statement = statement.on_conflict_do_update(
+        index_elements=["instrument_id", "resolution", "bucket"],
+        set_={
+            "open": case((is_earlier, new.open), else_=table.c.open),
+            "open_time": func.least(table.c.open_time, new.open_time),
+            "high": func.greatest(table.c.high, new.high),
+            "low": func.least(table.c.low, new.low),
+            "close": case((is_later, new.close), else_=table.c.close),
+            "volume": case((is_later, new.volume), else_=table.c.volume),
+            "close_time": func.greatest(table.c.close_time, new.close_time),
+            "ticks": table.c.ticks + new.ticks,
+            "price_sum": table.c.price_sum + new.price_sum,
+        },
+    )
+    db.execute(statement)
+    return len(candles)
+
+
+def _candles_select(
+    instrument: str,
+    resolution: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    limit: int,
+):
+    query = (
+        select(
+            PriceCandle.bucket,
+            PriceCandle.open,
+            PriceCandle.high,
+            PriceCandle.low,
+            PriceCandle.close,
+            PriceCandle.volume,
+            PriceCandle.ticks,
+        )
+        .join(Instrument, PriceCandle.instrument_id == Instrument.id)
+        .where(Instrument.name == instrument, PriceCandle.resolution == resolution)
+    )
+    if date_from is not None:
+        query = query.where(PriceCandle.bucket >= date_from)
+    if date_to is not None:
+        query = query.where(PriceCandle.bucket <= date_to)
+
+    # Без date_from — последние limit свечей (выбираем с конца и разворачиваем)
+    if date_from is not None:
+        return query.order_by(PriceCandle.bucket).limit(limit)
+    return query.order_by(PriceCandle.bucket.desc()).limit(limit)
+
+
+def query_candles(
+    db: Session,
+    instrument: str,
+    resolution: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 500,
+) -> List[Any]:
+    """Свечи инструмента по возрастанию времени; без date_from — последние limit"""
+    rows = db.execute(
+        _candles_select(instrument, resolution, date_from, date_to, limit)
+    ).all()
+    return rows if date_from is not None else rows[::-1]
+
+
+async def query_candles_async(
+    db: AsyncSession,
+    instrument: str,
+    resolution: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: int = 500,
+) -> List[Any]:
+    """То же, что query_candles, через асинхронную сессию"""
+    result = await db.execute(
+        _candles_select(instrument, resolution, date_from, date_to, limit)
+    )
+    rows = result.all()
+    return rows if date_from is not None else rows[::-1]
+
+
+def parse_bucket(value: str) -> int:
+    """Ширина интервала в секундах: 15s, 5m, 4h, 1d или число секунд"""
+    match = re.fullmatch(r"(\d+)([smhd]?)", value.strip().lower())
+    seconds = int(match[1]) * BUCKET_UNITS[match[2] or "s"] if match else 0
+    if seconds <= 0:
+        raise ValueError(f"Invalid bucket width: {value!r}")
+    return seconds
+
+
+def rollup_resolution(seconds: int) -> Optional[str]:
+    """Самая крупная свеча, из которых собирается интервал без остатка"""
+    fitting = [
+        (width, resolution)
+        for resolution, width in CANDLE_RESOLUTIONS.items()
+        if seconds % width == 0
+    ]
+    return max(fitting)[1] if fitting else None
+
+
+def _edge(aggregate, timestamp, value):
+    # min/max(ARRAY[время, значение])[2] — значение в самой ранней/поздней
+    # точке интервала за один проход, без array_agg всех цен интервала
+    pair = array([cast(func.extract("epoch", timestamp), Float), value])
+    return aggregate(pair, type_=ARRAY(Float))[2]
+
+
+def resample_select(
+    instrument: str, seconds: int, start: datetime, end: datetime
+) -> Tuple[Any, str]:
+    """Запрос OHLC по интервалам ширины seconds за [start, end) и его источник.
+
+    Ширина, кратная длительности свечи, собирается из price_candles (в том
+    числе за дни, уже перенесенные в архив), иначе — date_bin по тикам
+    prices через idx_instrument_timestamp.
+    """
+    # Границы по сетке интервалов: крайние интервалы тоже полные
+    start = bucket_start(start, seconds)
+    if bucket_start(end, seconds) < end:
+        end = bucket_start(end, seconds) + timedelta(seconds=seconds)
+
+    width = bindparam("width", timedelta(seconds=seconds), type_=Interval)
+    origin = literal(EPOCH)
+    resolution = rollup_resolution(seconds)
+
+    if resolution is not None:
+        bucket = func.date_bin(width, PriceCandle.bucket, origin).label("bucket")
+        ticks = func.sum(PriceCandle.ticks)
+        query = (
+            select(
+                bucket,
+                _edge(func.min, PriceCandle.open_time, PriceCandle.open).label("open"),
+                func.max(PriceCandle.high).label("high"),
+                func.min(PriceCandle.low).label("low"),
+                _edge(func.max, PriceCandle.close_time, PriceCandle.close).label(
+                    "close"
+                ),
+                (func.sum(PriceCandle.price_sum, type_=Float) / ticks).label("mean"),
+                _edge(func.max, PriceCandle.close_time, PriceCandle.volume).label(
+                    "volume"
+                ),
+                ticks.label("ticks"),
+            )
+            .join(Instrument, PriceCandle.instrument_id == Instrument.id)
+            .where(
+                Instrument.name == instrument,
+                PriceCandle.resolution == resolution,
+                PriceCandle.bucket >= start,
+                PriceCandle.bucket < end,
+            )
+        )
+        source = f"candles:{resolution}"
+    else:
+        bucket = func.date_bin(width, Price.timestamp, origin).label("bucket")
+        query = (
+            select(
+                bucket,
+                _edge(func.min, Price.timestamp, Price.price).label("open"),
+                func.max(Price.price).label("high"),
+                func.min(Price.price).label("low"),
+                _edge(func.max, Price.timestamp, Price.price).label("close"),
+                func.avg(Price.price).label("mean"),
+                _edge(func.max, Price.timestamp, Price.volume).label("volume"),
+                func.count().label("ticks"),
+            )
+            .join(Instrument, Price.instrument_id == Instrument.id)
+            .where(
+                Instrument.name == instrument,
+                Price.timestamp >= start,
+                Price.timestamp < end,
+            )
+        )
+        source = "ticks"
+
+    return query.group_by(bucket).order_by(bucket), source
+
+
+async def resample_async(
+    db: AsyncSession,
+    instrument: str,
+    seconds: int,
+    start: datetime,
+    end: datetime,
+) -> Tuple[List[Any], str]:
+    """Интервалы OHLC по возрастанию времени и источник данных"""
+    query, source = resample_select(instrument, seconds, start, end)
+    return (await db.execute(query)).all(), source
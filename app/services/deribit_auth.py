@@ -0,0 +1,191 @@
+"""Авторизация Deribit (public/auth, client_credentials).
+
+Один токен на процесс используется и HTTP-клиентом, и WebSocket-потоком:
+любой транспорт, получивший новую пару токенов, сохраняет ее через
+``update``. Обновление идет заранее, по refresh_token, в фоне.
+Авторизованные запросы получают более высокий лимит кредитов.
+
+refresh_token одноразовый, поэтому public/auth выполняется по одному на
+процесс (``authenticate``), в каком бы потоке и event loop ни работал
+транспорт: остальные ждут текущего вызова и берут уже новую пару.
+"""
+
+import asyncio
+import concurrent.futures
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.services.rate_limiter import get_credit_bucket
+
+logger = logging.getLogger(__name__)
+
+# Запрос public/auth: принимает параметры, возвращает result или None
+AuthRequest = Callable[[Dict[str, Any]], Awaitable[Optional[Dict[str, Any]]]]
+
+
+class DeribitAuth:
+    """Токен доступа Deribit с обновлением по refresh_token"""
+
+    def __init__(
+        self, client_id: str, client_secret: str, refresh_margin: float = 0.2
+    ):
+        self.client_id = client_id
+        self.client_secret = client_secret
+        # Доля срока жизни токена, за которую он обновляется заранее
+        self.refresh_margin = refresh_margin
+
+        self.access_token: Optional[str] = None
+        self.refresh_token: Optional[str] = None
+        self.scope: Optional[str] = None
+        self._expires_at = 0.0
+        self._lifetime = 0.0
+        # После неудачного входа не пытаемся снова на каждом запросе
+        self._next_attempt = 0.0
+
+        self._state_lock = threading.Lock()
+        # Текущий вызов public/auth (общий для всех потоков и event loop)
+        self._inflight: Optional[concurrent.futures.Future] = None
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.client_id and self.client_secret)
+
+    @property
+    def is_valid(self) -> bool:
+        return self.access_token is not None and time.monotonic() < self._expires_at
+
+    @property
+    def refresh_in(self) -> float:
+        """Через сколько секунд обновлять токен"""
+        refresh_at = self._expires_at - self._lifetime * self.refresh_margin
+        return max(0.0, refresh_at - time.monotonic())
+
+    def update(self, result: Optional[Dict[str, Any]]) -> bool:
+        """Сохранить ответ public/auth (из HTTP или WebSocket)"""
+        if not result or "access_token" not in result:
+            return False
+
+        first_login = self.access_token is None
+        with self._state_lock:
+            self.access_token = result["access_token"]
+            self.refresh_token = result.get("refresh_token")
+            self.scope = result.get("scope")
+            self._lifetime = float(result.get("expires_in", 0))
+            self._expires_at = time.monotonic() + self._lifetime
+
+        if first_login:
+            # Авторизованные запросы получают больший бюджет кредитов
+            get_credit_bucket().configure(
+                settings.DERIBIT_AUTH_RATE_CREDITS_PER_SEC,
+                settings.DERIBIT_AUTH_RATE_MAX_CREDITS,
+            )
+            logger.info(f"🔑 Authenticated with Deribit (scope: {self.scope})")
+        else:
+            logger.debug(f"🔑 Deribit token renewed, expires in {self._lifetime:.0f}s")
+        return True
+
+    def invalidate(self):
+        """Токен отклонен сервером: следующий запрос авторизуется заново"""
+        with self._state_lock:
+            self._expires_at = 0.0
+
+    def reset(self):
+        """Забыть токены: следующая авторизация пойдет по client_credentials"""
+        with self._state_lock:
+            self.access_token = None
+            self.refresh_token = None
+            self._expires_at = 0.0
+
+    def auth_params(self) -> Dict[str, Any]:
+        """Параметры public/auth: обновление, если есть refresh_token, иначе вход"""
+        if self.refresh_token and self.access_token is not None:
+            return {"grant_type": "refresh_token", "refresh_token": self.refresh_token}
+        return {
+            "grant_type": "client_credentials",
+            "client_id": self.client_id,
+            "client_secret": self.client_secret,
+        }
+
+    async def _authenticate(self, request: AuthRequest) -> bool:
+        if time.monotonic() < self._next_attempt:
+            return False
+
+        result = await request(self.auth_params())
+        if self.update(result):
+            return True
+
+        if self.refresh_token:
+            # refresh_token мог истечь — пробуем войти заново
+            self.reset()
+            if self.update(await request(self.auth_params())):
+                return True
+
+        self._next_attempt = time.monotonic() + 30
+        logger.error("❌ Deribit authentication failed, using public limits for 30s")
+        return False
+
+    async def authenticate(
+        self, request: AuthRequest, needed: Callable[[], bool]
+    ) -> bool:
+        """public/auth через request, если needed() после чужих вызовов.
+
+        Пока идет вызов в другом транспорте (потоке, event loop), ждем его
+        и снова проверяем needed(): два транспорта никогда не отправляют
+        один и тот же refresh_token. False — авторизация не удалась.
+        """
+        while True:
+            with self._state_lock:
+                if self._inflight is None:
+                    if not needed():
+                        return True
+                    inflight = self._inflight = concurrent.futures.Future()
+                    # Отмена ожидающего не отменяет сам вызов
+                    inflight.set_running_or_notify_cancel()
+                    break
+                waiting = self._inflight
+            await asyncio.wrap_future(waiting)
+
+        try:
+            return await self._authenticate(request)
+        finally:
+            with self._state_lock:
+                self._inflight = None
+            inflight.set_result(None)
+
+    async def get_token(self, request: AuthRequest) -> Optional[str]:
+        """Действующий токен; параллельные запросы ждут одной авторизации"""
+        if not self.enabled:
+            return None
+        if self.is_valid:
+            return self.access_token
+
+        await self.authenticate(request, lambda: not self.is_valid)
+        return self.access_token if self.is_valid else None
+
+    async def run_refresher(self, request: AuthRequest):
+        """Фоновое обновление токена до истечения срока"""
+        while True:
+            if self.is_valid:
+                await asyncio.sleep(self.refresh_in)
+
+            renewed = await self.authenticate(
+                request, lambda: not self.is_valid or self.refresh_in <= 0
+            )
+
+            if not renewed:
+                # Сервер недоступен — повторим позже
+                await asyncio.sleep(5)
+
+
+_auth: Optional[DeribitAuth] = None
+
+
+def get_deribit_auth() -> DeribitAuth:
+    """Общий на процесс объект авторизации"""
+    global _auth
+    if _auth is None:
+        _auth = DeribitAuth(settings.DERIBIT_CLIENT_ID, settings.DERIBIT_CLIENT_SECRET)
+    return _auth
@@ -1,16 +1,62 @@
 import asyncio
 import json
 import logging
+import random
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
 from datetime import datetime
-from typing import Any, Dict, List, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional
 
 import aiohttp
 
 from app.core.config import settings
+from app.services.deribit_auth import get_deribit_auth
+from app.services.rate_limiter import (
+    CreditBucket,
+    get_request_scheduler,
+    is_rate_limited,
+)
+from app.services.ticks import TickerDecodeError, TickerRecord, decode_ticker
 
 logger = logging.getLogger(__name__)
 
 
+class DeribitAPIError(Exception):
+    """Ошибка запроса к Deribit API"""
+
+    def __init__(
+        self, message: str, status: Optional[int] = None, retryable: bool = False
+    ):
+        super().__init__(message)
+        self.status = status
+        # Имеет ли смысл повторять запрос (таймаут, сеть, 429, 5xx)
+        self.retryable = retryable
+
+
+class DeribitTimeoutError(DeribitAPIError):
+    """Запрос не уложился в дедлайн"""
+
+    def __init__(self, message: str = "Timeout"):
+        super().__init__(message, retryable=True)
+
+
+@dataclass
+class TickerBatch:
+    """Результат сбора тикеров за цикл"""
+
+    prices: Dict[str, TickerRecord] = field(default_factory=dict)
+    failed: Dict[str, str] = field(default_factory=dict)
+    timed_out: List[str] = field(default_factory=list)
+
+    def summary(self) -> Dict[str, Any]:
+        """Сводка для логов и результата задачи"""
+        return {
+            "received": len(self.prices),
+            "failed": sorted(self.failed),
+            "timed_out": sorted(self.timed_out),
+        }
+
+
 class DeribitClient:
     """Клиент для работы с Deribit API"""
 
@@ -23,13 +69,23 @@ class DeribitClient:
         # Кэш для сессии (лучше переиспользовать)
         self._session = None
 
+        # Общий токен с WebSocket-потоком; без ключей запросы публичные
+        self.auth = get_deribit_auth()
+        self._refresher: Optional[asyncio.Task] = None
+
         logger.debug(f"DeribitClient initialized with URL: {self.base_url}")
 
     async def _get_session(self) -> aiohttp.ClientSession:
         """Получить или создать сессию"""
         if self._session is None or self._session.closed:
+            # Соединения и DNS переиспользуются между циклами сбора
+            connector = aiohttp.TCPConnector(
+                keepalive_timeout=settings.DERIBIT_KEEPALIVE_TIMEOUT,
+                ttl_dns_cache=300,
+            )
             self._session = aiohttp.ClientSession(
                 timeout=self.timeout,
+                connector=connector,
                 headers={
                     "User-Agent": "DeribitPriceCollector/1.0",
                     "Accept": "application/json",
@@ -39,98 +95,160 @@ class DeribitClient:
 
     async def close(self):
         """Закрыть сессию"""
+        if self._refresher is not None:
+            self._refresher.cancel()
+            self._refresher = None
         if self._session and not self._session.closed:
             await self._session.close()
             self._session = None
 
-    async def get_public_ticker(self, instrument_name: str) -> Optional[Dict[str, Any]]:
-        """Получение текущей цены для инструмента"""
-        url = f"{self.base_url}/api/v2/public/ticker"
-        params = {"instrument_name": instrument_name}
+    @asynccontextmanager
+    async def _public_get(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        key: Optional[str] = None,
+        timeout: Optional[float] = None,
+        authenticated: bool = True,
+        post: bool = False,
+    ) -> AsyncIterator[aiohttp.ClientResponse]:
+        """GET (или POST) public/{method} с учетом лимита кредитов Deribit.
+
+        Запрос ждет своей очереди в общем планировщике (ключ — инструмент
+        или имя метода), ответ 429 / too_many_requests замедляет всех.
+        Если заданы DERIBIT_CLIENT_ID/SECRET, запрос идет с токеном доступа.
+        post=True отправляет JSON-RPC в теле POST: параметры (секреты,
+        refresh_token) не попадают в URL и журналы доступа и прокси.
+        """
+        url = f"{self.base_url}/api/v2/public/{method}"
+        kwargs: Dict[str, Any] = {"params": params}
+        if post:
+            rpc = {"jsonrpc": "2.0", "id": 1, "method": f"public/{method}"}
+            kwargs = {"json": {**rpc, "params": params}}
+        if timeout is not None:
+            kwargs["timeout"] = aiohttp.ClientTimeout(total=timeout)
+
+        token = await self._get_token() if authenticated else None
+        if token:
+            kwargs["headers"] = {"Authorization": f"Bearer {token}"}
+
+        session = await self._get_session()
+        scheduler = get_request_scheduler()
+        async with scheduler.slot(key or method):
+            async with session.request(
+                "POST" if post else "GET", url, **kwargs
+            ) as response:
+                if response.status == 200:
+                    scheduler.bucket.reward()
+                elif response.status in (400, 429):
+                    await self._check_rate_limit(response, scheduler.bucket)
+                elif response.status == 401 and token:
+                    self.auth.invalidate()
+                yield response
+
+    async def _auth_request(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """HTTP-вызов public/auth для DeribitAuth"""
+        result = await self._get_public_result(
+            "auth", params, authenticated=False, post=True
+        )
+        return result if isinstance(result, dict) else None
 
-        logger.debug(f"Fetching ticker for {instrument_name}")
+    async def _get_token(self) -> Optional[str]:
+        """Токен доступа; при первом получении запускается фоновое обновление"""
+        if not self.auth.enabled:
+            return None
 
-        try:
-            session = await self._get_session()
-            async with session.get(url, params=params) as response:
-                logger.debug(
-                    f"Response status for {instrument_name}: {response.status}"
-                )
+        token = await self.auth.get_token(self._auth_request)
+        if token and (self._refresher is None or self._refresher.done()):
+            self._refresher = asyncio.create_task(
+                self.auth.run_refresher(self._auth_request)
+            )
+        return token
 
-                if response.status == 200:
-                    # Получаем текст ответа
-                    response_text = await response.text()
+    @staticmethod
+    async def _check_rate_limit(
+        response: aiohttp.ClientResponse, bucket: CreditBucket
+    ) -> bool:
+        """Проверка ответа на превышение лимита (тело кэшируется aiohttp)"""
+        try:
+            body = json.loads(await response.text())
+        except (json.JSONDecodeError, aiohttp.ClientError):
+            body = None
 
-                    if not response_text or len(response_text.strip()) == 0:
-                        logger.warning(f"Empty response for {instrument_name}")
-                        return None
+        if not is_rate_limited(response.status, body):
+            return False
 
-                    try:
-                        data = json.loads(response_text)
-                        logger.debug(f"JSON parsed for {instrument_name}")
+        retry_after = response.headers.get("Retry-After")
+        try:
+            bucket.penalize(float(retry_after) if retry_after else None)
+        except ValueError:
+            bucket.penalize()
+        return True
+
+    async def _fetch_ticker(
+        self, instrument_name: str, timeout: Optional[float] = None
+    ) -> TickerRecord:
+        """Один запрос public/ticker. Ошибки выбрасываются как DeribitAPIError"""
+        params = {"instrument_name": instrument_name}
 
-                    except json.JSONDecodeError as e:
-                        logger.error(f"JSON decode error for {instrument_name}: {e}")
-                        logger.debug(
-                            f"Raw response (first 500 chars): {response_text[:500]}"
-                        )
-                        return None
+        debug = logger.isEnabledFor(logging.DEBUG)
+        if debug:
+            logger.debug("Fetching ticker for %s", instrument_name)
 
-                    # Проверяем структуру ответа
-                    if "result" not in data:
-                        logger.warning(
-                            f"No 'result' field in response for {instrument_name}"
-                        )
-                        logger.debug(f"Full response: {data}")
-                        return None
-
-                    result = data["result"]
-
-                    if result is None:
-                        logger.warning(f"Result is None for {instrument_name}")
-                        return None
-
-                    if not isinstance(result, dict):
-                        logger.warning(
-                            f"Result is not a dict for {instrument_name}: {type(result)}"
-                        )
-                        return None
-
-                    # Добавляем timestamp если его нет
-                    if "timestamp" not in result:
-                        result["timestamp"] = int(datetime.now().timestamp() * 1000)
-
-                    # Логируем успех с деталями
-                    mark_price = result.get("mark_price", "N/A")
-                    volume_24h = result.get("stats", {}).get("volume_usd", 0)
-                    price_change = result.get("stats", {}).get("price_change", 0)
-
-                    logger.info(
-                        f"✅ Got ticker for {instrument_name}: "
-                        f"${mark_price:,.2f} | "
-                        f"24h Δ: {price_change:+.2f}% | "
-                        f"Vol: ${volume_24h:,.0f}"
+        try:
+            async with self._public_get(
+                "ticker", params, key=instrument_name, timeout=timeout
+            ) as response:
+                # Байты без декодирования в str: декодер читает их напрямую
+                body = await response.read()
+
+                if response.status != 200:
+                    response_text = body.decode("utf-8", errors="replace")
+                    try:
+                        error_body = json.loads(response_text)
+                    except json.JSONDecodeError:
+                        error_body = None
+                    raise DeribitAPIError(
+                        f"API error {response.status} - {response_text[:200]}",
+                        status=response.status,
+                        retryable=is_rate_limited(response.status, error_body)
+                        or response.status == 401
+                        or response.status >= 500,
                     )
 
-                    # Для отладки: выводим все доступные ключи
-                    logger.debug(f"Available keys in result: {list(result.keys())}")
-                    if "stats" in result:
-                        logger.debug(f"Stats keys: {list(result['stats'].keys())}")
+                if not body or not body.strip():
+                    raise DeribitAPIError("Empty response", retryable=True)
 
-                    return result
+        except asyncio.TimeoutError as e:
+            raise DeribitTimeoutError() from e
+        except aiohttp.ClientError as e:
+            raise DeribitAPIError(f"Network error: {e}", retryable=True) from e
 
-                else:
-                    text = await response.text() if response.status != 200 else ""
-                    logger.error(
-                        f"❌ API error for {instrument_name}: {response.status} - {text[:200]}"
-                    )
-                    return None
+        try:
+            record = decode_ticker(body, instrument_name)
+        except TickerDecodeError as e:
+            if debug:
+                logger.debug("Raw response (first 500 bytes): %r", body[:500])
+            raise DeribitAPIError(str(e)) from e
+
+        # Форматирование только если уровень включен
+        if debug:
+            logger.debug(
+                "✅ Got ticker for %s: $%.2f | 24h Δ: %+.2f%% | Vol: $%.0f",
+                instrument_name,
+                record.mark_price,
+                record.price_change or 0,
+                record.volume_usd or 0,
+            )
 
-        except asyncio.TimeoutError:
-            logger.error(f"⏰ Timeout fetching {instrument_name}")
-            return None
-        except aiohttp.ClientError as e:
-            logger.error(f"🌐 Network error fetching {instrument_name}: {e}")
+        return record
+
+    async def get_public_ticker(self, instrument_name: str) -> Optional[Dict[str, Any]]:
+        """Получение текущей цены для инструмента"""
+        try:
+            record = await self._fetch_ticker(instrument_name)
+        except DeribitAPIError as e:
+            logger.error(f"❌ Error fetching {instrument_name}: {e}")
             return None
         except Exception as e:
             logger.error(f"💥 Unexpected error fetching {instrument_name}: {e}")
@@ -139,73 +257,145 @@ class DeribitClient:
             logger.error(traceback.format_exc())
             return None
 
-    async def get_multiple_tickers(self, instruments: List[str]) -> Dict[str, Any]:
-        """Получение цен для нескольких инструментов"""
         logger.info(
-            f"📊 Fetching prices for {len(instruments)} instruments: {instruments}"
+            "✅ Got ticker for %s: $%.2f | 24h Δ: %+.2f%% | Vol: $%.0f",
+            instrument_name,
+            record.mark_price,
+            record.price_change or 0,
+            record.volume_usd or 0,
+        )
+        return record.raw
+
+    async def _fetch_ticker_with_retry(
+        self,
+        instrument_name: str,
+        deadline: float,
+        request_timeout: float,
+        max_retries: int,
+        backoff: float,
+    ) -> TickerRecord:
+        """Запрос тикера с повторами до истечения общего дедлайна цикла.
+
+        Пауза между попытками растет экспоненциально (backoff * 2^attempt)
+        со случайным джиттером, чтобы повторы не шли одновременно.
+        """
+        loop = asyncio.get_running_loop()
+        attempt = 0
+
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise DeribitTimeoutError("Cycle budget exhausted")
+
+            try:
+                return await self._fetch_ticker(
+                    instrument_name, timeout=min(request_timeout, remaining)
+                )
+            except DeribitAPIError as e:
+                if not e.retryable or attempt >= max_retries:
+                    raise
+
+                delay = random.uniform(0, backoff * (2**attempt))
+                if loop.time() + delay >= deadline:
+                    raise
+                logger.warning(
+                    f"🔁 Retry {attempt + 1}/{max_retries} for {instrument_name} "
+                    f"in {delay:.2f}s: {e}"
+                )
+                await asyncio.sleep(delay)
+                attempt += 1
+
+    async def fetch_tickers(
+        self,
+        instruments: List[str],
+        budget: Optional[float] = None,
+        request_timeout: Optional[float] = None,
+        max_retries: Optional[int] = None,
+    ) -> "TickerBatch":
+        """Получение тикеров с дедлайнами на запрос и общим бюджетом цикла.
+
+        Возвращает все, что успело прийти за бюджет, плюс списки
+        инструментов с ошибкой и не уложившихся во время.
+        """
+        budget = budget if budget is not None else settings.DERIBIT_CYCLE_BUDGET
+        request_timeout = request_timeout or settings.DERIBIT_REQUEST_TIMEOUT
+        max_retries = (
+            max_retries if max_retries is not None else settings.DERIBIT_MAX_RETRIES
         )
 
-        if not instruments:
-            logger.warning("⚠️ No instruments provided")
-            return {}
+        batch = TickerBatch()
 
         # Создаем задачи для всех инструментов
-        tasks = []
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + budget
+        tasks: Dict[asyncio.Task, str] = {}
         for instrument in instruments:
             if not instrument or not isinstance(instrument, str):
                 logger.warning(f"Invalid instrument: {instrument}")
                 continue
-            tasks.append(self.get_public_ticker(instrument))
-
-        # Выполняем параллельно с таймаутом
-        try:
-            results = await asyncio.wait_for(
-                asyncio.gather(*tasks, return_exceptions=True), timeout=30
+            task = asyncio.create_task(
+                self._fetch_ticker_with_retry(
+                    instrument,
+                    deadline,
+                    request_timeout,
+                    max_retries,
+                    settings.DERIBIT_RETRY_BACKOFF,
+                )
             )
-        except asyncio.TimeoutError:
-            logger.error("⏰ Timeout fetching multiple tickers")
-            return {}
-        except Exception as e:
-            logger.error(f"💥 Error in gather: {e}")
-            return {}
+            tasks[task] = instrument
+
+        if not tasks:
+            return batch
+
+        done, pending = await asyncio.wait(tasks, timeout=budget)
+
+        # Все, что не успело за бюджет, отменяем, но готовые результаты сохраняем
+        for task in pending:
+            task.cancel()
+            batch.timed_out.append(tasks[task])
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+        for task in done:
+            instrument = tasks[task]
+            exc = task.exception()
+            if exc is None:
+                batch.prices[instrument] = task.result()
+            elif isinstance(exc, DeribitTimeoutError):
+                batch.timed_out.append(instrument)
+            else:
+                batch.failed[instrument] = str(exc)
 
-        # Обрабатываем результаты
-        prices = {}
-        successful = 0
-        failed = 0
+        return batch
 
-        for instrument, result in zip(instruments, results):
-            if isinstance(result, Exception):
-                logger.error(f"❌ Error fetching {instrument}: {result}")
-                failed += 1
-                continue
+    async def get_multiple_tickers(self, instruments: List[str]) -> Dict[str, Any]:
+        """Получение цен для нескольких инструментов"""
+        logger.info(
+            f"📊 Fetching prices for {len(instruments)} instruments: {instruments}"
+        )
+
+        if not instruments:
+            logger.warning("⚠️ No instruments provided")
+            return {}
 
-            if result is not None:
-                prices[instrument] = result
-                successful += 1
+        batch = await self.fetch_tickers(instruments)
 
-                # Для отладки: выводим структуру первого успешного результата
-                if successful == 1:
-                    logger.debug(f"📋 Sample data structure for {instrument}:")
-                    logger.debug(f"  Top-level keys: {list(result.keys())}")
-                    if "stats" in result:
-                        logger.debug(f"  Stats: {result['stats']}")
-            else:
-                logger.warning(f"⚠️ No data for {instrument}")
-                failed += 1
+        for instrument, error in batch.failed.items():
+            logger.error(f"❌ Error fetching {instrument}: {error}")
+        if batch.timed_out:
+            logger.error(f"⏰ Timed out within cycle budget: {batch.timed_out}")
 
         logger.info(
-            f"📈 Successfully fetched {successful}/{len(instruments)} instruments "
-            f"({failed} failed)"
+            f"📈 Successfully fetched {len(batch.prices)}/{len(instruments)} instruments "
+            f"({len(batch.failed)} failed, {len(batch.timed_out)} timed out)"
         )
 
-        return prices
+        return {name: record.raw for name, record in batch.prices.items()}
 
     async def get_instruments(
         self, currency: str = "BTC", kind: str = "future"
     ) -> List[str]:
         """Получение списка доступных инструментов"""
-        url = f"{self.base_url}/api/v2/public/get_instruments"
         params = {
             "currency": currency,
             "kind": kind,
@@ -215,8 +405,7 @@ class DeribitClient:
         logger.info(f"🔍 Getting instruments for {currency} ({kind})")
 
         try:
-            session = await self._get_session()
-            async with session.get(url, params=params) as response:
+            async with self._public_get("get_instruments", params) as response:
                 if response.status == 200:
                     response_text = await response.text()
 
@@ -250,14 +439,141 @@ class DeribitClient:
             logger.error(f"Error getting instruments: {e}")
             return []
 
+    async def get_instrument_details(
+        self, currency: str = "BTC", kind: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Полные описания активных инструментов (вид, экспирация, страйк)"""
+        params = {"currency": currency, "expired": "false"}
+        if kind:
+            params["kind"] = kind
+
+        result = await self._get_public_result("get_instruments", params)
+        return result if isinstance(result, list) else []
+
+    async def _get_public_result(
+        self,
+        method: str,
+        params: Dict[str, Any],
+        authenticated: bool = True,
+        post: bool = False,
+    ) -> Optional[Any]:
+        """Запрос к public/{method}, возвращает поле result"""
+        try:
+            async with self._public_get(
+                method, params, authenticated=authenticated, post=post
+            ) as response:
+                if response.status != 200:
+                    text = await response.text()
+                    logger.error(
+                        f"❌ API error for {method}: {response.status} - {text[:200]}"
+                    )
+                    return None
+
+                response_text = await response.text()
+                if not response_text:
+                    logger.warning(f"Empty response from {method}")
+                    return None
+
+                data = json.loads(response_text)
+                if "result" not in data:
+                    logger.warning(f"No 'result' in {method} response")
+                    return None
+
+                return data["result"]
+
+        except asyncio.TimeoutError:
+            logger.error(f"⏰ Timeout calling {method}")
+            return None
+        except json.JSONDecodeError as e:
+            logger.error(f"JSON decode error for {method}: {e}")
+            return None
+        except aiohttp.ClientError as e:
+            logger.error(f"🌐 Network error calling {method}: {e}")
+            return None
+
+    async def get_book_summary_by_currency(
+        self, currency: str = "BTC", kind: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Сводка по всем инструментам валюты одним запросом"""
+        params = {"currency": currency}
+        if kind:
+            params["kind"] = kind
+
+        result = await self._get_public_result("get_book_summary_by_currency", params)
+        if not isinstance(result, list):
+            return []
+
+        logger.info(
+            f"📚 Book summary for {currency} ({kind or 'all'}): {len(result)} instruments"
+        )
+        return result
+
+    async def get_index_price(self, index_name: str) -> Optional[Dict[str, Any]]:
+        """Текущее значение индекса (например, btc_usd)"""
+        result = await self._get_public_result(
+            "get_index_price", {"index_name": index_name}
+        )
+        return result if isinstance(result, dict) else None
+
+    async def get_market_snapshot(
+        self,
+        currencies: List[str],
+        kinds: Optional[List[str]] = None,
+        indices: Optional[List[str]] = None,
+    ) -> Dict[str, TickerRecord]:
+        """Снимок всего рынка: один запрос на пару валюта/тип плюс индексы.
+
+        Результат имеет ту же форму, что и fetch_tickers().prices:
+        {instrument_name: TickerRecord}, исходные данные в формате
+        public/ticker лежат в ``raw``.
+        """
+        kinds = kinds or [None]
+        indices = indices or []
+
+        summary_requests = [
+            (currency, kind) for currency in currencies for kind in kinds
+        ]
+        tasks = [
+            self.get_book_summary_by_currency(currency, kind)
+            for currency, kind in summary_requests
+        ]
+        tasks.extend(self.get_index_price(index_name) for index_name in indices)
+
+        results = await asyncio.gather(*tasks, return_exceptions=True)
+
+        snapshot: Dict[str, TickerRecord] = {}
+        for (currency, kind), result in zip(
+            summary_requests, results[: len(summary_requests)]
+        ):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error fetching book summary {currency}/{kind}: {result}")
+                continue
+            for item in result:
+                ticker = normalize_book_summary(item)
+                if ticker is not None:
+                    snapshot[ticker["instrument_name"]] = TickerRecord.from_dict(ticker)
+
+        for index_name, result in zip(indices, results[len(summary_requests) :]):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Error fetching index {index_name}: {result}")
+                continue
+            ticker = normalize_index_price(index_name, result)
+            if ticker is not None:
+                snapshot[index_name] = TickerRecord.from_dict(ticker)
+
+        logger.info(
+            f"📈 Market snapshot: {len(snapshot)} instruments in {len(tasks)} requests"
+        )
+        return snapshot
+
     async def get_historical_volatility(self, instrument_name: str) -> Optional[float]:
         """Получение исторической волатильности"""
-        url = f"{self.base_url}/api/v2/public/get_historical_volatility"
         params = {"currency": instrument_name.split("-")[0]}
 
         try:
-            session = await self._get_session()
-            async with session.get(url, params=params) as response:
+            async with self._public_get(
+                "get_historical_volatility", params
+            ) as response:
                 if response.status == 200:
                     data = json.loads(await response.text())
                     if "result" in data and data["result"]:
@@ -276,6 +592,52 @@ class DeribitClient:
         await self.close()
 
 
+def normalize_book_summary(item: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Приведение элемента get_book_summary_by_currency к формату public/ticker"""
+    if not isinstance(item, dict) or item.get("mark_price") is None:
+        return None
+
+    return {
+        "instrument_name": item["instrument_name"],
+        "timestamp": item.get("creation_timestamp")
+        or int(datetime.now().timestamp() * 1000),
+        "mark_price": item["mark_price"],
+        "mark_iv": item.get("mark_iv"),
+        "index_price": item.get("estimated_delivery_price"),
+        "underlying_price": item.get("underlying_price"),
+        "last_price": item.get("last"),
+        "best_bid_price": item.get("bid_price"),
+        "best_ask_price": item.get("ask_price"),
+        "open_interest": item.get("open_interest"),
+        "current_funding": item.get("current_funding"),
+        "funding_8h": item.get("funding_8h"),
+        "stats": {
+            "volume": item.get("volume"),
+            "volume_usd": item.get("volume_usd"),
+            "price_change": item.get("price_change"),
+            "high": item.get("high"),
+            "low": item.get("low"),
+        },
+    }
+
+
+def normalize_index_price(
+    index_name: str, result: Optional[Dict[str, Any]]
+) -> Optional[Dict[str, Any]]:
+    """Приведение ответа get_index_price к формату public/ticker"""
+    if not result or result.get("index_price") is None:
+        return None
+
+    return {
+        "instrument_name": index_name,
+        "timestamp": int(datetime.now().timestamp() * 1000),
+        "mark_price": result["index_price"],
+        "index_price": result["index_price"],
+        "estimated_delivery_price": result.get("estimated_delivery_price"),
+        "stats": {},
+    }
+
+
 # Утилита для быстрого тестирования
 async def test_deribit_client():
     """Тестирование клиента"""
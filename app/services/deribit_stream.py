@@ -0,0 +1,299 @@
+import asyncio
+import inspect
+import json
+import logging
+import random
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Union
+
+import aiohttp
+
+from app.core.config import settings
+from app.services.deribit_auth import get_deribit_auth
+from app.services.ticks import TickerRecord
+
+logger = logging.getLogger(__name__)
+
+# Обработчик тика: on_tick(record), может быть корутиной
+TickHandler = Callable[[TickerRecord], Union[None, Awaitable[None]]]
+
+
+class DeribitRPCError(Exception):
+    """Ошибка JSON-RPC ответа Deribit"""
+
+    def __init__(self, method: str, error: Dict[str, Any]):
+        self.method = method
+        self.code = error.get("code")
+        self.error = error
+        super().__init__(f"{method}: {error.get('message')} (code {self.code})")
+
+
+class DeribitStreamClient:
+    """Потоковый клиент Deribit поверх JSON-RPC WebSocket.
+
+    Держит одно долгоживущее соединение, подписывается на каналы
+    ``ticker.{instrument}.{interval}`` и передает каждый тик в ``on_tick``.
+    При обрыве соединения переподключается с экспоненциальной задержкой
+    и заново оформляет подписки.
+
+    Интервал ``raw`` на Deribit доступен только авторизованным соединениям:
+    при заданных DERIBIT_CLIENT_ID/SECRET соединение авторизуется через
+    public/auth и продлевает токен до истечения.
+    """
+
+    def __init__(
+        self,
+        instruments: List[str],
+        on_tick: TickHandler,
+        interval: Optional[str] = None,
+        ws_url: Optional[str] = None,
+        heartbeat_interval: Optional[int] = None,
+        max_reconnect_delay: Optional[float] = None,
+    ):
+        self.instruments = list(instruments)
+        self.on_tick = on_tick
+        self.interval = interval or settings.STREAM_TICKER_INTERVAL
+        self.ws_url = ws_url or settings.DERIBIT_WS_URL
+        self.heartbeat_interval = (
+            heartbeat_interval
+            if heartbeat_interval is not None
+            else settings.STREAM_HEARTBEAT_INTERVAL
+        )
+        self.max_reconnect_delay = (
+            max_reconnect_delay
+            if max_reconnect_delay is not None
+            else settings.STREAM_MAX_RECONNECT_DELAY
+        )
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._ws: Optional[aiohttp.ClientWebSocketResponse] = None
+        self._request_id = 0
+        self._pending: Dict[int, asyncio.Future] = {}
+        self._stopping = asyncio.Event()
+
+        # Общий с HTTP-клиентом токен; нужен для интервала raw
+        self.auth = get_deribit_auth()
+        self._reauth_task: Optional[asyncio.Task] = None
+
+        # Счетчики для мониторинга
+        self.ticks_received = 0
+        self.reconnects = 0
+
+        logger.debug(f"DeribitStreamClient initialized with URL: {self.ws_url}")
+
+    @property
+    def channels(self) -> List[str]:
+        """Каналы подписки для всех инструментов"""
+        return [f"ticker.{name}.{self.interval}" for name in self.instruments]
+
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Получить или создать HTTP-сессию для WebSocket"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                headers={"User-Agent": "DeribitPriceCollector/1.0"}
+            )
+        return self._session
+
+    async def call(
+        self, method: str, params: Optional[Dict[str, Any]] = None, timeout: float = 10
+    ) -> Any:
+        """JSON-RPC вызов через открытое соединение"""
+        if self._ws is None or self._ws.closed:
+            raise ConnectionError("WebSocket is not connected")
+
+        self._request_id += 1
+        request_id = self._request_id
+        future = asyncio.get_running_loop().create_future()
+        self._pending[request_id] = future
+
+        await self._ws.send_str(
+            json.dumps(
+                {
+                    "jsonrpc": "2.0",
+                    "id": request_id,
+                    "method": method,
+                    "params": params or {},
+                }
+            )
+        )
+        try:
+            return await asyncio.wait_for(future, timeout=timeout)
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def _auth_request(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """public/auth на этом соединении для DeribitAuth"""
+        try:
+            result = await self.call("public/auth", params)
+        except DeribitRPCError as e:
+            # DeribitAuth повторит вход по client_credentials
+            logger.warning(f"🔑 Stream authentication rejected: {e}")
+            return None
+        return result if isinstance(result, dict) else None
+
+    async def _authenticate(self):
+        """public/auth на этом соединении; новая пара токенов общая с HTTP"""
+        # Соединение авторизуется само, но не одновременно с HTTP-клиентом
+        if not await self.auth.authenticate(self._auth_request, lambda: True):
+            raise ConnectionError("Deribit stream authentication failed")
+
+    async def _keep_authenticated(self):
+        """Продление авторизации соединения до истечения токена"""
+        while True:
+            await asyncio.sleep(self.auth.refresh_in)
+            try:
+                await self._authenticate()
+            except Exception as e:
+                logger.warning(f"🔑 Stream re-authentication failed: {e}")
+                await asyncio.sleep(5)
+
+    async def _on_connected(self):
+        """Настройка соединения: авторизация, heartbeat и подписки"""
+        if self.auth.enabled:
+            await self._authenticate()
+            self._reauth_task = asyncio.create_task(self._keep_authenticated())
+
+        if self.heartbeat_interval:
+            await self.call(
+                "public/set_heartbeat", {"interval": self.heartbeat_interval}
+            )
+
+        subscribed = await self.call("public/subscribe", {"channels": self.channels})
+        logger.info(f"📡 Subscribed to {len(subscribed or [])} channels: {subscribed}")
+
+    async def _dispatch(self, message: Dict[str, Any]):
+        """Обработка входящего сообщения"""
+        # Ответ на наш запрос
+        if "id" in message and message["id"] in self._pending:
+            future = self._pending[message["id"]]
+            if not future.done():
+                if "error" in message:
+                    future.set_exception(
+                        DeribitRPCError(str(message["id"]), message["error"])
+                    )
+                else:
+                    future.set_result(message.get("result"))
+            return
+
+        method = message.get("method")
+
+        if method == "subscription":
+            params = message.get("params") or {}
+            channel = params.get("channel", "")
+            data = params.get("data")
+            if not isinstance(data, dict) or not channel.startswith("ticker."):
+                return
+
+            instrument_name = data.get("instrument_name") or channel.split(".")[1]
+            record = TickerRecord.from_dict(data, instrument_name)
+            if record is None:
+                return
+            self.ticks_received += 1
+
+            result = self.on_tick(record)
+            if inspect.isawaitable(result):
+                await result
+
+        elif method == "heartbeat":
+            # Сервер проверяет, что мы живы
+            if (message.get("params") or {}).get("type") == "test_request":
+                asyncio.create_task(self._answer_heartbeat())
+
+    async def _answer_heartbeat(self):
+        try:
+            await self.call("public/test")
+        except Exception as e:
+            logger.warning(f"💔 Heartbeat reply failed: {e}")
+
+    async def _read_loop(self):
+        """Чтение сообщений до закрытия соединения"""
+        async for msg in self._ws:
+            if msg.type == aiohttp.WSMsgType.TEXT:
+                try:
+                    message = json.loads(msg.data)
+                except json.JSONDecodeError as e:
+                    logger.error(f"JSON decode error in stream: {e}")
+                    continue
+                try:
+                    await self._dispatch(message)
+                except Exception as e:
+                    logger.error(f"💥 Error handling stream message: {e}")
+            elif msg.type in (aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                break
+
+    def _fail_pending(self, exc: Exception):
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(exc)
+        self._pending.clear()
+
+    async def run(self):
+        """Основной цикл: подключение, подписка, чтение, переподключение"""
+        if not self.instruments:
+            logger.warning("⚠️ No instruments provided for streaming")
+            return
+
+        delay = 1.0
+        session = await self._get_session()
+
+        while not self._stopping.is_set():
+            try:
+                logger.info(f"🔌 Connecting to {self.ws_url}")
+                async with session.ws_connect(
+                    self.ws_url, heartbeat=self.heartbeat_interval or None
+                ) as ws:
+                    self._ws = ws
+                    reader = asyncio.create_task(self._read_loop())
+                    try:
+                        await self._on_connected()
+                        delay = 1.0
+                        await reader
+                    finally:
+                        reader.cancel()
+                        if self._reauth_task is not None:
+                            self._reauth_task.cancel()
+                            self._reauth_task = None
+                        self._ws = None
+
+                if not self._stopping.is_set():
+                    logger.warning("🔌 Stream connection closed by server")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"🌐 Stream error: {e}")
+
+            self._fail_pending(ConnectionError("WebSocket connection lost"))
+
+            if self._stopping.is_set():
+                break
+
+            # Экспоненциальная задержка с джиттером перед переподключением
+            self.reconnects += 1
+            sleep_for = delay + random.uniform(0, delay / 2)
+            logger.info(f"🔄 Reconnecting in {sleep_for:.1f}s")
+            try:
+                await asyncio.wait_for(self._stopping.wait(), timeout=sleep_for)
+            except asyncio.TimeoutError:
+                pass
+            delay = min(delay * 2, self.max_reconnect_delay)
+
+    async def stop(self):
+        """Остановка потока и закрытие соединения"""
+        self._stopping.set()
+        if self._ws is not None and not self._ws.closed:
+            await self._ws.close()
+
+    async def close(self):
+        """Закрыть сессию"""
+        await self.stop()
+        if self._session and not self._session.closed:
+            await self._session.close()
+            self._session = None
+
+    async def __aenter__(self):
+        """Контекстный менеджер"""
+        return self
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        """Закрытие соединения при выходе из контекста"""
+        await self.close()
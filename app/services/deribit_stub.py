@@ -0,0 +1,458 @@
+"""Локальный заменитель Deribit API для офлайн-тестирования.
+
+Поднимает HTTP (``/api/v2/public/ticker``) и JSON-RPC WebSocket
+(``/ws/api/v2``) с синтетическими тикерами (случайное блуждание цены).
+
+Запуск:
+    python -m app.services.deribit_stub --port 8765
+
+Затем в .env:
+    DERIBIT_WS_URL=ws://127.0.0.1:8765/ws/api/v2
+    DERIBIT_BASE_URL=http://127.0.0.1:8765
+"""
+
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from aiohttp import WSMsgType, web
+
+logger = logging.getLogger(__name__)
+
+# Стартовые цены для синтетических инструментов
+BASE_PRICES = {"BTC": 97000.0, "ETH": 3400.0, "SOL": 190.0}
+
+INTERVALS = {"100ms": 0.1, "raw": 0.02, "agg2": 1.0}
+
+FUTURE_EXPIRIES = ["27DEC26", "26MAR27", "25JUN27"]
+
+
+class StubMarket:
+    """Синтетический рынок: по одному случайному блужданию на инструмент"""
+
+    def __init__(self, seed: Optional[int] = None, strikes_per_expiry: int = 20):
+        self._random = random.Random(seed)
+        self._prices: Dict[str, float] = {}
+        self.strikes_per_expiry = strikes_per_expiry
+
+    def instruments(self, currency: str, kind: Optional[str] = None) -> List[str]:
+        """Синтетический список инструментов валюты"""
+        currency = currency.upper()
+        base = BASE_PRICES.get(currency, 100.0)
+        names = []
+        if kind in (None, "future"):
+            names.append(f"{currency}-PERPETUAL")
+            names.extend(f"{currency}-{expiry}" for expiry in FUTURE_EXPIRIES)
+        if kind in (None, "option"):
+            step = base * 0.02
+            for expiry in FUTURE_EXPIRIES:
+                for i in range(self.strikes_per_expiry // 2):
+                    strike = int(base + (i - self.strikes_per_expiry // 4) * step)
+                    names.append(f"{currency}-{expiry}-{strike}-C")
+                    names.append(f"{currency}-{expiry}-{strike}-P")
+        return names
+
+    def book_summary(self, instrument_name: str) -> Dict[str, Any]:
+        """Элемент get_book_summary_by_currency"""
+        ticker = self.ticker(instrument_name)
+        summary = {
+            "instrument_name": instrument_name,
+            "creation_timestamp": ticker["timestamp"],
+            "mark_price": ticker["mark_price"],
+            "estimated_delivery_price": ticker["index_price"],
+            "last": ticker["last_price"],
+            "bid_price": ticker["best_bid_price"],
+            "ask_price": ticker["best_ask_price"],
+            "open_interest": ticker["open_interest"],
+            "volume": ticker["stats"]["volume"],
+            "volume_usd": ticker["stats"]["volume_usd"],
+            "price_change": ticker["stats"]["price_change"],
+            "high": ticker["stats"]["high"],
+            "low": ticker["stats"]["low"],
+            "base_currency": instrument_name.split("-")[0],
+            "quote_currency": "USD",
+        }
+        if instrument_name.endswith(("-C", "-P")):
+            summary["mark_iv"] = round(50 + self._random.random() * 10, 2)
+            summary["underlying_price"] = ticker["index_price"]
+        return summary
+
+    def ticker(self, instrument_name: str) -> Dict[str, Any]:
+        """Снимок тикера в формате public/ticker"""
+        currency = instrument_name.split("-")[0].split("_")[0].upper()
+        base = BASE_PRICES.get(currency, 100.0)
+        price = self._prices.get(instrument_name, base)
+        price *= 1 + self._random.gauss(0, 0.0002)
+        self._prices[instrument_name] = price
+
+        spread = price * 0.0001
+        volume = 10000 + self._random.random() * 1000
+        return {
+            "timestamp": int(time.time() * 1000),
+            "instrument_name": instrument_name,
+            "state": "open",
+            "mark_price": round(price, 2),
+            "index_price": round(price * 0.9999, 2),
+            "last_price": round(price, 2),
+            "best_bid_price": round(price - spread, 2),
+            "best_ask_price": round(price + spread, 2),
+            "best_bid_amount": 1000.0,
+            "best_ask_amount": 1200.0,
+            "open_interest": 50000000.0,
+            "current_funding": 0.0,
+            "funding_8h": 0.00001,
+            "min_price": round(price * 0.97, 2),
+            "max_price": round(price * 1.03, 2),
+            "stats": {
+                "volume": round(volume, 4),
+                "volume_usd": round(volume * price, 2),
+                "price_change": round((price / base - 1) * 100, 4),
+                "high": round(max(price, base), 2),
+                "low": round(min(price, base), 2),
+            },
+        }
+
+
+class StubServer:
+    """HTTP + WebSocket заменитель Deribit"""
+
+    def __init__(
+        self,
+        seed: Optional[int] = None,
+        drop_after: int = 0,
+        error_rate: float = 0.0,
+        tail_rate: float = 0.0,
+        tail_latency: float = 0.0,
+        rate_limit: float = 0.0,
+        burst: int = 100,
+        token_ttl: int = 900,
+    ):
+        self.market = StubMarket(seed)
+        self._random = random.Random(seed)
+        # Разрывать WebSocket после N уведомлений (проверка переподключения)
+        self.drop_after = drop_after
+        # Доля HTTP-ответов 503 и доля медленных ответов (хвостовые задержки)
+        self.error_rate = error_rate
+        self.tail_rate = tail_rate
+        self.tail_latency = tail_latency
+        # Лимит запросов в секунду как у Deribit (0 — без лимита)
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self._tokens = float(burst)
+        self._tokens_updated = time.monotonic()
+        self.rejected = 0
+        # Выданные токены public/auth: access -> refresh
+        self.token_ttl = token_ttl
+        self._tokens_issued: Dict[str, str] = {}
+        self.app = web.Application()
+        self.app.router.add_get("/ws/api/v2", self.handle_ws)
+        self.app.router.add_get("/api/v2/public/ticker", self.handle_ticker)
+        self.app.router.add_get("/api/v2/public/test", self.handle_test)
+        self.app.router.add_post("/api/v2/public/auth", self.handle_auth)
+        self.app.router.add_get(
+            "/api/v2/public/get_book_summary_by_currency", self.handle_book_summary
+        )
+        self.app.router.add_get("/api/v2/public/get_index_price", self.handle_index)
+        self.app.router.add_get(
+            "/api/v2/public/get_instruments", self.handle_instruments
+        )
+
+    @staticmethod
+    def _envelope(result: Any, request_id: Any = None) -> Dict[str, Any]:
+        usec = int(time.time() * 1_000_000)
+        return {
+            "jsonrpc": "2.0",
+            "id": request_id,
+            "result": result,
+            "usIn": usec,
+            "usOut": usec,
+            "usDiff": 0,
+            "testnet": True,
+        }
+
+    def _over_limit(self) -> bool:
+        if not self.rate_limit:
+            return False
+        now = time.monotonic()
+        self._tokens = min(
+            self.burst, self._tokens + (now - self._tokens_updated) * self.rate_limit
+        )
+        self._tokens_updated = now
+        if self._tokens < 1:
+            self.rejected += 1
+            return True
+        self._tokens -= 1
+        return False
+
+    def issue_token(self, params: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """public/auth: client_credentials или refresh_token"""
+        grant_type = params.get("grant_type")
+        if grant_type == "client_credentials":
+            if not params.get("client_id") or not params.get("client_secret"):
+                return None
+        elif grant_type == "refresh_token":
+            refresh = params.get("refresh_token")
+            stale = [a for a, r in self._tokens_issued.items() if r == refresh]
+            if not stale:
+                return None
+            for access in stale:
+                del self._tokens_issued[access]
+        else:
+            return None
+
+        access = f"stub-access-{self._random.getrandbits(64):016x}"
+        refresh = f"stub-refresh-{self._random.getrandbits(64):016x}"
+        self._tokens_issued[access] = refresh
+        return {
+            "access_token": access,
+            "refresh_token": refresh,
+            "expires_in": self.token_ttl,
+            "scope": "connection mainaccount",
+            "token_type": "bearer",
+        }
+
+    def _check_bearer(self, request: web.Request) -> Optional[web.Response]:
+        header = request.headers.get("Authorization", "")
+        if header.startswith("Bearer ") and header[7:] not in self._tokens_issued:
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 13009, "message": "unauthorized"}},
+                status=401,
+            )
+        return None
+
+    async def handle_auth(self, request: web.Request) -> web.Response:
+        # JSON-RPC в теле POST, как отправляет клиент
+        body = await request.json()
+        result = self.issue_token(body.get("params") or {})
+        if result is None:
+            return web.json_response(
+                {
+                    "jsonrpc": "2.0",
+                    "error": {"code": 13004, "message": "invalid_credentials"},
+                },
+                status=400,
+            )
+        return web.json_response(self._envelope(result))
+
+    async def _simulate_faults(self) -> Optional[web.Response]:
+        if self._over_limit():
+            return web.json_response(
+                {
+                    "jsonrpc": "2.0",
+                    "error": {"code": 10028, "message": "too_many_requests"},
+                },
+                status=429,
+            )
+        if self.tail_rate and self._random.random() < self.tail_rate:
+            await asyncio.sleep(self.tail_latency)
+        if self.error_rate and self._random.random() < self.error_rate:
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": 11098, "message": "unavailable"}},
+                status=503,
+            )
+        return None
+
+    async def handle_ticker(self, request: web.Request) -> web.Response:
+        fault = self._check_bearer(request) or await self._simulate_faults()
+        if fault is not None:
+            return fault
+
+        instrument_name = request.query.get("instrument_name")
+        if not instrument_name:
+            return web.json_response(
+                {"jsonrpc": "2.0", "error": {"code": -32602, "message": "Invalid params"}},
+                status=400,
+            )
+        return web.json_response(self._envelope(self.market.ticker(instrument_name)))
+
+    async def handle_test(self, request: web.Request) -> web.Response:
+        return web.json_response(self._envelope({"version": "stub"}))
+
+    async def handle_book_summary(self, request: web.Request) -> web.Response:
+        fault = await self._simulate_faults()
+        if fault is not None:
+            return fault
+
+        names = self.market.instruments(
+            request.query.get("currency", "BTC"), request.query.get("kind")
+        )
+        return web.json_response(
+            self._envelope([self.market.book_summary(name) for name in names])
+        )
+
+    async def handle_index(self, request: web.Request) -> web.Response:
+        fault = await self._simulate_faults()
+        if fault is not None:
+            return fault
+
+        index_name = request.query.get("index_name", "btc_usd")
+        perpetual = f"{index_name.split('_')[0].upper()}-PERPETUAL"
+        price = self.market.ticker(perpetual)["index_price"]
+        return web.json_response(
+            self._envelope({"index_price": price, "estimated_delivery_price": price})
+        )
+
+    async def handle_instruments(self, request: web.Request) -> web.Response:
+        fault = await self._simulate_faults()
+        if fault is not None:
+            return fault
+
+        currency = request.query.get("currency", "BTC").upper()
+        kind = request.query.get("kind")
+        result = []
+        for name in self.market.instruments(currency, kind):
+            parts = name.split("-")
+            is_option = name.endswith(("-C", "-P"))
+            result.append(
+                {
+                    "instrument_name": name,
+                    "kind": "option" if is_option else "future",
+                    "base_currency": currency,
+                    "quote_currency": "USD",
+                    "settlement_period": "perpetual" if parts[1] == "PERPETUAL" else "month",
+                    "strike": float(parts[2]) if is_option else None,
+                    "option_type": ("call" if parts[3] == "C" else "put")
+                    if is_option
+                    else None,
+                    "expiration_timestamp": 32503680000000
+                    if parts[1] == "PERPETUAL"
+                    else int(time.time() * 1000) + 90 * 86400 * 1000,
+                    "is_active": True,
+                }
+            )
+        return web.json_response(self._envelope(result))
+
+    async def handle_ws(self, request: web.Request) -> web.WebSocketResponse:
+        ws = web.WebSocketResponse()
+        await ws.prepare(request)
+
+        publishers: Dict[str, asyncio.Task] = {}
+        sent = {"count": 0}
+
+        async def publish(channel: str):
+            _, instrument_name, interval = channel.split(".", 2)
+            period = INTERVALS.get(interval, 0.1)
+            while not ws.closed:
+                await ws.send_str(
+                    json.dumps(
+                        {
+                            "jsonrpc": "2.0",
+                            "method": "subscription",
+                            "params": {
+                                "channel": channel,
+                                "data": self.market.ticker(instrument_name),
+                            },
+                        }
+                    )
+                )
+                sent["count"] += 1
+                if self.drop_after and sent["count"] >= self.drop_after:
+                    logger.info("✂️ Dropping stub connection")
+                    await ws.close()
+                    return
+                await asyncio.sleep(period)
+
+        try:
+            async for msg in ws:
+                if msg.type != WSMsgType.TEXT:
+                    continue
+                request_data = json.loads(msg.data)
+                method = request_data.get("method")
+                params = request_data.get("params") or {}
+                request_id = request_data.get("id")
+
+                if method == "public/subscribe":
+                    channels = [
+                        c for c in params.get("channels", []) if c.startswith("ticker.")
+                    ]
+                    for channel in channels:
+                        if channel not in publishers:
+                            publishers[channel] = asyncio.create_task(publish(channel))
+                    await ws.send_json(self._envelope(channels, request_id))
+                elif method == "public/unsubscribe":
+                    channels = params.get("channels", [])
+                    for channel in channels:
+                        task = publishers.pop(channel, None)
+                        if task:
+                            task.cancel()
+                    await ws.send_json(self._envelope(channels, request_id))
+                elif method == "public/ticker":
+                    ticker = self.market.ticker(params.get("instrument_name", ""))
+                    await ws.send_json(self._envelope(ticker, request_id))
+                elif method == "public/auth":
+                    result = self.issue_token(params)
+                    if result is None:
+                        await ws.send_json(
+                            {
+                                "jsonrpc": "2.0",
+                                "id": request_id,
+                                "error": {"code": 13004, "message": "invalid_credentials"},
+                            }
+                        )
+                    else:
+                        await ws.send_json(self._envelope(result, request_id))
+                elif method in ("public/set_heartbeat", "public/test"):
+                    await ws.send_json(self._envelope("ok", request_id))
+                else:
+                    await ws.send_json(
+                        {
+                            "jsonrpc": "2.0",
+                            "id": request_id,
+                            "error": {"code": -32601, "message": "Method not found"},
+                        }
+                    )
+        finally:
+            for task in publishers.values():
+                task.cancel()
+
+        return ws
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8765) -> web.AppRunner:
+        """Запуск сервера в текущем event loop"""
+        runner = web.AppRunner(self.app)
+        await runner.setup()
+        site = web.TCPSite(runner, host, port)
+        await site.start()
+        logger.info(f"🧪 Deribit stub listening on http://{host}:{port}")
+        return runner
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Deribit API stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--seed", type=int, default=None)
+    parser.add_argument(
+        "--drop-after",
+        type=int,
+        default=0,
+        help="Close each WebSocket after N notifications (reconnect testing)",
+    )
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--tail-rate", type=float, default=0.0)
+    parser.add_argument("--tail-latency", type=float, default=0.0)
+    parser.add_argument(
+        "--rate-limit", type=float, default=0.0, help="Requests per second (429 above)"
+    )
+    parser.add_argument("--token-ttl", type=int, default=900)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    server = StubServer(
+        seed=args.seed,
+        drop_after=args.drop_after,
+        error_rate=args.error_rate,
+        tail_rate=args.tail_rate,
+        tail_latency=args.tail_latency,
+        rate_limit=args.rate_limit,
+        token_ttl=args.token_ttl,
+    )
+    web.run_app(server.app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
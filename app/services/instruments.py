@@ -0,0 +1,193 @@
+"""Справочник инструментов и кэш name -> id для записи в prices.
+
+prices ссылается на instruments по целочисленному id вместо строки
+с именем. InstrumentRegistry держит соответствие в памяти процесса;
+неизвестные имена регистрируются отдельной короткой транзакцией, чтобы
+id оставался действительным даже при откате пачки тиков.
+"""
+
+import logging
+import threading
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Union
+
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.engine import Connection, Engine
+from sqlalchemy.orm import Session
+
+from app.db.models import Instrument
+
+logger = logging.getLogger(__name__)
+
+# Бессрочные инструменты Deribit отдают expiration_timestamp в 3000 году
+PERPETUAL_EXPIRATION_MS = 32503680000000
+
+
+def _parse_expiry(code: str) -> Optional[datetime]:
+    """27DEC26 -> 2026-12-27 08:00 UTC (время экспирации Deribit)"""
+    try:
+        day = datetime.strptime(code.upper(), "%d%b%y")
+    except ValueError:
+        return None
+    return day.replace(hour=8, tzinfo=timezone.utc)
+
+
+def parse_instrument_name(name: str) -> Dict[str, Any]:
+    """Вид, валюта, экспирация и страйк по имени инструмента Deribit"""
+    info: Dict[str, Any] = {
+        "name": name,
+        "kind": None,
+        "currency": None,
+        "expiry": None,
+        "strike": None,
+    }
+
+    if "-" not in name:
+        # Индексы (btc_usd) и спотовые пары (BTC_USDC)
+        base = name.split("_")[0]
+        info["kind"] = "index" if name.islower() else "spot"
+        info["currency"] = base.upper()
+        return info
+
+    parts = name.split("-")
+    info["currency"] = parts[0].split("_")[0].upper()
+
+    if len(parts) == 4 and parts[3] in ("C", "P"):
+        info["kind"] = "option"
+        info["expiry"] = _parse_expiry(parts[1])
+        try:
+            info["strike"] = float(parts[2].replace("d", "."))
+        except ValueError:
+            pass
+    else:
+        info["kind"] = "future"
+        if parts[1] != "PERPETUAL":
+            info["expiry"] = _parse_expiry(parts[1])
+    return info
+
+
+def instrument_from_api(item: Dict[str, Any]) -> Dict[str, Any]:
+    """Строка instruments из элемента public/get_instruments"""
+    info = parse_instrument_name(item["instrument_name"])
+
+    expiration = item.get("expiration_timestamp")
+    if expiration and expiration < PERPETUAL_EXPIRATION_MS:
+        info["expiry"] = datetime.fromtimestamp(expiration / 1000, tz=timezone.utc)
+    if item.get("kind"):
+        info["kind"] = item["kind"]
+    if item.get("base_currency"):
+        info["currency"] = item["base_currency"]
+    if item.get("strike") is not None:
+        info["strike"] = item["strike"]
+    return info
+
+
+Bind = Union[Engine, Connection, Session]
+
+
+def _engine(bind: Bind) -> Engine:
+    if isinstance(bind, Session):
+        bind = bind.get_bind()
+    if isinstance(bind, Connection):
+        return bind.engine
+    return bind
+
+
+class InstrumentRegistry:
+    """Кэш instrument name -> id (потокобезопасный, общий на процесс)"""
+
+    def __init__(self):
+        self._ids: Dict[str, int] = {}
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._ids)
+
+    def cached_id(self, name: str) -> Optional[int]:
+        return self._ids.get(name)
+
+    def clear(self):
+        with self._lock:
+            self._ids.clear()
+
+    def resolve(self, bind: Bind, names: Iterable[str]) -> Dict[str, int]:
+        """id для всех имен; новые инструменты регистрируются в БД"""
+        names = set(names)
+        missing = [name for name in names if name not in self._ids]
+        if missing:
+            self._load(_engine(bind), missing)
+        return {name: self._ids[name] for name in names}
+
+    def names(self, ids: Iterable[int]) -> Dict[int, str]:
+        """Имена по id из кэша процесса"""
+        ids = set(ids)
+        return {
+            instrument_id: name
+            for name, instrument_id in self._ids.items()
+            if instrument_id in ids
+        }
+
+    def get_id(self, bind: Bind, name: str) -> int:
+        instrument_id = self._ids.get(name)
+        if instrument_id is None:
+            instrument_id = self.resolve(bind, [name])[name]
+        return instrument_id
+
+    def _load(self, engine: Engine, names: List[str]):
+        with self._lock:
+            names = [name for name in names if name not in self._ids]
+            if not names:
+                return
+
+            with engine.begin() as connection:
+                # Параллельные процессы могут вставить то же имя — ON CONFLICT
+                connection.execute(
+                    insert(Instrument)
+                    .values([parse_instrument_name(name) for name in names])
+                    .on_conflict_do_nothing(index_elements=["name"])
+                )
+                rows = connection.execute(
+                    select(Instrument.name, Instrument.id).where(
+                        Instrument.name.in_(names)
+                    )
+                )
+                self._ids.update({name: instrument_id for name, instrument_id in rows})
+
+        logger.info(f"🏷️ Registered {len(names)} instruments")
+
+    def sync(self, bind: Bind, items: Iterable[Dict[str, Any]]) -> int:
+        """Обновить справочник по ответу public/get_instruments"""
+        rows = [instrument_from_api(item) for item in items if "instrument_name" in item]
+        if not rows:
+            return 0
+
+        statement = insert(Instrument).values(rows)
+        statement = statement.on_conflict_do_update(
+            index_elements=["name"],
+            set_={
+                "kind": statement.excluded.kind,
+                "currency": statement.excluded.currency,
+                "expiry": statement.excluded.expiry,
+                "strike": statement.excluded.strike,
+            },
+        ).returning(Instrument.name, Instrument.id)
+
+        with self._lock:
+            with _engine(bind).begin() as connection:
+                result = connection.execute(statement)
+                self._ids.update({name: instrument_id for name, instrument_id in result})
+        return len(rows)
+
+
+_registry: Optional[InstrumentRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_instrument_registry() -> InstrumentRegistry:
+    """Общий на процесс кэш инструментов"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = InstrumentRegistry()
+        return _registry
@@ -0,0 +1,197 @@
+"""Кэш последнего тика по инструменту в Redis.
+
+Писатели (bulk_insert_prices) после commit кладут самый свежий тик пачки
+в хэш ``prices:latest`` (поле — имя инструмента, значение — JSON). Скрипт
+Lua сравнивает время биржи, поэтому параллельные писатели и повторная
+запись старых тиков не откатывают цену назад. Эндпоинты последней цены
+отвечают из кэша и читают БД только при промахе, заодно заполняя кэш.
+
+Кэш вспомогательный: при недоступном Redis запись тиков продолжается, а
+API читает БД. Хэш живет LATEST_CACHE_TTL секунд после последней записи,
+так что остановленный коллектор не оставляет кэш навсегда.
+"""
+
+import json
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, Optional, Sequence
+
+import redis
+import redis.asyncio as aioredis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+LATEST_PRICES_KEY = "prices:latest"
+# Время последнего тика по инструменту, мс: для сравнения в скрипте
+LATEST_TIMESTAMPS_KEY = "prices:latest:ts"
+
+# После ошибки Redis не обращаться к нему столько секунд
+REDIS_RETRY_INTERVAL = 30.0
+
+# ARGV: ttl, затем тройки (инструмент, время в мс, JSON)
+_PUBLISH_SCRIPT = """
+local written = 0
+for i = 2, #ARGV, 3 do
+    local current = tonumber(redis.call('HGET', KEYS[2], ARGV[i]))
+    local ts = tonumber(ARGV[i + 1])
+    if not current or ts >= current then
+        redis.call('HSET', KEYS[2], ARGV[i], ARGV[i + 1])
+        redis.call('HSET', KEYS[1], ARGV[i], ARGV[i + 2])
+        written = written + 1
+    end
+end
+redis.call('EXPIRE', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[2], ARGV[1])
+return written
+"""
+
+_client: Optional[redis.Redis] = None
+_async_client: Optional[aioredis.Redis] = None
+_down_until = 0.0
+
+
+def _connection_options() -> Dict[str, Any]:
+    return {
+        "socket_timeout": settings.LATEST_CACHE_TIMEOUT,
+        "socket_connect_timeout": settings.LATEST_CACHE_TIMEOUT,
+        "decode_responses": True,
+    }
+
+
+def _available() -> bool:
+    return settings.LATEST_CACHE_ENABLED and time.monotonic() >= _down_until
+
+
+def _mark_down(error: Exception):
+    global _down_until
+    if time.monotonic() >= _down_until:
+        logger.warning(
+            f"⚠️ Latest price cache unavailable, retry in "
+            f"{REDIS_RETRY_INTERVAL:.0f}s: {error}"
+        )
+    _down_until = time.monotonic() + REDIS_RETRY_INTERVAL
+
+
+def _timestamp_ms(timestamp: datetime) -> int:
+    return int(timestamp.timestamp() * 1000)
+
+
+def encode_tick(instrument_name: str, row: Dict[str, Any]) -> str:
+    """JSON тика для кэша (строка prices + имя инструмента)"""
+    return json.dumps(
+        {
+            "id": row["id"],
+            "instrument_name": instrument_name,
+            "price": row["price"],
+            "timestamp": row["timestamp"].isoformat(),
+            "mark_iv": row.get("mark_iv"),
+            "volume": row.get("volume"),
+            "base_volume": row.get("base_volume"),
+            "price_change": row.get("price_change"),
+            "cached_at": datetime.now(timezone.utc).isoformat(),
+        }
+    )
+
+
+def decode_tick(value: str) -> Dict[str, Any]:
+    tick = json.loads(value)
+    tick["timestamp"] = datetime.fromisoformat(tick["timestamp"])
+    tick["cached_at"] = datetime.fromisoformat(tick["cached_at"])
+    return tick
+
+
+def _script_args(ticks: Dict[str, Dict[str, Any]]) -> list:
+    args: list = [int(settings.LATEST_CACHE_TTL)]
+    for name, row in ticks.items():
+        args += [name, _timestamp_ms(row["timestamp"]), encode_tick(name, row)]
+    return args
+
+
+def latest_by_instrument(
+    rows: Iterable[Dict[str, Any]], names: Dict[int, str]
+) -> Dict[str, Dict[str, Any]]:
+    """Самый свежий тик пачки по каждому инструменту"""
+    latest: Dict[str, Dict[str, Any]] = {}
+    for row in rows:
+        name = names[row["instrument_id"]]
+        current = latest.get(name)
+        if current is None or row["timestamp"] >= current["timestamp"]:
+            latest[name] = row
+    return latest
+
+
+def publish_latest(ticks: Dict[str, Dict[str, Any]]) -> int:
+    """Записать последние тики (имя -> строка prices); вызывать после commit"""
+    global _client
+    if not ticks or not _available():
+        return 0
+
+    try:
+        if _client is None:
+            _client = redis.Redis.from_url(settings.REDIS_URL, **_connection_options())
+        keys = (LATEST_PRICES_KEY, LATEST_TIMESTAMPS_KEY)
+        return _client.eval(_PUBLISH_SCRIPT, len(keys), *keys, *_script_args(ticks))
+    except redis.RedisError as e:
+        _mark_down(e)
+        return 0
+
+
+def _get_async_client() -> aioredis.Redis:
+    global _async_client
+    if _async_client is None:
+        _async_client = aioredis.from_url(settings.REDIS_URL, **_connection_options())
+    return _async_client
+
+
+async def get_latest(instrument_name: str) -> Optional[Dict[str, Any]]:
+    """Последний тик из кэша (None — промах или Redis недоступен)"""
+    return (await get_latest_many([instrument_name])).get(instrument_name)
+
+
+async def get_latest_many(
+    instrument_names: Sequence[str],
+) -> Dict[str, Dict[str, Any]]:
+    """Последние тики нескольких инструментов одним HMGET (промахов нет в ответе)"""
+    if not instrument_names or not _available():
+        return {}
+
+    try:
+        values = await _get_async_client().hmget(LATEST_PRICES_KEY, instrument_names)
+    except redis.RedisError as e:
+        _mark_down(e)
+        return {}
+    return {
+        name: decode_tick(value)
+        for name, value in zip(instrument_names, values)
+        if value is not None
+    }
+
+
+async def store_latest(instrument_name: str, row: Dict[str, Any]) -> None:
+    """Заполнить кэш тиком из БД после промаха (более новый тик не затирается)"""
+    await store_latest_many({instrument_name: row})
+
+
+async def store_latest_many(ticks: Dict[str, Dict[str, Any]]) -> None:
+    if not ticks or not _available():
+        return
+
+    keys = (LATEST_PRICES_KEY, LATEST_TIMESTAMPS_KEY)
+    try:
+        await _get_async_client().eval(
+            _PUBLISH_SCRIPT, len(keys), *keys, *_script_args(ticks)
+        )
+    except redis.RedisError as e:
+        _mark_down(e)
+
+
+def staleness(tick: Dict[str, Any], at: Optional[datetime] = None) -> Dict[str, Any]:
+    """Поля свежести ответа: время записи в кэш и возраст цены к моменту at"""
+    age = (at or datetime.now(timezone.utc)) - tick["timestamp"]
+    return {
+        "cached_at": tick.get("cached_at"),
+        "age_seconds": round(age.total_seconds(), 3),
+    }
@@ -0,0 +1,123 @@
+"""Постраничная выдача истории тиков по курсору (keyset).
+
+OFFSET заставляет PostgreSQL прочитать и выбросить все предыдущие строки,
+поэтому глубокие страницы дорожают линейно. Курсор хранит (timestamp, id)
+крайней строки страницы, и следующая страница начинается поиском по
+idx_instrument_timestamp сразу с нужного места. Порядок — (timestamp, id):
+строки с одинаковым временем идут по id и не теряются на границе страниц.
+
+Страницы идут от новых тиков к старым: next_cursor — к более старым,
+prev_cursor — к более новым. Курсор непрозрачен для клиента.
+"""
+
+import base64
+import binascii
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy import desc, tuple_
+from sqlalchemy.sql import Select
+
+from app.db.models import Price
+
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+# Шаг времени тика: границы «строго раньше/позже» для архива
+TICK = timedelta(microseconds=1)
+
+
+@dataclass(frozen=True)
+class PageCursor:
+    timestamp: datetime
+    id: int
+    before: bool = False  # True — страница новее курсора, иначе старше
+
+
+def encode_cursor(cursor: PageCursor) -> str:
+    micros = (cursor.timestamp - EPOCH) // TICK
+    raw = f"{'b' if cursor.before else 'a'}{micros}:{cursor.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> PageCursor:
+    """Курсор из строки клиента; ValueError, если строка не курсор"""
+    try:
+        raw = base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)).decode()
+        micros, price_id = raw[1:].split(":")
+        if raw[0] not in "ab":
+            raise ValueError(raw)
+        return PageCursor(EPOCH + int(micros) * TICK, int(price_id), raw[0] == "b")
+    except (binascii.Error, UnicodeDecodeError, IndexError, ValueError):
+        raise ValueError("Invalid cursor") from None
+
+
+def keyset(query: Select, cursor: Optional[PageCursor], skip: int, limit: int):
+    """Страница запроса по prices: поиск от курсора или OFFSET без курсора.
+
+    Возвращает limit строк; для признака следующей страницы передавайте
+    limit + 1. При cursor.before строки идут от старых к новым.
+    """
+    if cursor is None:
+        return (
+            query.order_by(desc(Price.timestamp), desc(Price.id))
+            .offset(skip)
+            .limit(limit)
+        )
+    # Условие по одному timestamp — для поиска по индексу, пара — для равных
+    key = tuple_(Price.timestamp, Price.id)
+    mark = (cursor.timestamp, cursor.id)
+    if cursor.before:
+        return (
+            query.where(Price.timestamp >= cursor.timestamp, key > mark)
+            .order_by(Price.timestamp, Price.id)
+            .limit(limit)
+        )
+    return (
+        query.where(Price.timestamp <= cursor.timestamp, key < mark)
+        .order_by(desc(Price.timestamp), desc(Price.id))
+        .limit(limit)
+    )
+
+
+@dataclass
+class Page:
+    items: List[Dict[str, Any]]
+    next_cursor: Optional[str] = None  # к более старым тикам
+    prev_cursor: Optional[str] = None  # к более новым тикам
+
+    def headers(self) -> Dict[str, str]:
+        headers = {}
+        if self.next_cursor:
+            headers["X-Next-Cursor"] = self.next_cursor
+        if self.prev_cursor:
+            headers["X-Prev-Cursor"] = self.prev_cursor
+        return headers
+
+
+def paginate(
+    rows: List[Dict[str, Any]], cursor: Optional[PageCursor], skip: int, limit: int
+) -> Page:
+    """Страница из limit + 1 строк keyset (в порядке запроса) с курсорами"""
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    backward = cursor is not None and cursor.before
+    if backward:
+        rows.reverse()
+    if not rows:
+        return Page(rows)
+
+    # Назад — за курсором есть более старые строки (сама строка курсора)
+    older = True if backward else has_more
+    newer = has_more if backward else (cursor is not None or skip > 0)
+    first, last = rows[0], rows[-1]
+    return Page(
+        rows,
+        next_cursor=(
+            encode_cursor(PageCursor(last["timestamp"], last["id"])) if older else None
+        ),
+        prev_cursor=(
+            encode_cursor(PageCursor(first["timestamp"], first["id"], before=True))
+            if newer
+            else None
+        ),
+    )
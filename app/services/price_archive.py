@@ -0,0 +1,336 @@
+"""Холодный архив тиков в Parquet.
+
+Дневные партиции prices старше PRICES_ARCHIVE_AFTER_DAYS выгружаются в
+файлы ``{PRICES_ARCHIVE_PATH}/{instrument}/{YYYY-MM-DD}.parquet`` (zstd,
+по колонкам) вместе с исходными ответами API и удаляются из БД целиком.
+Запросы за даты раньше горизонта (archive_horizon) дочитывают архив через
+memory map. Нужен pyarrow; без него архив не ведется.
+
+Имя инструмента приходит из запроса и становится каталогом, поэтому оно
+проверяется до обращения к файлам (archive_dir): путь вне
+PRICES_ARCHIVE_PATH не читается и не пишется.
+"""
+
+import logging
+import os
+import re
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+
+from app.core.config import settings
+from app.db.partitions import PARTITIONED_TABLES, partition_days, partition_name
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.parquet as pq
+except ImportError:  # pragma: no cover - зависит от окружения
+    pa = None
+    pc = None
+    pq = None
+
+logger = logging.getLogger(__name__)
+
+# Строк в одной группе строк Parquet при выгрузке
+ARCHIVE_BATCH_SIZE = 50000
+
+ARCHIVE_COLUMNS = (
+    "id",
+    "timestamp",
+    "price",
+    "mark_iv",
+    "volume",
+    "base_volume",
+    "price_change",
+    "payload",
+)
+
+# Колонки для ответов API; payload читается только по запросу
+READ_COLUMNS = [column for column in ARCHIVE_COLUMNS if column != "payload"]
+
+# Имена инструментов Deribit: BTC-PERPETUAL, BTC-27DEC24-50000-C, btc_usd
+INSTRUMENT_NAME = re.compile(r"[A-Za-z0-9][A-Za-z0-9_.-]{0,99}")
+
+
+def archive_available() -> bool:
+    return pq is not None
+
+
+def _schema():
+    return pa.schema(
+        [
+            ("id", pa.int64()),
+            ("timestamp", pa.timestamp("us", tz="UTC")),
+            ("price", pa.float64()),
+            ("mark_iv", pa.float64()),
+            ("volume", pa.float64()),
+            ("base_volume", pa.float64()),
+            ("price_change", pa.float64()),
+            ("payload", pa.binary()),  # Сжатый zlib ответ API, как в price_payloads
+        ]
+    )
+
+
+def archive_dir(instrument: str, root: Optional[str] = None) -> Path:
+    """Каталог инструмента в архиве; ValueError, если имя недопустимо"""
+    base = Path(root or settings.PRICES_ARCHIVE_PATH).resolve()
+    if not INSTRUMENT_NAME.fullmatch(instrument):
+        raise ValueError(f"Invalid instrument name: {instrument!r}")
+    directory = (base / instrument).resolve()
+    # На случай символьных ссылок: каталог должен остаться внутри архива
+    if directory.parent != base:
+        raise ValueError(f"Instrument path escapes archive: {instrument!r}")
+    return directory
+
+
+def archive_file(instrument: str, day: date, root: Optional[str] = None) -> Path:
+    return archive_dir(instrument, root) / f"{day}.parquet"
+
+
+def _merge_existing(tmp_path: Path, path: Path):
+    """Добавить к выгрузке строки уже существующего файла дня.
+
+    Файл дня мог быть выгружен раньше, а потом в БД появились опоздавшие
+    тики того же дня: перезапись потеряла бы архив. Строки, выгруженные
+    повторно (сбой до удаления партиции), берутся из новой выгрузки.
+    """
+    fresh = pq.read_table(tmp_path)
+    old = pq.read_table(path)
+    kept = old.filter(pc.invert(pc.is_in(old["timestamp"], fresh["timestamp"])))
+    if kept.num_rows:
+        merged = pa.concat_tables([fresh, kept]).sort_by("timestamp")
+        pq.write_table(merged, tmp_path, compression="zstd")
+
+
+def _write_day(engine: Engine, day: date, root: Optional[str] = None) -> int:
+    """Выгрузить сутки в файлы по инструментам; возвращает число строк"""
+    start = datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+    query = text(
+        'SELECT i.name, p.id, p."timestamp", p.price, p.mark_iv, p.volume, '
+        "p.base_volume, p.price_change, pp.payload "
+        "FROM prices p "
+        "JOIN instruments i ON i.id = p.instrument_id "
+        "LEFT JOIN price_payloads pp "
+        'ON pp.price_id = p.id AND pp."timestamp" = p."timestamp" '
+        'AND pp."timestamp" >= :start AND pp."timestamp" < :end '
+        'WHERE p."timestamp" >= :start AND p."timestamp" < :end '
+        'ORDER BY i.name, p."timestamp"'
+    )
+
+    schema = _schema()
+    total = 0
+    writer = None
+    current = None
+    tmp_path = None
+
+    def finish():
+        nonlocal writer
+        if writer is not None:
+            writer.close()
+            writer = None
+            path = archive_file(current, day, root)
+            if path.exists():
+                _merge_existing(tmp_path, path)
+            os.replace(tmp_path, path)
+
+    try:
+        with engine.connect() as connection:
+            result = connection.execution_options(stream_results=True).execute(
+                query, {"start": start, "end": start + timedelta(days=1)}
+            )
+            while True:
+                chunk = result.fetchmany(ARCHIVE_BATCH_SIZE)
+                if not chunk:
+                    break
+
+                # Строки отсортированы по инструменту: один файл за раз
+                groups: Dict[str, List[Any]] = {}
+                for row in chunk:
+                    groups.setdefault(row[0], []).append(row[1:])
+
+                for name, rows in groups.items():
+                    if name != current:
+                        finish()
+                        current = name
+                        path = archive_file(name, day, root)
+                        path.parent.mkdir(parents=True, exist_ok=True)
+                        tmp_path = path.with_suffix(".tmp")
+                        writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+
+                    columns = list(zip(*rows))
+                    writer.write_table(
+                        pa.Table.from_arrays(
+                            [
+                                pa.array(values, type=field.type)
+                                for values, field in zip(columns, schema)
+                            ],
+                            schema=schema,
+                        )
+                    )
+                    total += len(rows)
+        finish()
+    finally:
+        if writer is not None:
+            writer.close()
+            tmp_path.unlink(missing_ok=True)
+
+    return total
+
+
+def archive_partitions(
+    engine: Engine,
+    after_days: Optional[int] = None,
+    root: Optional[str] = None,
+) -> List[Dict[str, Any]]:
+    """Выгрузить и удалить дневные партиции старше after_days дней"""
+    if after_days is None:
+        after_days = settings.PRICES_ARCHIVE_AFTER_DAYS
+    if after_days <= 0:
+        return []
+    if not archive_available():
+        # Партиции удаляет drop_expired_partitions по PRICES_RETENTION_DAYS
+        logger.warning(
+            "⚠️ pyarrow is not installed: price archive is disabled, "
+            "PRICES_RETENTION_DAYS applies to old partitions"
+        )
+        return []
+
+    cutoff = datetime.now(timezone.utc).date() - timedelta(days=after_days)
+    with engine.connect() as connection:
+        days = [day for day in partition_days(connection) if day < cutoff]
+
+    archived = []
+    for day in days:
+        # Файлы пишутся до удаления партиции: при сбое день выгрузится заново
+        rows = _write_day(engine, day, root)
+        with engine.begin() as connection:
+            for parent in PARTITIONED_TABLES:
+                connection.execute(
+                    text(f"DROP TABLE IF EXISTS {partition_name(day, parent)}")
+                )
+        archived.append({"day": day.isoformat(), "rows": rows})
+        logger.info(f"🧊 Archived {rows} ticks for {day} to Parquet")
+
+    return archived
+
+
+def _archived_days(
+    instrument: str, date_from: Optional[date], date_to: Optional[date]
+) -> List[date]:
+    try:
+        directory = archive_dir(instrument)
+    except ValueError as e:
+        # Такого инструмента нет ни в БД, ни в архиве
+        logger.warning(f"⚠️ Archive lookup refused: {e}")
+        return []
+    if not directory.is_dir():
+        return []
+
+    days = []
+    for path in directory.glob("*.parquet"):
+        try:
+            day = date.fromisoformat(path.stem)
+        except ValueError:
+            continue
+        if (date_from is None or day >= date_from) and (
+            date_to is None or day <= date_to
+        ):
+            days.append(day)
+    return sorted(days, reverse=True)
+
+
+def archive_horizon(instrument: str, horizon: Optional[datetime]) -> Optional[datetime]:
+    """Граница архива инструмента: раньше нее тики читаются только из архива.
+
+    horizon — начало самой старой партиции (hot_horizon); граница не
+    раньше дня после последнего файла архива. Опоздавший тик уже
+    выгруженного дня пересоздает партицию этого дня, и горизонт по одним
+    партициям ушел бы назад, спрятав выгруженные дни после нее. Такой тик
+    попадет в файл при следующей выгрузке.
+    """
+    if not archive_available():
+        return horizon
+    days = _archived_days(instrument, None, None)
+    if not days:
+        return horizon
+    watermark = datetime.combine(
+        days[0] + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc
+    )
+    return watermark if horizon is None else max(horizon, watermark)
+
+
+def _day_tables(
+    instrument: str,
+    date_from: Optional[datetime],
+    date_to: Optional[datetime],
+    oldest_first: bool,
+) -> Iterator["pa.Table"]:
+    """Таблицы дневных файлов инструмента в пределах дат, по одной"""
+    filters = []
+    if date_from is not None:
+        filters.append(("timestamp", ">=", date_from))
+    if date_to is not None:
+        filters.append(("timestamp", "<=", date_to))
+
+    days = _archived_days(
+        instrument,
+        date_from.astimezone(timezone.utc).date() if date_from else None,
+        date_to.astimezone(timezone.utc).date() if date_to else None,
+    )
+    if oldest_first:
+        days.reverse()
+
+    for day in days:
+        yield pq.read_table(
+            archive_file(instrument, day),
+            columns=READ_COLUMNS,
+            filters=filters or None,
+            memory_map=True,
+        )
+
+
+def read_archived_prices(
+    instrument: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    limit: Optional[int] = None,
+    oldest_first: bool = False,
+) -> List[Dict[str, Any]]:
+    """Тики инструмента из архива, от новых к старым (oldest_first — наоборот)"""
+    if not archive_available():
+        return []
+
+    result: List[Dict[str, Any]] = []
+    for table in _day_tables(instrument, date_from, date_to, oldest_first):
+        rows = table.to_pylist()
+        if not oldest_first:
+            rows.reverse()
+        for row in rows:
+            row["instrument_name"] = instrument
+        result.extend(rows)
+        if limit is not None and len(result) >= limit:
+            return result[:limit]
+
+    return result
+
+
+def iter_archived_prices(
+    instrument: str,
+    date_from: Optional[datetime] = None,
+    date_to: Optional[datetime] = None,
+    batch_size: int = ARCHIVE_BATCH_SIZE,
+) -> Iterator[List[Dict[str, Any]]]:
+    """Тики из архива пачками от старых к новым; в памяти не больше дня"""
+    if not archive_available():
+        return
+
+    for table in _day_tables(instrument, date_from, date_to, oldest_first=True):
+        for batch in table.to_batches(max_chunksize=batch_size):
+            rows = batch.to_pylist()
+            for row in rows:
+                row["instrument_name"] = instrument
+            yield rows
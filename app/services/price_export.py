@@ -0,0 +1,150 @@
+"""Потоковая выгрузка истории тиков за диапазон дат (NDJSON, CSV, Arrow).
+
+Строки читаются серверным курсором (stream + yield_per) и сразу пишутся в
+ответ пачками по EXPORT_BATCH_SIZE, поэтому память не зависит от ширины
+диапазона. Дни старше самой старой партиции идут первыми из архива
+Parquet (по одному дню). Порядок — от старых тиков к новым.
+"""
+
+import csv
+import io
+import json
+from datetime import datetime
+from typing import (
+    Any,
+    AsyncContextManager,
+    AsyncIterator,
+    Callable,
+    List,
+    Mapping,
+    Optional,
+    Union,
+)
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from starlette.concurrency import iterate_in_threadpool, run_in_threadpool
+
+from app.db.models import Instrument, Price
+from app.db.partitions import hot_horizon
+from app.services.arrow_ipc import ARROW_MEDIA_TYPE, TickStreamWriter
+from app.services.price_archive import archive_horizon, iter_archived_prices
+
+# Строк в одной пачке курсора и одном куске ответа
+EXPORT_BATCH_SIZE = 5000
+
+EXPORT_COLUMNS = (
+    "id",
+    "instrument_name",
+    "timestamp",
+    "price",
+    "mark_iv",
+    "volume",
+    "base_volume",
+    "price_change",
+)
+
+EXPORT_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "csv": "text/csv",
+    "arrow": ARROW_MEDIA_TYPE,  # поток IPC: пачка на каждый кусок
+}
+
+
+def _export_query(instrument: str, start: Optional[datetime], end: Optional[datetime]):
+    query = (
+        select(
+            Price.id,
+            Instrument.name.label("instrument_name"),
+            Price.timestamp,
+            Price.price,
+            Price.mark_iv,
+            Price.volume,
+            Price.base_volume,
+            Price.price_change,
+        )
+        .join(Instrument, Price.instrument_id == Instrument.id)
+        .where(Instrument.name == instrument)
+    )
+    if start is not None:
+        query = query.where(Price.timestamp >= start)
+    if end is not None:
+        query = query.where(Price.timestamp <= end)
+    return query.order_by(Price.timestamp)
+
+
+def _values(row: Mapping[str, Any]) -> List[Any]:
+    return [
+        row["timestamp"].isoformat() if column == "timestamp" else row[column]
+        for column in EXPORT_COLUMNS
+    ]
+
+
+def _ndjson(rows: List[Mapping[str, Any]]) -> str:
+    return "".join(
+        json.dumps(dict(zip(EXPORT_COLUMNS, _values(row)))) + "\n" for row in rows
+    )
+
+
+def _csv(rows: List[Mapping[str, Any]], header: bool = False) -> str:
+    out = io.StringIO()
+    writer = csv.writer(out)
+    if header:
+        writer.writerow(EXPORT_COLUMNS)
+    writer.writerows(_values(row) for row in rows)
+    return out.getvalue()
+
+
+async def _rows(
+    db: AsyncSession,
+    instrument: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> AsyncIterator[List[Mapping[str, Any]]]:
+    """Пачки строк: сначала архив (раньше горизонта), затем БД серверным курсором"""
+    horizon = await db.run_sync(lambda session: hot_horizon(session.connection()))
+    horizon = await run_in_threadpool(archive_horizon, instrument, horizon)
+    hot_start = start
+    if horizon is not None and (start is None or start < horizon):
+        # Файлы Parquet читаются в пуле потоков, по одному дню
+        batches = iter_archived_prices(instrument, start, end, EXPORT_BATCH_SIZE)
+        async for rows in iterate_in_threadpool(batches):
+            yield rows
+        hot_start = horizon
+
+    result = await db.stream(
+        _export_query(instrument, hot_start, end).execution_options(
+            yield_per=EXPORT_BATCH_SIZE
+        )
+    )
+    async for partition in result.mappings().partitions():
+        yield partition
+
+
+async def stream_prices(
+    open_session: Callable[[], AsyncContextManager[AsyncSession]],
+    instrument: str,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    fmt: str = "ndjson",
+) -> AsyncIterator[Union[str, bytes]]:
+    """Куски ответа в формате fmt (ndjson, csv или arrow) по мере чтения строк.
+
+    Сессия открывается здесь, а не зависимостью обработчика: она должна
+    жить, пока клиент читает ответ.
+    """
+    arrow = TickStreamWriter(instrument) if fmt == "arrow" else None
+    if fmt == "csv":
+        yield _csv([], header=True)
+
+    async with open_session() as db:
+        async for rows in _rows(db, instrument, start, end):
+            if arrow is not None:
+                yield arrow.write(rows)
+            elif fmt == "csv":
+                yield _csv(rows)
+            else:
+                yield _ndjson(rows)
+
+    if arrow is not None:
+        yield arrow.close()
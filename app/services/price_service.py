@@ -1,56 +1,447 @@
-from typing import Optional, Type
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, List, Optional, Sequence, Tuple
 
-from sqlalchemy import desc
+from sqlalchemy import desc, func, select, true
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
 
-from app.db import models
-from app.db.models import PriceTick
+from app.db.models import Instrument, Price
+from app.db.partitions import hot_horizon
+from app.services.candles import (
+    RESAMPLE_MAX_BUCKETS,
+    parse_bucket,
+    query_candles,
+    query_candles_async,
+    resample_async,
+)
+from app.services.latest_prices import (
+    get_latest,
+    get_latest_many,
+    staleness,
+    store_latest,
+    store_latest_many,
+)
+from app.services.pagination import TICK, Page, PageCursor, keyset, paginate
+from app.services.price_archive import archive_horizon, read_archived_prices
+
+# Больше инструментов в одном срезе — только полным списком (без tickers)
+SNAPSHOT_MAX_TICKERS = 1000
+
+# Поля ответа последней цены: одни и те же из кэша и из БД
+LATEST_FIELDS = (
+    "id",
+    "ticker",
+    "price",
+    "timestamp",
+    "mark_iv",
+    "volume",
+    "base_volume",
+    "price_change",
+)
+
+
+def _to_datetime(timestamp: Optional[int]) -> Optional[datetime]:
+    # 0 — начало эпохи, а не отсутствие границы
+    if timestamp is None:
+        return None
+    return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+
+def _ticks():
+    # Строки prices с именем инструмента вместо id
+    return select(
+        Price.id,
+        Instrument.name.label("ticker"),
+        Price.price,
+        Price.timestamp,
+        Price.mark_iv,
+        Price.volume,
+        Price.base_volume,
+        Price.price_change,
+    ).join(Instrument, Price.instrument_id == Instrument.id)
+
+
+def _by_ticker(ticker: str, skip: int, limit: int):
+    return (
+        _ticks()
+        .where(Instrument.name == ticker)
+        .order_by(desc(Price.timestamp))
+        .offset(skip)
+        .limit(limit)
+    )
+
+
+def _in_range(query, start: Optional[datetime], end: Optional[datetime]):
+    # Границы по времени отсекают лишние дневные партиции
+    if start is not None:
+        query = query.where(Price.timestamp >= start)
+    if end is not None:
+        query = query.where(Price.timestamp <= end)
+    return query
+
+
+def _page(
+    ticker: str,
+    cursor: Optional[PageCursor],
+    skip: int,
+    limit: int,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+):
+    # limit + 1: лишняя строка — признак следующей страницы
+    query = _in_range(_ticks().where(Instrument.name == ticker), start, end)
+    return keyset(query, cursor, skip, limit + 1)
+
+
+def _count_upto(
+    ticker: str, start: Optional[datetime], end: Optional[datetime], cap: int
+):
+    """Строк инструмента в БД, но не больше cap — не дороже самого OFFSET cap"""
+    ids = select(Price.id).join(Instrument, Price.instrument_id == Instrument.id)
+    ids = _in_range(ids.where(Instrument.name == ticker), start, end)
+    return select(func.count()).select_from(ids.limit(cap).subquery())
+
+
+def _by_date(ticker: str, start: Optional[datetime], end: Optional[datetime]):
+    query = _ticks().where(Instrument.name == ticker)
+    return _in_range(query, start, end).order_by(desc(Price.timestamp))
+
+
+def _snapshot(tickers: Optional[Sequence[str]], at: Optional[datetime]):
+    """Последний тик каждого инструмента (не позже at) одним запросом.
+
+    LATERAL по instruments: на инструмент — один обратный проход
+    idx_instrument_timestamp с LIMIT 1, без сортировки всей prices.
+    """
+    latest = select(
+        Price.id,
+        Price.price,
+        Price.timestamp,
+        Price.mark_iv,
+        Price.volume,
+        Price.base_volume,
+        Price.price_change,
+    ).where(Price.instrument_id == Instrument.id)
+    if at is not None:
+        latest = latest.where(Price.timestamp <= at)
+    latest = latest.order_by(desc(Price.timestamp)).limit(1).lateral("latest")
+
+    query = select(
+        latest.c.id,
+        Instrument.name.label("ticker"),
+        latest.c.price,
+        latest.c.timestamp,
+        latest.c.mark_iv,
+        latest.c.volume,
+        latest.c.base_volume,
+        latest.c.price_change,
+    ).join(latest, true())
+    if tickers is not None:
+        query = query.where(Instrument.name.in_(tickers))
+    return query.order_by(Instrument.name)
+
+
+def _latest(tick: Dict[str, Any], at: Optional[datetime] = None) -> Dict[str, Any]:
+    # Ответ одного вида; поля, которых нет у источника, — None
+    return {
+        **{field: tick.get(field) for field in LATEST_FIELDS},
+        **staleness(tick, at),
+    }
+
+
+def _archived(
+    ticker: str,
+    start: Optional[datetime],
+    end: Optional[datetime],
+    skip: int = 0,
+    limit: Optional[int] = None,
+    oldest_first: bool = False,
+) -> List[Dict[str, Any]]:
+    rows = read_archived_prices(
+        ticker,
+        start,
+        end,
+        limit=None if limit is None else skip + limit,
+        oldest_first=oldest_first,
+    )[skip:]
+    for row in rows:
+        row["ticker"] = row.pop("instrument_name")
+    return rows
+
+
+def _archive_window(
+    horizon: Optional[datetime],
+    cursor: Optional[PageCursor],
+    start: Optional[datetime],
+    end: Optional[datetime],
+) -> Optional[Tuple[Optional[datetime], datetime]]:
+    """Границы страницы в архиве или None, если за ней архива нет.
+
+    В архиве только дни раньше горизонта, поэтому конец БД определяется
+    курсором и горизонтом, без подсчета строк. Время тика в архиве
+    уникально, и строгие границы курсора задаются шагом TICK.
+    """
+    if horizon is None:
+        return None
+    if cursor is not None and cursor.before:
+        start = max(start or cursor.timestamp, cursor.timestamp + TICK)
+    elif cursor is not None:
+        end = min(end or cursor.timestamp, cursor.timestamp - TICK)
+    end = min(end or horizon, horizon - TICK)
+    if start is not None and start > end:
+        return None
+    return start, end
+
+
+def _resample_range(
+    bucket: str, date_from: Optional[int], date_to: Optional[int]
+) -> Tuple[int, datetime, datetime]:
+    """Ширина и границы пересчета; ValueError при неверных параметрах"""
+    seconds = parse_bucket(bucket)
+    end = _to_datetime(date_to) or datetime.now(timezone.utc)
+    # Без date_from — последние 500 интервалов
+    start = _to_datetime(date_from) or end - timedelta(seconds=seconds * 500)
+    if start >= end:
+        raise ValueError("date_from must be before date_to")
+    if (end - start).total_seconds() / seconds > RESAMPLE_MAX_BUCKETS:
+        raise ValueError(f"Too many buckets, at most {RESAMPLE_MAX_BUCKETS}")
+    return seconds, start, end
+
+
+def _hot_start(
+    start: Optional[datetime], horizon: Optional[datetime]
+) -> Optional[datetime]:
+    # Строки БД раньше горизонта (опоздавшие тики выгруженных дней) читаются
+    # из архива после следующей выгрузки, иначе они перемешались бы с ним
+    if horizon is None:
+        return start
+    return horizon if start is None else max(start, horizon)
+
+
+def _horizon(db: Session, ticker: str) -> Optional[datetime]:
+    return archive_horizon(ticker, hot_horizon(db.connection()))
+
+
+async def _horizon_async(db: AsyncSession, ticker: str) -> Optional[datetime]:
+    horizon = await db.run_sync(lambda session: hot_horizon(session.connection()))
+    # Список файлов архива — в пуле потоков
+    return await run_in_threadpool(archive_horizon, ticker, horizon)
+
+
+def _needs_archive(horizon: Optional[datetime], start: Optional[datetime]) -> bool:
+    # Дни раньше самой старой партиции лежат в архиве Parquet
+    return horizon is not None and (start is None or start < horizon)
 
 
 class PriceService:
     def __init__(self, db: Session):
         self.db = db
 
-    async def create_price_tick(self, ticker: str, price: float, timestamp: int):
-        db_price = models.PriceTick(ticker=ticker, price=price, timestamp=timestamp)
-        self.db.add(db_price)
-        self.db.commit()
-        self.db.refresh(db_price)
-        return db_price
-
     def get_prices_by_ticker(
         self, ticker: str, skip: int = 0, limit: int = 100
-    ) -> list[Type[PriceTick]]:
-        return (
-            self.db.query(models.PriceTick)
-            .filter(models.PriceTick.ticker == ticker)
-            .order_by(desc(models.PriceTick.timestamp))
-            .offset(skip)
-            .limit(limit)
-            .all()
-        )
+    ) -> List[Any]:
+        return self.db.execute(_by_ticker(ticker, skip, limit)).all()
 
-    def get_latest_price(self, ticker: str) -> Optional[models.PriceTick]:
-        return (
-            self.db.query(models.PriceTick)
-            .filter(models.PriceTick.ticker == ticker)
-            .order_by(desc(models.PriceTick.timestamp))
-            .first()
-        )
+    def get_prices_page(
+        self,
+        ticker: str,
+        cursor: Optional[PageCursor] = None,
+        skip: int = 0,
+        limit: int = 100,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+    ) -> Page:
+        """Страница истории по курсору (skip — только без курсора), с архивом"""
+        start, end = _to_datetime(date_from), _to_datetime(date_to)
+        horizon = _horizon(self.db, ticker)
+        hot_start = _hot_start(start, horizon)
+        result = self.db.execute(_page(ticker, cursor, skip, limit, hot_start, end))
+        rows = [dict(row._mapping) for row in result]
+
+        backward = cursor is not None and cursor.before
+        if len(rows) <= limit or backward:
+            window = _archive_window(horizon, cursor, start, end)
+            if window is not None:
+                offset = 0
+                if cursor is None and skip and not rows:
+                    in_db = self.db.scalar(_count_upto(ticker, hot_start, end, skip))
+                    offset = skip - in_db
+                wanted = limit + 1 if backward else limit + 1 - len(rows)
+                archived = _archived(ticker, *window, offset, wanted, backward)
+                rows = archived + rows if backward else rows + archived
+        return paginate(rows, cursor, skip, limit)
+
+    def get_latest_price(self, ticker: str) -> Optional[Any]:
+        return self.db.execute(_by_ticker(ticker, 0, 1)).first()
 
     def get_price_by_date(
         self,
         ticker: str,
         date_from: Optional[int] = None,
         date_to: Optional[int] = None,
-    ) -> list[Type[PriceTick]]:
-        query = self.db.query(models.PriceTick).filter(
-            models.PriceTick.ticker == ticker
+    ) -> List[Any]:
+        start, end = _to_datetime(date_from), _to_datetime(date_to)
+        horizon = _horizon(self.db, ticker)
+        query = _by_date(ticker, _hot_start(start, horizon), end)
+        prices = list(self.db.execute(query).all())
+
+        if _needs_archive(horizon, start):
+            prices.extend(_archived(ticker, start, end))
+        return prices
+
+    def get_snapshot(
+        self, tickers: Optional[Sequence[str]] = None, at: Optional[int] = None
+    ) -> List[Any]:
+        """Последние цены инструментов (всех при tickers=None) на момент at"""
+        return self.db.execute(_snapshot(tickers, _to_datetime(at))).all()
+
+    def get_candles(
+        self,
+        ticker: str,
+        resolution: str,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+        limit: int = 500,
+    ) -> List[Any]:
+        return query_candles(
+            self.db,
+            ticker,
+            resolution,
+            date_from=_to_datetime(date_from),
+            date_to=_to_datetime(date_to),
+            limit=limit,
         )
 
-        if date_from:
-            query = query.filter(models.PriceTick.timestamp >= date_from)
-        if date_to:
-            query = query.filter(models.PriceTick.timestamp <= date_to)
 
-        return query.order_by(desc(models.PriceTick.timestamp)).all()
+class AsyncPriceService:
+    """Те же запросы через AsyncSession (asyncpg), без блокировки event loop"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+
+    async def get_prices_by_ticker(
+        self, ticker: str, skip: int = 0, limit: int = 100
+    ) -> List[Any]:
+        return (await self.db.execute(_by_ticker(ticker, skip, limit))).all()
+
+    async def get_prices_page(
+        self,
+        ticker: str,
+        cursor: Optional[PageCursor] = None,
+        skip: int = 0,
+        limit: int = 100,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+    ) -> Page:
+        """Страница истории по курсору (skip — только без курсора).
+
+        Не заполненная из БД страница дочитывается из архива Parquet:
+        старше курсора — после строк БД, новее курсора — перед ними.
+        """
+        start, end = _to_datetime(date_from), _to_datetime(date_to)
+        horizon = await _horizon_async(self.db, ticker)
+        hot_start = _hot_start(start, horizon)
+        query = _page(ticker, cursor, skip, limit, hot_start, end)
+        rows = [dict(row._mapping) for row in await self.db.execute(query)]
+
+        backward = cursor is not None and cursor.before
+        if len(rows) <= limit or backward:
+            window = _archive_window(horizon, cursor, start, end)
+            if window is not None:
+                # OFFSET ушел за конец БД: остаток пропускается в архиве
+                offset = 0
+                if cursor is None and skip and not rows:
+                    counted = _count_upto(ticker, hot_start, end, skip)
+                    in_db = await self.db.scalar(counted)
+                    offset = skip - in_db
+                wanted = limit + 1 if backward else limit + 1 - len(rows)
+                # Чтение файлов Parquet — в пуле потоков
+                archived = await run_in_threadpool(
+                    _archived, ticker, *window, offset, wanted, backward
+                )
+                rows = archived + rows if backward else rows + archived
+        return paginate(rows, cursor, skip, limit)
+
+    async def get_latest_price(self, ticker: str) -> Optional[Dict[str, Any]]:
+        """Последняя цена из кэша Redis, при промахе — из БД"""
+        tick = await get_latest(ticker)
+        if tick is not None:
+            tick["ticker"] = tick.pop("instrument_name")
+        else:
+            row = (await self.db.execute(_by_ticker(ticker, 0, 1))).first()
+            if row is None:
+                return None
+            tick = dict(row._mapping)
+            await store_latest(ticker, tick)
+        return _latest(tick)
+
+    async def get_price_by_date(
+        self,
+        ticker: str,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+    ) -> List[Any]:
+        start, end = _to_datetime(date_from), _to_datetime(date_to)
+        horizon = await _horizon_async(self.db, ticker)
+        query = _by_date(ticker, _hot_start(start, horizon), end)
+        prices = list((await self.db.execute(query)).all())
+
+        if _needs_archive(horizon, start):
+            # Чтение файлов Parquet — в пуле потоков
+            prices.extend(await run_in_threadpool(_archived, ticker, start, end))
+        return prices
+
+    async def get_snapshot(
+        self, tickers: Optional[Sequence[str]] = None, at: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """Последние цены инструментов (всех при tickers=None) на момент at.
+
+        Без at названные инструменты берутся из кэша последних цен, БД
+        читается одним запросом только для промахов. Полный список и срез
+        на момент at — всегда из БД.
+        """
+        moment = _to_datetime(at)
+        ticks: Dict[str, Dict[str, Any]] = {}
+        if moment is None and tickers:
+            ticks = await get_latest_many(tickers)
+            for tick in ticks.values():
+                tick["ticker"] = tick.pop("instrument_name")
+
+        missing = None if tickers is None else [t for t in tickers if t not in ticks]
+        if missing is None or missing:
+            result = await self.db.execute(_snapshot(missing, moment))
+            found = {row.ticker: dict(row._mapping) for row in result}
+            if moment is None:
+                await store_latest_many(found)
+            ticks.update(found)
+
+        return [_latest(ticks[name], moment) for name in sorted(ticks)]
+
+    async def get_candles(
+        self,
+        ticker: str,
+        resolution: str,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+        limit: int = 500,
+    ) -> List[Any]:
+        return await query_candles_async(
+            self.db,
+            ticker,
+            resolution,
+            date_from=_to_datetime(date_from),
+            date_to=_to_datetime(date_to),
+            limit=limit,
+        )
+
+    async def get_resampled(
+        self,
+        ticker: str,
+        bucket: str,
+        date_from: Optional[int] = None,
+        date_to: Optional[int] = None,
+    ) -> Tuple[List[Any], str]:
+        """OHLC по интервалам произвольной ширины, посчитанные в БД"""
+        seconds, start, end = _resample_range(bucket, date_from, date_to)
+        return await resample_async(self.db, ticker, seconds, start, end)
@@ -0,0 +1,320 @@
+import csv
+import io
+import json
+import logging
+import time
+import zlib
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Set, Tuple
+
+from sqlalchemy import insert, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.db.models import Price, PricePayload
+from app.services.candles import upsert_candles
+from app.services.instruments import get_instrument_registry
+from app.services.latest_prices import latest_by_instrument, publish_latest
+from app.services.stats import upsert_instrument_stats
+from app.services.ticks import TickerRecord
+
+logger = logging.getLogger(__name__)
+
+# Колонки prices, которые заполняет пакетная запись (индексы — на стороне БД)
+BULK_COLUMNS = (
+    "id",
+    "instrument_id",
+    "price",
+    "timestamp",
+    "mark_iv",
+    "volume",
+    "base_volume",
+    "price_change",
+)
+PAYLOAD_COLUMNS = ("price_id", "timestamp", "payload")
+
+# id выдаются заранее, чтобы связать prices и price_payloads без RETURNING
+PRICES_ID_SEQUENCE = "prices_id_seq"
+
+# Ключ идемпотентности: один тик на инструмент и время биржи
+CONFLICT_COLUMNS = ("instrument_id", "timestamp")
+
+# Временная таблица соединения для COPY; строки очищаются на commit
+PRICES_STAGING_TABLE = "prices_staging"
+
+PAYLOAD_COMPRESSION_LEVEL = 6
+
+
+@dataclass
+class BulkWriteResult:
+    """Итог пакетной записи"""
+
+    rows: int
+    seconds: float
+    method: str
+    duplicates: int = 0  # Тики, которые уже были в БД и пропущены
+
+    @property
+    def rows_per_sec(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else 0.0
+
+
+def compress_payload(raw: Dict[str, Any]) -> bytes:
+    """Ответ API -> сжатый JSON для price_payloads"""
+    return zlib.compress(
+        json.dumps(raw, separators=(",", ":")).encode(), PAYLOAD_COMPRESSION_LEVEL
+    )
+
+
+def decompress_payload(data: bytes) -> Dict[str, Any]:
+    return json.loads(zlib.decompress(data))
+
+
+def get_raw_payload(
+    db: Session, price_id: int, timestamp: datetime
+) -> Optional[Dict[str, Any]]:
+    """Полный ответ API для строки prices (timestamp отсекает лишние партиции)"""
+    payload = (
+        db.query(PricePayload.payload)
+        .filter(
+            PricePayload.price_id == price_id, PricePayload.timestamp == timestamp
+        )
+        .scalar()
+    )
+    return decompress_payload(payload) if payload is not None else None
+
+
+def build_price_record(
+    record: Optional[TickerRecord], instrument_id: int
+) -> Optional[Price]:
+    """Построение записи Price из тика (HTTP или WebSocket)"""
+    if record is None or record.mark_price is None:
+        return None
+
+    return Price(
+        instrument_id=instrument_id,
+        price=record.mark_price,
+        mark_iv=record.mark_iv,  # Волатильность, если есть
+        volume=record.volume_usd or 0,  # Объем в USD
+        base_volume=record.volume,  # Объем в базовой валюте
+        price_change=record.price_change,  # Изменение за 24ч, %
+        timestamp=record.timestamp,  # Время биржи (UTC)
+    )
+
+
+def save_prices(db: Session, records: Iterable[TickerRecord]) -> int:
+    """Сохранение тиков в БД одной транзакцией.
+
+    Повторные тики (тот же инструмент и время биржи) пропускаются.
+    Возвращает число новых записей.
+    """
+    return bulk_insert_prices(db, records, method="values").rows
+
+
+def _allocate_ids(db: Session, count: int) -> List[int]:
+    rows = db.execute(
+        text(f"SELECT nextval('{PRICES_ID_SEQUENCE}') FROM generate_series(1, :n)"),
+        {"n": count},
+    )
+    return [row[0] for row in rows]
+
+
+def _price_rows(
+    db: Session, records: Iterable[TickerRecord]
+) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+    """Строки prices и price_payloads с общими id"""
+    records = [
+        record
+        for record in records
+        if record is not None and record.mark_price is not None
+    ]
+    if not records:
+        return [], []
+
+    instrument_ids = get_instrument_registry().resolve(
+        db, (record.instrument_name for record in records)
+    )
+
+    rows = []
+    payloads = []
+    keep_payloads = settings.PRICE_PAYLOADS_ENABLED
+    for price_id, record in zip(_allocate_ids(db, len(records)), records):
+        timestamp = record.timestamp
+        rows.append(
+            {
+                "id": price_id,
+                "instrument_id": instrument_ids[record.instrument_name],
+                "price": record.mark_price,
+                "timestamp": timestamp,
+                "mark_iv": record.mark_iv,
+                "volume": record.volume_usd or 0,
+                "base_volume": record.volume,
+                "price_change": record.price_change,
+            }
+        )
+        if keep_payloads and record.raw:
+            payloads.append(
+                {
+                    "price_id": price_id,
+                    "timestamp": timestamp,
+                    "payload": compress_payload(record.raw),
+                }
+            )
+    return rows, payloads
+
+
+def _csv_value(value: Any) -> Any:
+    # CSV: пустое значение без кавычек — NULL
+    if value is None:
+        return None
+    if isinstance(value, float):
+        return repr(value)
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, bytes):
+        return "\\x" + value.hex()
+    return value
+
+
+def _copy_cursor(db: Session):
+    """Курсор psycopg2 текущей транзакции или None, если COPY недоступен"""
+    connection = db.connection()
+    if connection.dialect.name != "postgresql":
+        return None
+    cursor = connection.connection.driver_connection.cursor()
+    if not hasattr(cursor, "copy_expert"):
+        cursor.close()
+        return None
+    return cursor
+
+
+def _copy_rows(
+    db: Session, table: str, columns: Sequence[str], rows: List[Dict[str, Any]]
+) -> bool:
+    """COPY ... FROM STDIN через psycopg2. False, если драйвер не умеет COPY"""
+    cursor = _copy_cursor(db)
+    if cursor is None:
+        return False
+
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    for row in rows:
+        writer.writerow([_csv_value(row[column]) for column in columns])
+    buffer.seek(0)
+
+    try:
+        cursor.copy_expert(
+            f"COPY {table} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv)",
+            buffer,
+        )
+    finally:
+        cursor.close()
+    return True
+
+
+def _quoted(columns: Sequence[str]) -> str:
+    return ", ".join(f'"{column}"' for column in columns)
+
+
+def _copy_new_prices(db: Session, rows: List[Dict[str, Any]]) -> Optional[Set[int]]:
+    """COPY во временную таблицу и перенос в prices без повторов.
+
+    Возвращает id вставленных строк или None, если COPY недоступен.
+    """
+    cursor = _copy_cursor(db)
+    if cursor is None:
+        return None
+    cursor.close()
+
+    # Таблица живет до конца соединения: не создаем ее заново на каждую пачку
+    db.execute(
+        text(
+            f"CREATE TEMP TABLE IF NOT EXISTS {PRICES_STAGING_TABLE} "
+            f"(LIKE {Price.__tablename__}) ON COMMIT DELETE ROWS"
+        )
+    )
+    db.execute(text(f"TRUNCATE {PRICES_STAGING_TABLE}"))
+    _copy_rows(db, PRICES_STAGING_TABLE, BULK_COLUMNS, rows)
+
+    columns = _quoted(BULK_COLUMNS)
+    inserted = db.execute(
+        text(
+            f"INSERT INTO {Price.__tablename__} ({columns}) "
+            f"SELECT {columns} FROM {PRICES_STAGING_TABLE} "
+            f"ON CONFLICT ({_quoted(CONFLICT_COLUMNS)}) DO NOTHING "
+            "RETURNING id"
+        )
+    )
+    return {row[0] for row in inserted}
+
+
+def bulk_insert_prices(
+    db: Session,
+    records: Iterable[TickerRecord],
+    method: str = "copy",
+    commit: bool = True,
+) -> BulkWriteResult:
+    """Пакетная запись тиков в prices (и исходных ответов в price_payloads).
+
+    method="copy" пишет через COPY (PostgreSQL + psycopg2) во временную
+    таблицу, иначе или при недоступности COPY — executemany с многострочным
+    VALUES. В обоих случаях INSERT ... ON CONFLICT DO NOTHING: тики, которые
+    уже есть в БД (повторный запуск задачи, второй коллектор, перенос файла
+    буфера), пропускаются и считаются в BulkWriteResult.duplicates.
+    Новые тики сразу попадают в свечи price_candles и счетчики
+    instrument_stats, а после commit — в кэш последних цен (при
+    commit=False кэш не обновляется).
+    """
+    started = time.perf_counter()
+    rows, payloads = _price_rows(db, records)
+    if not rows:
+        return BulkWriteResult(0, 0.0, method)
+
+    inserted = _copy_new_prices(db, rows) if method == "copy" else None
+    if inserted is not None:
+        used = "copy"
+    else:
+        # insertmanyvalues SQLAlchemy собирает многострочные INSERT ... VALUES
+        statement = (
+            pg_insert(Price.__table__)
+            .on_conflict_do_nothing(index_elements=CONFLICT_COLUMNS)
+            .returning(Price.__table__.c.id)
+        )
+        inserted = set(db.execute(statement, rows).scalars())
+        used = "values"
+
+    # Свечи и счетчики обновляются в той же транзакции и только новыми тиками
+    new_rows = [row for row in rows if row["id"] in inserted]
+    upsert_candles(db, new_rows)
+    upsert_instrument_stats(db, new_rows)
+
+    payloads = [payload for payload in payloads if payload["price_id"] in inserted]
+    if used == "copy" and payloads:
+        _copy_rows(db, PricePayload.__tablename__, PAYLOAD_COLUMNS, payloads)
+    elif payloads:
+        db.execute(insert(PricePayload), payloads)
+
+    if commit:
+        db.commit()
+        # Только после commit: кэш не должен опережать БД
+        registry = get_instrument_registry()
+        names = registry.names(row["instrument_id"] for row in new_rows)
+        publish_latest(latest_by_instrument(new_rows, names))
+
+    result = BulkWriteResult(
+        len(inserted),
+        time.perf_counter() - started,
+        used,
+        duplicates=len(rows) - len(inserted),
+    )
+    logger.debug(
+        "💾 Bulk insert (%s): %d rows, %d duplicates in %.1fms, %.0f rows/s",
+        result.method,
+        result.rows,
+        result.duplicates,
+        result.seconds * 1000,
+        result.rows_per_sec,
+    )
+    return result
@@ -0,0 +1,262 @@
+"""Ограничение частоты запросов к Deribit по модели кредитов.
+
+Deribit списывает кредиты за каждый запрос и пополняет их с постоянной
+скоростью до максимального запаса. CreditBucket моделирует это как token
+bucket, общий на процесс. RequestScheduler (по одному на event loop)
+ограничивает число запросов в полете и выдает разрешения по очереди
+между ключами (инструментами), чтобы один инструмент с повторами не
+занимал весь бюджет.
+
+При 429 / too_many_requests скорость пополнения уменьшается вдвое и
+вводится пауза (AIMD), затем по мере успешных ответов постепенно
+возвращается к номинальной.
+"""
+
+import asyncio
+import logging
+import random
+import threading
+import time
+import weakref
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# Код ошибки Deribit при превышении лимита
+TOO_MANY_REQUESTS_CODE = 10028
+
+
+class CreditBucket:
+    """Token bucket в кредитах Deribit (потокобезопасный)"""
+
+    def __init__(
+        self,
+        refill_rate: float,
+        max_credits: float,
+        min_rate_fraction: float = 0.1,
+        max_cooldown: float = 10.0,
+    ):
+        self.nominal_rate = refill_rate
+        self.refill_rate = refill_rate
+        self.max_credits = max_credits
+        self.min_rate_fraction = min_rate_fraction
+        self.max_cooldown = max_cooldown
+
+        self._credits = max_credits
+        self._updated = time.monotonic()
+        self._cooldown_until = 0.0
+        self._penalties = 0
+        self._lock = threading.Lock()
+
+    @property
+    def min_rate(self) -> float:
+        return self.nominal_rate * self.min_rate_fraction
+
+    def _refill(self, now: float):
+        elapsed = now - self._updated
+        if elapsed > 0:
+            self._credits = min(
+                self.max_credits, self._credits + elapsed * self.refill_rate
+            )
+            self._updated = now
+
+    def reserve(self, cost: float) -> float:
+        """Списать кредиты. Возвращает 0 при успехе или сколько секунд ждать"""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return self._cooldown_until - now
+
+            self._refill(now)
+            if self._credits >= cost:
+                self._credits -= cost
+                return 0.0
+            return (cost - self._credits) / self.refill_rate
+
+    def configure(self, refill_rate: float, max_credits: float):
+        """Смена тарифа (например, после авторизации)"""
+        with self._lock:
+            self._refill(time.monotonic())
+            self.nominal_rate = refill_rate
+            self.max_credits = max_credits
+            if self._penalties:
+                # После 429 скорость растет постепенно и с новым тарифом
+                self.refill_rate = max(self.min_rate, min(self.refill_rate, refill_rate))
+            else:
+                self.refill_rate = refill_rate
+
+    def penalize(self, retry_after: Optional[float] = None):
+        """Ответ 429: обнуляем запас, режем скорость вдвое и делаем паузу.
+
+        Пока идет пауза, повторные 429 от запросов, отправленных до нее,
+        не наказывают еще раз.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._cooldown_until:
+                return
+
+            self._penalties += 1
+            self._credits = 0.0
+            self._updated = now
+            self.refill_rate = max(self.min_rate, self.refill_rate / 2)
+
+            cooldown = retry_after
+            if cooldown is None:
+                cooldown = min(self.max_cooldown, 0.25 * 2 ** (self._penalties - 1))
+                cooldown += random.uniform(0, cooldown / 2)
+            self._cooldown_until = now + cooldown
+            refill_rate = self.refill_rate
+
+        logger.warning(
+            f"🚦 Rate limited by Deribit: refill {refill_rate:.0f} credits/s, "
+            f"cooling down {cooldown:.2f}s"
+        )
+
+    def reward(self):
+        """Успешный ответ: аддитивно возвращаем скорость к номинальной"""
+        if self.refill_rate >= self.nominal_rate and not self._penalties:
+            return
+        with self._lock:
+            self._penalties = 0
+            self.refill_rate = min(
+                self.nominal_rate, self.refill_rate + self.nominal_rate * 0.01
+            )
+
+
+class RequestScheduler:
+    """Очередь запросов с лимитом в полете и справедливостью между ключами"""
+
+    def __init__(self, bucket: CreditBucket, cost: float, max_in_flight: int):
+        self.bucket = bucket
+        self.cost = cost
+        self.max_in_flight = max_in_flight
+
+        self._queues: "OrderedDict[str, Deque[asyncio.Future]]" = OrderedDict()
+        self._in_flight = 0
+        self._wakeup = asyncio.Event()
+        self._dispatcher: Optional[asyncio.Task] = None
+
+    @property
+    def waiting(self) -> int:
+        return sum(len(q) for q in self._queues.values())
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    def _next_waiter(self) -> Optional[asyncio.Future]:
+        """Следующий ожидающий по кругу между ключами"""
+        while self._queues:
+            key, queue = next(iter(self._queues.items()))
+            # Ключ уходит в конец круга
+            self._queues.move_to_end(key)
+            while queue:
+                future = queue.popleft()
+                if not future.done():
+                    if not queue:
+                        del self._queues[key]
+                    return future
+            del self._queues[key]
+        return None
+
+    def _has_waiters(self) -> bool:
+        for queue in self._queues.values():
+            if any(not f.done() for f in queue):
+                return True
+        return False
+
+    async def _dispatch(self):
+        try:
+            while self._has_waiters():
+                if self._in_flight >= self.max_in_flight:
+                    self._wakeup.clear()
+                    await self._wakeup.wait()
+                    continue
+
+                wait = self.bucket.reserve(self.cost)
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                    continue
+
+                future = self._next_waiter()
+                if future is None:
+                    # Все ожидающие отменились; списанные кредиты просто теряются
+                    break
+                self._in_flight += 1
+                future.set_result(None)
+        finally:
+            self._dispatcher = None
+
+    def _ensure_dispatcher(self):
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+
+    def _release(self):
+        self._in_flight -= 1
+        self._wakeup.set()
+
+    @asynccontextmanager
+    async def slot(self, key: str = "") -> AsyncIterator[None]:
+        """Дождаться разрешения на запрос и занять место в полете"""
+        future = asyncio.get_running_loop().create_future()
+        self._queues.setdefault(key, deque()).append(future)
+        self._ensure_dispatcher()
+
+        try:
+            await future
+        except asyncio.CancelledError:
+            if future.done() and not future.cancelled():
+                # Разрешение уже выдано — освобождаем место
+                self._release()
+            raise
+
+        try:
+            yield
+        finally:
+            self._release()
+
+
+_bucket: Optional[CreditBucket] = None
+_bucket_lock = threading.Lock()
+_schedulers: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, RequestScheduler]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def get_credit_bucket() -> CreditBucket:
+    """Общий на процесс бюджет кредитов"""
+    global _bucket
+    with _bucket_lock:
+        if _bucket is None:
+            _bucket = CreditBucket(
+                refill_rate=settings.DERIBIT_RATE_CREDITS_PER_SEC,
+                max_credits=settings.DERIBIT_RATE_MAX_CREDITS,
+            )
+        return _bucket
+
+
+def get_request_scheduler() -> RequestScheduler:
+    """Планировщик запросов для текущего event loop"""
+    loop = asyncio.get_running_loop()
+    scheduler = _schedulers.get(loop)
+    if scheduler is None:
+        scheduler = RequestScheduler(
+            get_credit_bucket(),
+            cost=settings.DERIBIT_REQUEST_COST,
+            max_in_flight=settings.DERIBIT_MAX_IN_FLIGHT,
+        )
+        _schedulers[loop] = scheduler
+    return scheduler
+
+
+def is_rate_limited(status: int, body: Optional[Dict[str, Any]] = None) -> bool:
+    """Ответ означает превышение лимита Deribit"""
+    if status == 429:
+        return True
+    error = body.get("error") if isinstance(body, dict) else None
+    return isinstance(error, dict) and error.get("code") == TOO_MANY_REQUESTS_CODE
@@ -0,0 +1,102 @@
+"""Статистика по инструментам без полного подсчета prices.
+
+count(*) по prices читает все партиции, и /api/stats дорожал вместе с
+таблицей. Теперь счетчики instrument_stats (число тиков, первый/последний
+тик, минимум/максимум цены) обновляются в транзакции записи тиков, как и
+свечи: новые тики пачки агрегируются в памяти и сливаются через
+INSERT ... ON CONFLICT DO UPDATE. Чтение — одна строка на инструмент.
+
+Счетчики накопительные: тики, перенесенные в архив или удаленные по
+сроку хранения, из них не вычитаются. Число строк, которые сейчас лежат в
+prices, дает оценка планировщика (estimated_rows).
+"""
+
+from typing import Any, Dict, Iterable, List
+
+from sqlalchemy import case, func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.db.models import Instrument, InstrumentStats
+from app.db.partitions import estimated_rows
+
+
+def build_stats(rows: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Счетчики пачки по инструментам из строк prices (instrument_id, price, ...)"""
+    stats: Dict[int, Dict[str, Any]] = {}
+
+    for row in rows:
+        timestamp = row["timestamp"]
+        price = row["price"]
+        current = stats.get(row["instrument_id"])
+        if current is None:
+            stats[row["instrument_id"]] = {
+                "instrument_id": row["instrument_id"],
+                "ticks": 1,
+                "first_timestamp": timestamp,
+                "last_timestamp": timestamp,
+                "min_price": price,
+                "max_price": price,
+                "last_price": price,
+            }
+            continue
+
+        current["ticks"] += 1
+        current["first_timestamp"] = min(current["first_timestamp"], timestamp)
+        current["min_price"] = min(current["min_price"], price)
+        current["max_price"] = max(current["max_price"], price)
+        if timestamp >= current["last_timestamp"]:
+            current["last_timestamp"] = timestamp
+            current["last_price"] = price
+
+    # Один порядок строк у всех писателей — без взаимных блокировок
+    return [stats[key] for key in sorted(stats)]
+
+
+def upsert_instrument_stats(db: Session, rows: Iterable[Dict[str, Any]]) -> int:
+    """Добавить новые тики к счетчикам в текущей транзакции"""
+    stats = build_stats(rows)
+    if not stats:
+        return 0
+
+    table = InstrumentStats.__table__
+    statement = insert(table).values(stats)
+    new = statement.excluded
+    is_later = new.last_timestamp >= table.c.last_timestamp
+    statement = statement.on_conflict_do_update(
+        index_elements=["instrument_id"],
+        set_={
+            "ticks": table.c.ticks + new.ticks,
+            "first_timestamp": func.least(table.c.first_timestamp, new.first_timestamp),
+            "last_timestamp": func.greatest(table.c.last_timestamp, new.last_timestamp),
+            "min_price": func.least(table.c.min_price, new.min_price),
+            "max_price": func.greatest(table.c.max_price, new.max_price),
+            "last_price": case((is_later, new.last_price), else_=table.c.last_price),
+        },
+    )
+    db.execute(statement)
+    return len(stats)
+
+
+async def estimated_rows_async(db: AsyncSession) -> int:
+    """Строк в prices сейчас по оценке планировщика (без чтения таблицы)"""
+    return await db.run_sync(lambda session: estimated_rows(session.connection()))
+
+
+async def instrument_stats_async(db: AsyncSession) -> List[Any]:
+    """Счетчики каждого инструмента с его именем, по имени"""
+    result = await db.execute(
+        select(
+            Instrument.name.label("instrument_name"),
+            InstrumentStats.ticks,
+            InstrumentStats.first_timestamp,
+            InstrumentStats.last_timestamp,
+            InstrumentStats.min_price,
+            InstrumentStats.max_price,
+            InstrumentStats.last_price,
+        )
+        .join(Instrument, InstrumentStats.instrument_id == Instrument.id)
+        .order_by(Instrument.name)
+    )
+    return result.all()
@@ -0,0 +1,308 @@
+"""Буфер отложенной записи тиков (write-behind).
+
+Сбор тиков кладет их в очередь и сразу продолжает работу, запись в БД
+идет в фоне пачками: по достижении TICK_BUFFER_MAX_BATCH записей или
+через TICK_BUFFER_MAX_LATENCY секунд после первого тика пачки.
+
+Если БД не успевает, очередь заполняется до TICK_BUFFER_MAX_PENDING и
+``put`` начинает ждать (обратное давление). Если БД недоступна, пачки
+дописываются в файл TICK_BUFFER_SPILL_PATH (JSON Lines) и переносятся
+в БД, когда она снова отвечает (не чаще TICK_BUFFER_RETRY_INTERVAL).
+Файл переносится построчно, без чтения целиком в память.
+
+Ошибка самой пачки (неверные данные, нарушение ограничения) повтором не
+лечится: такая пачка уходит в файл ``*.rejected`` рядом с файлом сбоя,
+а запись продолжается.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import shutil
+import time
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional
+
+from sqlalchemy.exc import DisconnectionError, InterfaceError, OperationalError
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+
+from app.core.config import settings
+from app.services.price_storage import BulkWriteResult
+from app.services.ticks import TickerRecord
+
+logger = logging.getLogger(__name__)
+
+# Запись пачки в БД; выполняется в пуле потоков
+BatchWriter = Callable[[List[TickerRecord]], BulkWriteResult]
+
+# Признак остановки в очереди
+_STOP = object()
+
+# Сбои связи с БД: пачку стоит повторить позже
+TRANSIENT_ERRORS = (
+    OperationalError,
+    InterfaceError,
+    DisconnectionError,
+    PoolTimeoutError,
+)
+
+
+def _dump_record(record: TickerRecord) -> str:
+    return json.dumps(
+        [
+            record.instrument_name,
+            record.timestamp_ms,
+            record.mark_price,
+            record.mark_iv,
+            record.volume,
+            record.volume_usd,
+            record.price_change,
+            record.raw,
+        ],
+        separators=(",", ":"),
+    )
+
+
+def _load_record(line: str) -> TickerRecord:
+    return TickerRecord(*json.loads(line))
+
+
+class TickBuffer:
+    """Очередь тиков с фоновой пакетной записью и файлом на случай сбоя БД"""
+
+    def __init__(
+        self,
+        writer: BatchWriter,
+        max_batch: Optional[int] = None,
+        max_latency: Optional[float] = None,
+        max_pending: Optional[int] = None,
+        spill_path: Optional[str] = None,
+        retry_interval: Optional[float] = None,
+    ):
+        self.writer = writer
+        self.max_batch = max_batch or settings.TICK_BUFFER_MAX_BATCH
+        self.max_latency = (
+            max_latency if max_latency is not None else settings.TICK_BUFFER_MAX_LATENCY
+        )
+        self.spill_path = Path(spill_path or settings.TICK_BUFFER_SPILL_PATH)
+        self.rejected_path = self.spill_path.with_suffix(".rejected")
+        self.retry_interval = (
+            retry_interval
+            if retry_interval is not None
+            else settings.TICK_BUFFER_RETRY_INTERVAL
+        )
+
+        self._queue: asyncio.Queue = asyncio.Queue(
+            maxsize=max_pending or settings.TICK_BUFFER_MAX_PENDING
+        )
+        self._flusher: Optional[asyncio.Task] = None
+        self._closing = False
+
+        # Файл мог остаться от прошлого запуска — перенесем его при первой записи
+        self._spilling = self.spill_path.exists()
+        self._next_retry = 0.0
+
+        # Счетчики для мониторинга
+        self.flushed = 0
+        self.spilled = 0
+        self.replayed = 0
+        self.dropped = 0
+        self.rejected = 0  # Тики пачек, которые БД отвергла (в rejected_path)
+        self.duplicates = 0  # Тики, уже сохраненные ранее (пропущены БД)
+        self.last_rows_per_sec = 0.0
+
+    @property
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    @property
+    def spilling(self) -> bool:
+        """БД недоступна, пачки пишутся в файл"""
+        return self._spilling
+
+    def _ensure_flusher(self):
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.create_task(self.run())
+
+    async def put(self, record: TickerRecord):
+        """Добавить тик; ждет, если очередь заполнена"""
+        if self._closing:
+            raise RuntimeError("TickBuffer is closed")
+        self._ensure_flusher()
+        await self._queue.put(record)
+
+    async def put_many(self, records: Iterable[TickerRecord]):
+        for record in records:
+            await self.put(record)
+
+    def _append(self, path: Path, batch: List[TickerRecord]):
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("a", encoding="utf-8") as f:
+            f.writelines(_dump_record(record) + "\n" for record in batch)
+
+    def _append_rejected(self, batch: List[TickerRecord], error: Exception):
+        logger.error(
+            f"🚫 DB rejected {len(batch)} ticks, moved to {self.rejected_path}: "
+            f"{error}"
+        )
+        try:
+            self._append(self.rejected_path, batch)
+            self.rejected += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.error(f"💥 Cannot save {len(batch)} rejected ticks, dropped: {e}")
+
+    def _replay_chunk(self, lines: List[str]):
+        records = []
+        for line in lines:
+            try:
+                records.append(_load_record(line))
+            except (ValueError, TypeError) as e:
+                logger.error(f"❌ Skipping corrupt spill line: {e}")
+        if not records:
+            return
+        try:
+            # После сбоя часть пачки могла уже попасть в БД
+            self.duplicates += self.writer(records).duplicates
+        except TRANSIENT_ERRORS:
+            raise
+        except Exception as e:
+            # Повтор этой пачки не поможет: откладываем ее и идем дальше
+            self._append_rejected(records, e)
+
+    def _replay_spill(self) -> int:
+        """Перенос файла в БД пачками; непереданный остаток остается в файле"""
+        if not self.spill_path.exists():
+            return 0
+
+        done = 0
+        kept = None  # None — файл перенесен целиком
+        tmp_path = self.spill_path.with_suffix(".tmp")
+        try:
+            with self.spill_path.open(encoding="utf-8") as f:
+                chunk: List[str] = []
+                try:
+                    for chunk in iter(lambda: list(islice(f, self.max_batch)), []):
+                        self._replay_chunk(chunk)
+                        done += len(chunk)
+                except BaseException:
+                    # Текущая пачка и непрочитанный хвост — в новый файл
+                    kept = False
+                    with tmp_path.open("w", encoding="utf-8") as tmp:
+                        tmp.writelines(chunk)
+                        shutil.copyfileobj(f, tmp)
+                    kept = True
+                    raise
+        finally:
+            if kept is None:
+                self.spill_path.unlink()
+            elif kept:
+                os.replace(tmp_path, self.spill_path)
+
+        return done
+
+    async def _spill(self, batch: List[TickerRecord]):
+        loop = asyncio.get_running_loop()
+        try:
+            await loop.run_in_executor(None, self._append, self.spill_path, batch)
+            self.spilled += len(batch)
+        except OSError as e:
+            self.dropped += len(batch)
+            logger.error(f"💥 Cannot spill {len(batch)} ticks, dropped: {e}")
+
+    async def _flush(self, batch: List[TickerRecord]):
+        loop = asyncio.get_running_loop()
+
+        if self._spilling and loop.time() < self._next_retry:
+            await self._spill(batch)
+            return
+
+        try:
+            if self._spilling:
+                replayed = await loop.run_in_executor(None, self._replay_spill)
+                self._spilling = False
+                if replayed:
+                    self.replayed += replayed
+                    logger.info(f"♻️ Replayed {replayed} spilled ticks into DB")
+
+            started = time.perf_counter()
+            result = await loop.run_in_executor(None, self.writer, batch)
+        except Exception as e:
+            if not self._spilling and not isinstance(e, TRANSIENT_ERRORS):
+                # Ошибка самой пачки, а не БД: файл сбоя ей не поможет
+                await loop.run_in_executor(None, self._append_rejected, batch, e)
+                return
+            if not self._spilling:
+                logger.error(f"❌ DB write failed, spilling to {self.spill_path}: {e}")
+            self._spilling = True
+            self._next_retry = loop.time() + self.retry_interval
+            await self._spill(batch)
+            return
+
+        self.flushed += result.rows
+        self.duplicates += result.duplicates
+        self.last_rows_per_sec = result.rows_per_sec
+        logger.debug(
+            "💾 Flushed %d ticks, %d duplicates in %.1fms (%s, %.0f rows/s), "
+            "%d pending",
+            result.rows,
+            result.duplicates,
+            (time.perf_counter() - started) * 1000,
+            result.method,
+            result.rows_per_sec,
+            self._queue.qsize(),
+        )
+
+    async def run(self):
+        """Фоновая запись: пачка по размеру или по задержке первого тика"""
+        loop = asyncio.get_running_loop()
+        stopping = False
+
+        while not stopping:
+            item = await self._queue.get()
+            if item is _STOP:
+                break
+
+            batch = [item]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch:
+                if self._queue.empty():
+                    remaining = deadline - loop.time()
+                    if remaining <= 0:
+                        break
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), remaining)
+                    except asyncio.TimeoutError:
+                        break
+                else:
+                    item = self._queue.get_nowait()
+
+                if item is _STOP:
+                    stopping = True
+                    break
+                batch.append(item)
+
+            await self._flush(batch)
+
+    async def close(self):
+        """Записать все, что в очереди, и остановить фоновую запись"""
+        if self._closing:
+            return
+        self._closing = True
+
+        if self._flusher is not None and not self._flusher.done():
+            await self._queue.put(_STOP)
+            await self._flusher
+        elif not self._queue.empty():
+            batch = []
+            while not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            await self._flush(batch)
+
+        logger.info(
+            f"🏁 Tick buffer closed: {self.flushed} flushed, {self.spilled} spilled, "
+            f"{self.replayed} replayed, {self.rejected} rejected, "
+            f"{self.dropped} dropped"
+        )
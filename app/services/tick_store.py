@@ -0,0 +1,440 @@
+"""Сжатое хранилище тиков в памяти процесса (по схеме Gorilla).
+
+Ряд на инструмент: время биржи (мс) кодируется разностью второго порядка
+(delta-of-delta), цена — XOR с предыдущим значением (повтор окна значащих
+бит без заголовка). Новые точки копятся в открытом блоке на array; когда
+в нем TICK_STORE_BLOCK_SIZE точек, блок сжимается в bytes и больше не
+меняется. Диапазонные запросы пропускают блоки вне интервала целиком и
+читают сжатые блоки без блокировки записи.
+"""
+
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from app.core.config import settings
+from app.services.ticks import TickerRecord
+
+MASK64 = (1 << 64) - 1
+# Допустимое время точки, мс: [0, 2**62). Тогда разность второго порядка
+# всегда помещается в 64 бита со знаком, и первое время — в 64 бита без знака
+MAX_TIMESTAMP = 1 << 62
+
+Point = Tuple[int, float]
+
+
+class _BitWriter:
+    """Запись битов в bytearray через накопитель до 64 бит"""
+
+    __slots__ = ("buffer", "_acc", "_bits")
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self._acc = 0
+        self._bits = 0
+
+    def write(self, value: int, bits: int):
+        self._acc = (self._acc << bits) | value
+        self._bits += bits
+        if self._bits >= 64:
+            rest = self._bits & 7
+            self.buffer += (self._acc >> rest).to_bytes(self._bits >> 3, "big")
+            self._acc &= (1 << rest) - 1
+            self._bits = rest
+
+    def getvalue(self) -> bytes:
+        if self._bits:
+            pad = -self._bits % 8
+            self.buffer += (self._acc << pad).to_bytes((self._bits + pad) >> 3, "big")
+            self._acc = self._bits = 0
+        return bytes(self.buffer)
+
+
+def check_timestamp(timestamp_ms: int) -> bool:
+    return 0 <= timestamp_ms < MAX_TIMESTAMP
+
+
+def encode_block(timestamps: List[int], prices: List[float]) -> bytes:
+    """Сжатие точек блока: время delta-of-delta, цена XOR.
+
+    ValueError для пустого блока, разной длины списков и времени вне
+    [0, MAX_TIMESTAMP): такие точки разобрались бы неверно без ошибки.
+    """
+    count = len(timestamps)
+    if not count or count != len(prices):
+        raise ValueError(f"Invalid block: {count} timestamps, {len(prices)} prices")
+    if not check_timestamp(min(timestamps)) or not check_timestamp(max(timestamps)):
+        raise ValueError(f"Timestamp out of range [0, {MAX_TIMESTAMP})")
+    bits = struct.unpack(f">{count}Q", struct.pack(f">{count}d", *prices))
+
+    writer = _BitWriter()
+    write = writer.write
+    prev_ts = timestamps[0]
+    prev_bits = bits[0]
+    write(prev_ts, 64)
+    write(prev_bits, 64)
+
+    prev_delta = 0
+    # Окно значащих бит предыдущего XOR; 64/64 — окна еще нет
+    prev_lead = prev_trail = 64
+    for i in range(1, count):
+        ts = timestamps[i]
+        delta = ts - prev_ts
+        dod = delta - prev_delta
+        prev_ts, prev_delta = ts, delta
+
+        # Префикс и значение одним вызовом: 0 | 10+7 | 110+9 | 1110+12 | 1111+64
+        if dod == 0:
+            write(0, 1)
+        elif -64 <= dod < 64:
+            write((0b10 << 7) | (dod & 0x7F), 9)
+        elif -256 <= dod < 256:
+            write((0b110 << 9) | (dod & 0x1FF), 12)
+        elif -2048 <= dod < 2048:
+            write((0b1110 << 12) | (dod & 0xFFF), 16)
+        else:
+            write(0b1111, 4)
+            write(dod & MASK64, 64)
+
+        value = bits[i]
+        xor = value ^ prev_bits
+        prev_bits = value
+        if xor == 0:
+            write(0, 1)
+            continue
+
+        lead = min(64 - xor.bit_length(), 31)
+        trail = (xor & -xor).bit_length() - 1
+        if lead >= prev_lead and trail >= prev_trail:
+            # 10: значащие биты в окне предыдущего значения
+            size = 64 - prev_lead - prev_trail
+            write((0b10 << size) | (xor >> prev_trail), 2 + size)
+        else:
+            # 11: новое окно — 5 бит ведущих нулей, 6 бит длины (0 — это 64)
+            size = 64 - lead - trail
+            header = (0b11 << 11) | (lead << 6) | (size & 63)
+            write((header << size) | (xor >> trail), 13 + size)
+            prev_lead, prev_trail = lead, trail
+
+    return writer.getvalue()
+
+
+def decode_block(data: bytes, count: int) -> Tuple[List[int], List[float]]:
+    """Обратное к encode_block: списки времени (мс) и цен.
+
+    Биты читаются окнами по 72 бита (9 байт) — одно окно на время и одно
+    на цену точки вместо вызова на каждое поле.
+    """
+    buffer = data + bytes(18)
+    from_bytes = int.from_bytes
+
+    ts = from_bytes(buffer[0:8], "big")
+    value = from_bytes(buffer[8:16], "big")
+    timestamps = [ts]
+    values = [value]
+    append_ts = timestamps.append
+    append_value = values.append
+
+    pos = 128
+    delta = 0
+    lead = trail = 0
+    for _ in range(count - 1):
+        # Время: окно начинается с префикса delta-of-delta
+        window = from_bytes(buffer[pos >> 3 : (pos >> 3) + 9], "big")
+        left = 72 - (pos & 7)  # Непрочитанных бит в окне
+        if not window >> (left - 1) & 1:
+            pos += 1
+        elif not window >> (left - 2) & 1:
+            dod = window >> (left - 9) & 0x7F
+            delta += dod - 128 if dod >= 64 else dod
+            pos += 9
+        elif not window >> (left - 3) & 1:
+            dod = window >> (left - 12) & 0x1FF
+            delta += dod - 512 if dod >= 256 else dod
+            pos += 12
+        elif not window >> (left - 4) & 1:
+            dod = window >> (left - 16) & 0xFFF
+            delta += dod - 4096 if dod >= 2048 else dod
+            pos += 16
+        else:
+            pos += 4
+            start = pos >> 3
+            dod = (
+                from_bytes(buffer[start : start + 9], "big") >> (8 - (pos & 7))
+            ) & MASK64
+            delta += dod - (1 << 64) if dod >= 1 << 63 else dod
+            pos += 64
+        ts += delta
+        append_ts(ts)
+
+        # Цена: 0 | 10 + биты в прежнем окне | 11 + 5 + 6 + биты
+        start = pos >> 3
+        window = from_bytes(buffer[start : start + 9], "big")
+        left = 72 - (pos & 7)
+        if window >> (left - 1) & 1:
+            if window >> (left - 2) & 1:
+                lead = window >> (left - 7) & 0x1F
+                size = (window >> (left - 13) & 0x3F) or 64
+                trail = 64 - lead - size
+                pos += 13
+                left -= 13
+            else:
+                size = 64 - lead - trail
+                pos += 2
+                left -= 2
+            if size > left:
+                start = pos >> 3
+                window = from_bytes(buffer[start : start + 9], "big")
+                left = 72 - (pos & 7)
+            value ^= (window >> (left - size) & ((1 << size) - 1)) << trail
+            pos += size
+        else:
+            pos += 1
+        append_value(value)
+
+    prices = list(struct.unpack(f">{count}d", struct.pack(f">{count}Q", *values)))
+    return timestamps, prices
+
+
+class _Block:
+    __slots__ = ("start", "end", "count", "data")
+
+    def __init__(self, start: int, end: int, count: int, data: bytes):
+        self.start = start
+        self.end = end
+        self.count = count
+        self.data = data
+
+    def points(self) -> List[Point]:
+        return list(zip(*decode_block(self.data, self.count)))
+
+
+class TickSeries:
+    """Ряд тиков одного инструмента: сжатые блоки и открытый блок"""
+
+    __slots__ = ("block_size", "retention_ms", "blocks", "_ends", "_ts", "_prices")
+
+    def __init__(self, block_size: int, retention_ms: Optional[int] = None):
+        self.block_size = block_size
+        self.retention_ms = retention_ms
+        self.blocks: List[_Block] = []
+        self._ends: List[int] = []  # Время последней точки блоков, для bisect
+        self._ts = array("q")
+        self._prices = array("d")
+
+    def __len__(self) -> int:
+        return sum(block.count for block in self.blocks) + len(self._ts)
+
+    @property
+    def last_timestamp(self) -> Optional[int]:
+        if self._ts:
+            return self._ts[-1]
+        return self._ends[-1] if self._ends else None
+
+    @property
+    def nbytes(self) -> int:
+        """Объем данных: сжатые блоки плюс открытый блок"""
+        return (
+            sum(len(block.data) for block in self.blocks)
+            + self._ts.itemsize * len(self._ts)
+            + self._prices.itemsize * len(self._prices)
+        )
+
+    def append(self, timestamp_ms: int, price: float) -> bool:
+        """Добавить точку; время должно расти (повторы и опоздавшие — False)"""
+        last = self.last_timestamp
+        if not check_timestamp(timestamp_ms) or (
+            last is not None and timestamp_ms <= last
+        ):
+            return False
+
+        self._ts.append(timestamp_ms)
+        self._prices.append(price)
+        if len(self._ts) >= self.block_size:
+            self._seal()
+        return True
+
+    def _seal(self):
+        timestamps = self._ts.tolist()
+        self.blocks.append(
+            _Block(
+                timestamps[0],
+                timestamps[-1],
+                len(timestamps),
+                encode_block(timestamps, self._prices.tolist()),
+            )
+        )
+        self._ends.append(timestamps[-1])
+        self._ts = array("q")
+        self._prices = array("d")
+
+        if self.retention_ms:
+            self.trim(timestamps[-1] - self.retention_ms)
+
+    def trim(self, before_ms: int) -> int:
+        """Удалить блоки, целиком старше before_ms; возвращает число точек"""
+        drop = bisect_left(self._ends, before_ms)
+        if not drop:
+            return 0
+        removed = sum(block.count for block in self.blocks[:drop])
+        del self.blocks[:drop]
+        del self._ends[:drop]
+        return removed
+
+    def snapshot(
+        self, start_ms: Optional[int], end_ms: Optional[int]
+    ) -> Tuple[List[_Block], List[Point]]:
+        """Блоки, пересекающие интервал, и копия открытого блока"""
+        first = bisect_left(self._ends, start_ms) if start_ms is not None else 0
+        blocks = [
+            block
+            for block in self.blocks[first:]
+            if end_ms is None or block.start <= end_ms
+        ]
+        return blocks, list(zip(self._ts, self._prices))
+
+
+class TickStore:
+    """Тики всех инструментов в памяти процесса (потокобезопасно)"""
+
+    def __init__(
+        self,
+        block_size: Optional[int] = None,
+        retention_hours: Optional[float] = None,
+    ):
+        self.block_size = block_size or settings.TICK_STORE_BLOCK_SIZE
+        if retention_hours is None:
+            retention_hours = settings.TICK_STORE_RETENTION_HOURS
+        self.retention_ms = int(retention_hours * 3600 * 1000) or None
+
+        self._series: Dict[str, TickSeries] = {}
+        self._lock = threading.Lock()
+
+        # Повторы, тики с временем раньше последнего в ряду и вне диапазона
+        self.rejected = 0
+
+    def instruments(self) -> List[str]:
+        with self._lock:
+            return sorted(self._series)
+
+    def add(self, instrument: str, timestamp_ms: int, price: float) -> bool:
+        with self._lock:
+            return self._add(instrument, timestamp_ms, price)
+
+    def _add(self, instrument: str, timestamp_ms: int, price: float) -> bool:
+        series = self._series.get(instrument)
+        if series is None:
+            series = TickSeries(self.block_size, self.retention_ms)
+            self._series[instrument] = series
+        if series.append(timestamp_ms, price):
+            return True
+        self.rejected += 1
+        return False
+
+    def extend(self, records: Iterable[TickerRecord]) -> int:
+        """Добавить тики коллектора; возвращает число принятых"""
+        added = 0
+        with self._lock:
+            for record in records:
+                if record is None or record.mark_price is None:
+                    continue
+                added += self._add(
+                    record.instrument_name, record.timestamp_ms, record.mark_price
+                )
+        return added
+
+    def scan(
+        self,
+        instrument: str,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> List[Point]:
+        """Точки (время мс, цена) в интервале [start_ms, end_ms] по возрастанию"""
+        with self._lock:
+            series = self._series.get(instrument)
+            if series is None:
+                return []
+            blocks, head = series.snapshot(start_ms, end_ms)
+
+        # Сжатые блоки неизменяемы: разбираем их уже без блокировки
+        points: List[Point] = []
+        for block in blocks:
+            block_points = block.points()
+            if (start_ms is not None and block.start < start_ms) or (
+                end_ms is not None and block.end > end_ms
+            ):
+                block_points = _clip(block_points, start_ms, end_ms)
+            points.extend(block_points)
+        points.extend(_clip(head, start_ms, end_ms))
+        return points
+
+    def downsample(
+        self,
+        instrument: str,
+        step_ms: int,
+        start_ms: Optional[int] = None,
+        end_ms: Optional[int] = None,
+    ) -> List[Dict[str, Any]]:
+        """Свечи OHLC с шагом step_ms (начало свечи кратно шагу от эпохи)"""
+        candles: List[Dict[str, Any]] = []
+        candle: Optional[Dict[str, Any]] = None
+        for ts, price in self.scan(instrument, start_ms, end_ms):
+            bucket = ts - ts % step_ms
+            if candle is None or candle["bucket"] != bucket:
+                candle = {
+                    "bucket": bucket,
+                    "open": price,
+                    "high": price,
+                    "low": price,
+                    "close": price,
+                    "ticks": 0,
+                }
+                candles.append(candle)
+            if price > candle["high"]:
+                candle["high"] = price
+            elif price < candle["low"]:
+                candle["low"] = price
+            candle["close"] = price
+            candle["ticks"] += 1
+        return candles
+
+    def trim(self, before_ms: int) -> int:
+        """Удалить сжатые блоки старше before_ms во всех рядах"""
+        with self._lock:
+            return sum(series.trim(before_ms) for series in self._series.values())
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            points = sum(len(series) for series in self._series.values())
+            nbytes = sum(series.nbytes for series in self._series.values())
+            return {
+                "instruments": len(self._series),
+                "points": points,
+                "bytes": nbytes,
+                "bytes_per_tick": nbytes / points if points else 0.0,
+                "rejected": self.rejected,
+            }
+
+
+def _clip(points: List[Point], start_ms: Optional[int], end_ms: Optional[int]):
+    return [
+        point
+        for point in points
+        if (start_ms is None or point[0] >= start_ms)
+        and (end_ms is None or point[0] <= end_ms)
+    ]
+
+
+_store: Optional[TickStore] = None
+_store_lock = threading.Lock()
+
+
+def get_tick_store() -> TickStore:
+    """Общее на процесс хранилище тиков"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = TickStore()
+        return _store
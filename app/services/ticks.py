@@ -0,0 +1,115 @@
+"""Типизированная запись тикера и быстрый декодер ответа Deribit.
+
+TickerRecord хранит только поля, которые пишутся в prices: цену маркировки,
+волатильность, объемы, изменение цены и время биржи. Полный ответ
+остается ссылкой ``raw`` без копирования.
+"""
+
+from datetime import datetime, timezone
+from typing import Any, Dict, Optional, Union
+
+try:
+    # orjson заметно быстрее json на больших ответах, но не обязателен
+    import orjson
+
+    _loads = orjson.loads
+    _DecodeError: Any = orjson.JSONDecodeError
+except ImportError:  # pragma: no cover - зависит от окружения
+    import json
+
+    _loads = json.loads
+    _DecodeError = json.JSONDecodeError
+
+
+class TickerDecodeError(ValueError):
+    """Ответ не похож на тикер Deribit"""
+
+
+class TickerRecord:
+    """Тик инструмента (поля, которые пишутся в БД)"""
+
+    __slots__ = (
+        "instrument_name",
+        "timestamp_ms",
+        "mark_price",
+        "mark_iv",
+        "volume",
+        "volume_usd",
+        "price_change",
+        "raw",
+    )
+
+    def __init__(
+        self,
+        instrument_name: str,
+        timestamp_ms: int,
+        mark_price: float,
+        mark_iv: Optional[float] = None,
+        volume: Optional[float] = None,
+        volume_usd: Optional[float] = None,
+        price_change: Optional[float] = None,
+        raw: Optional[Dict[str, Any]] = None,
+    ):
+        self.instrument_name = instrument_name
+        self.timestamp_ms = timestamp_ms
+        self.mark_price = mark_price
+        self.mark_iv = mark_iv
+        self.volume = volume
+        self.volume_usd = volume_usd
+        self.price_change = price_change
+        self.raw = raw
+
+    @property
+    def timestamp(self) -> datetime:
+        """Время биржи в UTC"""
+        return datetime.fromtimestamp(self.timestamp_ms / 1000, tz=timezone.utc)
+
+    @classmethod
+    def from_dict(
+        cls, data: Dict[str, Any], instrument_name: Optional[str] = None
+    ) -> Optional["TickerRecord"]:
+        """Запись из result public/ticker или data уведомления ticker.*"""
+        mark_price = data.get("mark_price")
+        if mark_price is None:
+            return None
+
+        timestamp_ms = data.get("timestamp")
+        if not timestamp_ms:
+            timestamp_ms = int(datetime.now(timezone.utc).timestamp() * 1000)
+
+        stats = data.get("stats") or {}
+        return cls(
+            instrument_name or data.get("instrument_name", ""),
+            timestamp_ms,
+            mark_price,
+            data.get("mark_iv"),
+            stats.get("volume"),
+            stats.get("volume_usd"),
+            stats.get("price_change"),
+            data,
+        )
+
+    def __repr__(self):
+        return (
+            f"<TickerRecord {self.instrument_name}: {self.mark_price} "
+            f"at {self.timestamp_ms}>"
+        )
+
+
+def decode_ticker(
+    body: Union[bytes, str], instrument_name: Optional[str] = None
+) -> TickerRecord:
+    """Разбор JSON-RPC ответа public/ticker сразу в TickerRecord"""
+    try:
+        envelope = _loads(body)
+    except _DecodeError as e:
+        raise TickerDecodeError(f"JSON decode error: {e}") from e
+
+    result = envelope.get("result") if isinstance(envelope, dict) else None
+    if not isinstance(result, dict):
+        raise TickerDecodeError("No ticker 'result' in response")
+
+    record = TickerRecord.from_dict(result, instrument_name)
+    if record is None:
+        raise TickerDecodeError("Ticker has no mark_price")
+    return record
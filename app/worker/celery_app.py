@@ -60,8 +60,48 @@ celery_app.conf.beat_schedule = {
             "expires": 25,  # Истекает через 25 секунд
         },
     },
+    # Дневные партиции prices: создание заранее и удаление по сроку хранения
+    "maintain-price-partitions": {
+        "task": "app.worker.tasks.maintain_price_partitions",
+        "schedule": 3600.0,
+        "args": (),
+        "options": {"queue": "celery"},
+    },
+    # Архив Parquet: старые дни уходят из БД до удаления по сроку хранения
+    "archive-prices": {
+        "task": "app.worker.tasks.archive_prices",
+        "schedule": 3600.0,
+        "args": (),
+        "options": {"queue": "celery"},
+    },
+    # Справочник инструментов: новые экспирации и страйки
+    "sync-instruments": {
+        "task": "app.worker.tasks.sync_instruments",
+        "schedule": 6 * 3600.0,
+        "args": (),
+        "options": {"queue": "celery"},
+    },
 }
 
+# Долгоживущий коллектор внутри worker заменяет задачу по расписанию
+if settings.COLLECTOR_IN_WORKER:
+    from app.worker.collector import CollectorBootstep
+
+    celery_app.steps["worker"].add(CollectorBootstep)
+    celery_app.conf.beat_schedule.pop("fetch-prices-test", None)
+
+# Снимок всего рынка (фьючерсы, опционы, индексы) несколькими запросами
+if settings.SNAPSHOT_ENABLED:
+    celery_app.conf.beat_schedule["fetch-market-snapshot"] = {
+        "task": "app.worker.tasks.fetch_and_store_market_snapshot",
+        "schedule": 30.0,
+        "args": (),
+        "options": {
+            "queue": "celery",
+            "expires": 25,
+        },
+    }
+
 # Для тестирования
 if __name__ == "__main__":
     print("=" * 60)
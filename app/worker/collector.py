@@ -0,0 +1,205 @@
+"""Долгоживущий коллектор цен.
+
+В отличие от задачи fetch_and_store_prices, которая на каждом запуске
+создает event loop, клиента Deribit, HTTP-сессию и сессию БД, коллектор
+держит их все время жизни процесса: один event loop, одна HTTP-сессия
+с keep-alive и пул соединений SQLAlchemy. Запись в БД идет в фоне через
+TickBuffer, так что медленная БД не задерживает следующий цикл.
+
+Запуск отдельным процессом:
+    python -m app.worker.collector
+
+Или внутри Celery worker (вместо задачи по расписанию):
+    COLLECTOR_IN_WORKER=true celery -A app.worker.tasks worker --pool=solo
+"""
+
+import asyncio
+import logging
+import signal
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from celery import bootsteps
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.deribit_client import DeribitClient
+from app.services.price_storage import BulkWriteResult, bulk_insert_prices
+from app.services.tick_buffer import TickBuffer
+from app.services.tick_store import TickStore, get_tick_store
+from app.services.ticks import TickerRecord
+
+logger = logging.getLogger(__name__)
+
+
+class PriceCollector:
+    """Периодический сбор цен с переиспользованием соединений"""
+
+    def __init__(
+        self, instruments: Optional[List[str]] = None, interval: Optional[float] = None
+    ):
+        self.instruments = instruments or settings.COLLECTOR_INSTRUMENT_LIST
+        self.interval = interval or settings.COLLECTOR_INTERVAL
+        self.client = DeribitClient()
+        self.buffer = TickBuffer(self._save)
+        # Те же тики, что уходят в prices, для аналитики без БД
+        self.tick_store: Optional[TickStore] = (
+            get_tick_store() if settings.TICK_STORE_ENABLED else None
+        )
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._stopping: Optional[asyncio.Event] = None
+        self._stop_requested = False
+
+        # Счетчики для мониторинга
+        self.cycles = 0
+        self.records = 0
+        self.last_cycle_seconds = 0.0
+
+    def _save(self, records: List[TickerRecord]) -> BulkWriteResult:
+        # Сессия берет соединение из общего пула engine и возвращает его
+        db = SessionLocal()
+        try:
+            return bulk_insert_prices(db, records)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def collect_once(self) -> Dict[str, Any]:
+        """Один цикл: получение тикеров и передача в буфер записи"""
+        started = time.perf_counter()
+
+        batch = await self.client.fetch_tickers(self.instruments)
+        if batch.failed or batch.timed_out:
+            logger.warning(
+                f"⚠️ Partial cycle: failed {batch.failed}, timed out {batch.timed_out}"
+            )
+
+        prices = batch.prices
+        if not prices:
+            logger.warning("⚠️ No prices received from Deribit")
+            return {"status": "no_data", "records": 0, **batch.summary()}
+
+        # Запись идет в фоне; при отставании БД здесь сработает обратное давление
+        await self.buffer.put_many(prices.values())
+        if self.tick_store is not None:
+            self.tick_store.extend(prices.values())
+
+        self.records += len(prices)
+        self.last_cycle_seconds = time.perf_counter() - started
+        logger.info(
+            f"✅ Cycle buffered {len(prices)} records in "
+            f"{self.last_cycle_seconds * 1000:.0f}ms "
+            f"({self.buffer.pending} pending, "
+            f"{self.buffer.duplicates} duplicates, "
+            f"last flush {self.buffer.last_rows_per_sec:.0f} rows/s)"
+        )
+        return {
+            "status": "spilling" if self.buffer.spilling else "success",
+            "records": len(prices),
+            "pending": self.buffer.pending,
+            "duplicates": self.buffer.duplicates,
+            **batch.summary(),
+        }
+
+    async def run(self):
+        """Циклы сбора по расписанию до вызова stop()"""
+        self._loop = asyncio.get_running_loop()
+        self._stopping = asyncio.Event()
+        if self._stop_requested:
+            self._stopping.set()
+
+        logger.info(
+            f"🚀 Collector started: {len(self.instruments)} instruments "
+            f"every {self.interval:g}s"
+        )
+
+        next_run = time.monotonic()
+        try:
+            while not self._stopping.is_set():
+                try:
+                    await self.collect_once()
+                except Exception as e:
+                    logger.error(f"💥 Collection cycle failed: {e}")
+                self.cycles += 1
+
+                # Фиксированный шаг расписания: медленный цикл не сдвигает следующие
+                next_run += self.interval
+                now = time.monotonic()
+                if next_run < now:
+                    skipped = int((now - next_run) // self.interval) + 1
+                    logger.warning(f"⏭️ Collector is behind, skipping {skipped} cycles")
+                    next_run += skipped * self.interval
+
+                try:
+                    await asyncio.wait_for(
+                        self._stopping.wait(), timeout=next_run - time.monotonic()
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.buffer.close()
+            await self.client.close()
+            logger.info(
+                f"🏁 Collector stopped after {self.cycles} cycles, "
+                f"{self.records} records, {self.buffer.flushed} saved"
+            )
+
+    def stop(self):
+        """Остановка (можно вызывать из другого потока)"""
+        self._stop_requested = True
+        if self._loop is not None and self._stopping is not None:
+            self._loop.call_soon_threadsafe(self._stopping.set)
+
+    def run_forever(self):
+        """Запуск в текущем потоке с собственным event loop"""
+        asyncio.run(self.run())
+
+
+class CollectorBootstep(bootsteps.StartStopStep):
+    """Запуск PriceCollector в фоновом потоке Celery worker"""
+
+    requires = {"celery.worker.components:Pool"}
+
+    def __init__(self, worker, **kwargs):
+        super().__init__(worker, **kwargs)
+        self.collector: Optional[PriceCollector] = None
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self, worker):
+        self.collector = PriceCollector()
+        self.thread = threading.Thread(
+            target=self.collector.run_forever, name="price-collector", daemon=True
+        )
+        self.thread.start()
+
+    def stop(self, worker):
+        if self.collector is not None:
+            self.collector.stop()
+        if self.thread is not None:
+            self.thread.join(timeout=15)
+
+
+async def _main():
+    collector = PriceCollector()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, collector.stop)
+        except NotImplementedError:
+            # Windows: сигналы обрабатываются через KeyboardInterrupt
+            pass
+
+    await collector.run()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_main())
+    except KeyboardInterrupt:
+        print("\n👋 Collector stopped")
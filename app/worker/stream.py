@@ -0,0 +1,96 @@
+"""Потоковый сбор цен через WebSocket Deribit.
+
+Запуск:
+    python -m app.worker.stream
+
+Инструменты и интервал канала задаются STREAM_INSTRUMENTS и
+STREAM_TICKER_INTERVAL. Для офлайн-проверки укажите DERIBIT_WS_URL
+на локальный заменитель (python -m app.services.deribit_stub).
+"""
+
+import asyncio
+import logging
+import signal
+from typing import List, Optional
+
+from app.core.config import settings
+from app.db.session import SessionLocal
+from app.services.deribit_stream import DeribitStreamClient
+from app.services.price_storage import BulkWriteResult, bulk_insert_prices
+from app.services.tick_buffer import TickBuffer
+from app.services.tick_store import TickStore, get_tick_store
+from app.services.ticks import TickerRecord
+
+logger = logging.getLogger(__name__)
+
+
+class StreamPriceSink:
+    """Передает тики из потока в БД.
+
+    Тики складываются в TickBuffer по мере поступления, запись идет пачками
+    в отдельном потоке, чтобы БД не блокировала чтение WebSocket.
+    """
+
+    def __init__(self, max_queue: Optional[int] = None):
+        self.buffer = TickBuffer(self._save, max_pending=max_queue)
+        self.tick_store: Optional[TickStore] = (
+            get_tick_store() if settings.TICK_STORE_ENABLED else None
+        )
+
+    @property
+    def saved(self) -> int:
+        return self.buffer.flushed
+
+    async def on_tick(self, record: TickerRecord):
+        await self.buffer.put(record)
+        if self.tick_store is not None and record.mark_price is not None:
+            self.tick_store.add(
+                record.instrument_name, record.timestamp_ms, record.mark_price
+            )
+
+    def _save(self, items: List[TickerRecord]) -> BulkWriteResult:
+        db = SessionLocal()
+        try:
+            return bulk_insert_prices(db, items)
+        except Exception:
+            db.rollback()
+            raise
+        finally:
+            db.close()
+
+    async def close(self):
+        """Дописать оставшиеся тики"""
+        await self.buffer.close()
+
+
+async def run_stream():
+    """Запуск потока до получения сигнала остановки"""
+    sink = StreamPriceSink()
+    client = DeribitStreamClient(settings.STREAM_INSTRUMENT_LIST, sink.on_tick)
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, lambda: asyncio.create_task(client.stop()))
+        except NotImplementedError:
+            # Windows: сигналы обрабатываются через KeyboardInterrupt
+            pass
+
+    try:
+        await client.run()
+    finally:
+        await client.close()
+        await sink.close()
+        logger.info(
+            f"🏁 Stream stopped: {client.ticks_received} ticks received, "
+            f"{sink.saved} saved, {sink.buffer.duplicates} duplicates, "
+            f"{client.reconnects} reconnects"
+        )
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(run_stream())
+    except KeyboardInterrupt:
+        print("\n👋 Stream stopped")
@@ -1,11 +1,14 @@
 import asyncio
 import logging
 import time
-from datetime import datetime
 
-from app.db.models import Price
-from app.db.session import SessionLocal
+from app.core.config import settings, split_csv
+from app.db.partitions import maintain_partitions
+from app.db.session import SessionLocal, engine
 from app.services.deribit_client import DeribitClient
+from app.services.instruments import get_instrument_registry
+from app.services.price_archive import archive_partitions
+from app.services.price_storage import bulk_insert_prices
 from app.worker.celery_app import celery_app
 
 logger = logging.getLogger(__name__)
@@ -24,84 +27,52 @@ def fetch_and_store_prices():
         logger.info("✅ Deribit client created")
 
         # Инструменты для отслеживания
-        instruments = [
-            "BTC-PERPETUAL",
-            "ETH-PERPETUAL",
-        ]
+        instruments = settings.COLLECTOR_INSTRUMENT_LIST
         logger.info(f"📊 Fetching instruments: {instruments}")
 
-        # Получаем цены
-        prices = await client.get_multiple_tickers(instruments)
+        # Получаем цены и закрываем HTTP-сессию клиента
+        try:
+            batch = await client.fetch_tickers(instruments)
+        finally:
+            await client.close()
+
+        prices = batch.prices
         logger.info(f"📈 Received data for {len(prices)} instruments")
+        if batch.failed or batch.timed_out:
+            logger.warning(
+                f"⚠️ Failed: {batch.failed} | Timed out: {batch.timed_out}"
+            )
 
         if not prices:
             logger.warning("⚠️ No prices received from Deribit")
-            return {"status": "no_data", "records": 0}
-
-        # Для отладки: выводим структуру данных
-        for instrument_name, data in prices.items():
-            if data:
-                logger.debug(f"📋 Data for {instrument_name}:")
-                logger.debug(f"  Available keys: {list(data.keys())}")
-                if "stats" in data:
-                    logger.debug(f"  Stats keys: {list(data['stats'].keys())}")
+            return {"status": "no_data", "records": 0, **batch.summary()}
 
         # Сохраняем в БД
         db = SessionLocal()
         try:
-            count = 0
-            for instrument_name, data in prices.items():
-                if data and "mark_price" in data:
-                    price_value = data.get("mark_price")
-
-                    # Извлекаем дополнительные данные
-                    stats = data.get("stats", {})
-                    volume_usd = stats.get("volume_usd", 0)
-                    volume_eth = stats.get("volume", 0)
-                    price_change = stats.get("price_change", 0)
-
-                    # Получаем время из API (если есть)
-                    api_timestamp = data.get("timestamp")
-                    if api_timestamp:
-                        # API возвращает время в миллисекундах
-                        record_timestamp = datetime.fromtimestamp(api_timestamp / 1000)
-                    else:
-                        record_timestamp = datetime.utcnow()
-
-                    # Логируем для отладки
-                    logger.info(f"💾 Saving {instrument_name}: ${price_value:,.2f}")
-                    logger.debug(f"  Volume USD: ${volume_usd:,.2f}")
-                    logger.debug(f"  Volume ETH: {volume_eth:,.2f}")
-                    logger.debug(f"  24h Change: {price_change:.2f}%")
-                    logger.debug(f"  Timestamp: {record_timestamp}")
-
-                    price_record = Price(
-                        instrument_name=instrument_name,
-                        price=price_value,
-                        mark_iv=data.get("mark_iv"),  # Волатильность, если есть
-                        volume=volume_usd,  # Объем в USD
-                        timestamp=record_timestamp,  # Время из API
-                        source="deribit",
-                        additional_data=data,  # Сохраняем все данные
-                    )
-                    db.add(price_record)
-                    count += 1
-
-            db.commit()
-            logger.info(f"✅ SUCCESS: Saved {count} price records")
+            # Повторный или параллельный запуск не дублирует тики
+            result = bulk_insert_prices(db, prices.values())
+            logger.info(
+                f"✅ SUCCESS: Saved {result.rows} price records, "
+                f"skipped {result.duplicates} duplicates"
+            )
 
             # Логируем сохраненные цены с деталями
-            for instrument_name, data in prices.items():
-                if data and "mark_price" in data:
-                    stats = data.get("stats", {})
-                    logger.info(
-                        f"   📍 {instrument_name}: "
-                        f"${data['mark_price']:,.2f} | "
-                        f"24h Δ: {stats.get('price_change', 0):+.2f}% | "
-                        f"Vol: ${stats.get('volume_usd', 0):,.0f}"
-                    )
-
-            return {"status": "success", "records": count}
+            for record in prices.values():
+                logger.info(
+                    "   📍 %s: $%.2f | 24h Δ: %+.2f%% | Vol: $%.0f",
+                    record.instrument_name,
+                    record.mark_price,
+                    record.price_change or 0,
+                    record.volume_usd or 0,
+                )
+
+            return {
+                "status": "success",
+                "records": result.rows,
+                "duplicates": result.duplicates,
+                **batch.summary(),
+            }
 
         except Exception as e:
             db.rollback()
@@ -126,3 +97,107 @@ def fetch_and_store_prices():
 
         logger.error(traceback.format_exc())
         return {"status": "fatal_error", "error": str(e)}
+
+
+@celery_app.task
+def fetch_and_store_market_snapshot():
+    """Снимок всех инструментов валют через get_book_summary_by_currency"""
+    logger.info("🚀 STARTING: fetch_and_store_market_snapshot Celery task")
+
+    currencies = split_csv(settings.SNAPSHOT_CURRENCIES)
+    kinds = split_csv(settings.SNAPSHOT_KINDS)
+    indices = split_csv(settings.SNAPSHOT_INDICES)
+
+    async def _async_fetch():
+        async with DeribitClient() as client:
+            return await client.get_market_snapshot(currencies, kinds, indices)
+
+    try:
+        prices = asyncio.run(_async_fetch())
+    except Exception as e:
+        logger.error(f"💥 FATAL ERROR in snapshot task: {e}")
+        return {"status": "fatal_error", "error": str(e)}
+
+    if not prices:
+        logger.warning("⚠️ Empty market snapshot from Deribit")
+        return {"status": "no_data", "records": 0}
+
+    db = SessionLocal()
+    try:
+        result = bulk_insert_prices(db, prices.values())
+        logger.info(
+            f"✅ SUCCESS: Saved {result.rows} snapshot records, "
+            f"skipped {result.duplicates} duplicates"
+        )
+        return {
+            "status": "success",
+            "records": result.rows,
+            "duplicates": result.duplicates,
+        }
+    except Exception as e:
+        db.rollback()
+        logger.error(f"❌ ERROR saving snapshot: {e}")
+        return {"status": "error", "error": str(e)}
+    finally:
+        db.close()
+
+
+@celery_app.task
+def maintain_price_partitions():
+    """Создание будущих дневных партиций prices и удаление устаревших"""
+    try:
+        with engine.begin() as connection:
+            result = maintain_partitions(connection)
+    except Exception as e:
+        logger.error(f"❌ ERROR maintaining price partitions: {e}")
+        return {"status": "error", "error": str(e)}
+
+    logger.info(
+        f"🧱 Partitions: created {len(result['created'])}, "
+        f"dropped {len(result['dropped'])}"
+    )
+    return {"status": "success", **result}
+
+
+@celery_app.task
+def archive_prices():
+    """Выгрузка старых дневных партиций prices в Parquet и удаление из БД"""
+    try:
+        archived = archive_partitions(engine)
+    except Exception as e:
+        logger.error(f"❌ ERROR archiving prices: {e}")
+        return {"status": "error", "error": str(e)}
+
+    return {"status": "success", "archived": archived}
+
+
+@celery_app.task
+def sync_instruments():
+    """Обновление справочника instruments из public/get_instruments"""
+    currencies = split_csv(settings.INSTRUMENT_CURRENCIES)
+
+    async def _async_fetch():
+        async with DeribitClient() as client:
+            results = await asyncio.gather(
+                *(client.get_instrument_details(currency) for currency in currencies)
+            )
+        return [item for items in results for item in items]
+
+    try:
+        items = asyncio.run(_async_fetch())
+    except Exception as e:
+        logger.error(f"💥 FATAL ERROR in sync_instruments: {e}")
+        return {"status": "fatal_error", "error": str(e)}
+
+    if not items:
+        logger.warning("⚠️ No instruments received from Deribit")
+        return {"status": "no_data", "instruments": 0}
+
+    try:
+        count = get_instrument_registry().sync(engine, items)
+    except Exception as e:
+        logger.error(f"❌ ERROR syncing instruments: {e}")
+        return {"status": "error", "error": str(e)}
+
+    logger.info(f"🏷️ Synced {count} instruments")
+    return {"status": "success", "instruments": count}
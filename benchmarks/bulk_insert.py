@@ -0,0 +1,109 @@
+"""Бенчмарк: строк в секунду при записи тиков в prices.
+
+Сравнивает:
+  * orm    — db.add(Price(...)) на каждую запись и flush;
+  * values — executemany с многострочным INSERT ... VALUES;
+  * copy   — COPY ... FROM STDIN (только PostgreSQL + psycopg2).
+
+Каждый прогон откатывается, таблица не меняется. Нужен PostgreSQL
+из .env (или --database-url) с примененными миграциями.
+
+Запуск:
+    python -m benchmarks.bulk_insert --rows 5000
+"""
+
+import argparse
+import sys
+import time
+from typing import Callable, List
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from app.core.config import settings
+from app.services.deribit_stub import StubMarket
+from app.services.instruments import get_instrument_registry
+from app.services.price_storage import build_price_record, bulk_insert_prices
+from app.services.ticks import TickerRecord
+
+
+def make_records(count: int) -> List[TickerRecord]:
+    """Синтетические тики от заменителя Deribit.
+
+    Время сдвинуто на 1 мс для каждой записи: (инструмент, время) уникальны,
+    иначе повторы отсекаются ON CONFLICT и не попадают в замер.
+    """
+    market = StubMarket(seed=1)
+    names = market.instruments("BTC")
+    records = []
+    for i in range(count):
+        record = TickerRecord.from_dict(market.ticker(names[i % len(names)]))
+        record.timestamp_ms -= i
+        records.append(record)
+    return records
+
+
+def orm_write(db: Session, records: List[TickerRecord]) -> None:
+    instrument_ids = get_instrument_registry().resolve(
+        db, (record.instrument_name for record in records)
+    )
+    for record in records:
+        db.add(build_price_record(record, instrument_ids[record.instrument_name]))
+    db.flush()
+
+
+def bench(
+    factory: sessionmaker,
+    write: Callable[[Session, List[TickerRecord]], None],
+    records: List[TickerRecord],
+    rounds: int,
+) -> float:
+    """Лучший результат из нескольких прогонов, строк в секунду"""
+    best = 0.0
+    for _ in range(rounds):
+        db = factory()
+        try:
+            started = time.perf_counter()
+            write(db, records)
+            best = max(best, len(records) / (time.perf_counter() - started))
+        finally:
+            db.rollback()
+            db.close()
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--rounds", type=int, default=3)
+    parser.add_argument("--database-url", default=settings.DATABASE_URL)
+    args = parser.parse_args()
+
+    engine = create_engine(args.database_url)
+    factory = sessionmaker(bind=engine, autoflush=False)
+
+    records = make_records(args.rows)
+    print(f"{engine.dialect.name} | {args.rows} rows x {args.rounds} rounds")
+
+    methods = {
+        "orm": orm_write,
+        "values": lambda db, recs: bulk_insert_prices(
+            db, recs, method="values", commit=False
+        ),
+    }
+    if engine.dialect.name == "postgresql":
+        methods["copy"] = lambda db, recs: bulk_insert_prices(
+            db, recs, method="copy", commit=False
+        )
+
+    results = {
+        name: bench(factory, write, records, args.rounds)
+        for name, write in methods.items()
+    }
+    for name, rows_per_sec in results.items():
+        print(f"{name:8} {rows_per_sec:12,.0f} rows/s")
+    print(f"Speedup vs orm: {max(results.values()) / results['orm']:.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
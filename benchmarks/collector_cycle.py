@@ -0,0 +1,130 @@
+"""Бенчмарк: задержка цикла сбора "на каждый запуск" против долгоживущего коллектора.
+
+Сравнивает:
+  * per-run  — как fetch_and_store_prices: asyncio.run + новый DeribitClient
+               и новая HTTP-сессия на каждый цикл;
+  * persistent — как PriceCollector: один event loop и одна сессия.
+
+По умолчанию запросы идут в локальный заменитель Deribit (без TLS);
+с --base-url https://test.deribit.com в замер попадают TLS и DNS.
+С --with-db каждый цикл также пишет в БД (нужен PostgreSQL из .env).
+
+Запуск:
+    python -m benchmarks.collector_cycle --cycles 50
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import threading
+import time
+from typing import Callable, List
+
+from app.services.deribit_client import DeribitClient
+from app.services.deribit_stub import StubServer
+
+
+def start_stub(port: int) -> None:
+    """Запуск заменителя Deribit в фоновом потоке"""
+    ready = threading.Event()
+
+    def _serve():
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        loop.run_until_complete(StubServer(seed=1).start(port=port))
+        ready.set()
+        loop.run_forever()
+
+    threading.Thread(target=_serve, daemon=True).start()
+    ready.wait()
+
+
+def report(name: str, samples: List[float]) -> None:
+    samples_ms = sorted(s * 1000 for s in samples)
+    p95 = samples_ms[int(len(samples_ms) * 0.95) - 1]
+    print(
+        f"{name:12} mean {statistics.mean(samples_ms):8.2f}ms | "
+        f"p50 {statistics.median(samples_ms):8.2f}ms | p95 {p95:8.2f}ms"
+    )
+
+
+def bench(cycle: Callable[[], None], cycles: int) -> List[float]:
+    samples = []
+    for _ in range(cycles):
+        started = time.perf_counter()
+        cycle()
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--cycles", type=int, default=30)
+    parser.add_argument("--base-url", default=None)
+    parser.add_argument("--port", type=int, default=8799)
+    parser.add_argument("--with-db", action="store_true")
+    parser.add_argument(
+        "--instruments", default="BTC-PERPETUAL,ETH-PERPETUAL,SOL-PERPETUAL"
+    )
+    args = parser.parse_args()
+
+    instruments = args.instruments.split(",")
+    base_url = args.base_url
+    if base_url is None:
+        start_stub(args.port)
+        base_url = f"http://127.0.0.1:{args.port}"
+
+    save = None
+    if args.with_db:
+        from app.db.session import SessionLocal
+        from app.services.price_storage import save_prices
+
+        def save(prices):
+            db = SessionLocal()
+            try:
+                save_prices(db, prices.values())
+            finally:
+                db.close()
+
+    def new_client() -> DeribitClient:
+        client = DeribitClient()
+        client.base_url = base_url
+        return client
+
+    # Старый путь: все создается и уничтожается на каждом цикле
+    def per_run_cycle():
+        async def _fetch():
+            client = new_client()
+            try:
+                return (await client.fetch_tickers(instruments)).prices
+            finally:
+                await client.close()
+
+        prices = asyncio.run(_fetch())
+        if save:
+            save(prices)
+
+    # Новый путь: один loop и одна сессия на все циклы
+    loop = asyncio.new_event_loop()
+    client = new_client()
+
+    def persistent_cycle():
+        prices = loop.run_until_complete(client.fetch_tickers(instruments)).prices
+        if save:
+            save(prices)
+
+    print(f"Target: {base_url} | {len(instruments)} instruments | {args.cycles} cycles")
+    per_run = bench(per_run_cycle, args.cycles)
+    persistent = bench(persistent_cycle, args.cycles)
+    loop.run_until_complete(client.close())
+    loop.close()
+
+    report("per-run", per_run)
+    report("persistent", persistent)
+    speedup = statistics.mean(per_run) / statistics.mean(persistent)
+    print(f"Speedup: {speedup:.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
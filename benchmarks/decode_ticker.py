@@ -0,0 +1,104 @@
+"""Бенчмарк: тиков в секунду при разборе ответа public/ticker.
+
+Сравнивает:
+  * legacy — как раньше: bytes -> str, json.loads во вложенные dict,
+             f-строки логов и список ключей на каждый тик, затем повторный
+             обход dict при построении записи;
+  * record — decode_ticker: разбор байтов сразу в TickerRecord
+             (orjson, если установлен), логи ленивые.
+
+Логирование в обоих случаях на уровне INFO, как в рабочем процессе,
+вывод идет в NullHandler.
+
+Запуск:
+    python -m benchmarks.decode_ticker --ticks 200000
+"""
+
+import argparse
+import json
+import logging
+import sys
+import time
+from typing import Callable, List
+
+from app.services.deribit_stub import StubMarket
+from app.services.ticks import decode_ticker
+
+logger = logging.getLogger("benchmarks.decode_ticker")
+
+
+def make_bodies(count: int) -> List[bytes]:
+    """Ответы public/ticker от заменителя Deribit"""
+    market = StubMarket(seed=1)
+    names = market.instruments("BTC")[:20]
+    return [
+        json.dumps(
+            {"jsonrpc": "2.0", "id": i, "result": market.ticker(names[i % len(names)])}
+        ).encode()
+        for i in range(count)
+    ]
+
+
+def legacy_decode(body: bytes) -> float:
+    response_text = body.decode("utf-8")
+    data = json.loads(response_text)
+    result = data["result"]
+    instrument_name = result["instrument_name"]
+
+    logger.debug(f"Available keys: {list(result.keys())}")
+    if "stats" in result:
+        logger.debug(f"Stats keys: {list(result['stats'].keys())}")
+    stats = result.get("stats", {})
+    logger.debug(
+        f"✅ Got ticker for {instrument_name}: ${result['mark_price']:,.2f} | "
+        f"24h Δ: {stats.get('price_change', 0):+.2f}% | "
+        f"Vol: ${stats.get('volume_usd', 0):,.0f}"
+    )
+
+    # Повторный обход при построении записи
+    stats = result.get("stats", {})
+    return result["mark_price"] + (stats.get("volume_usd") or 0)
+
+
+def record_decode(body: bytes) -> float:
+    record = decode_ticker(body)
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("✅ Got ticker for %s", record.instrument_name)
+    return record.mark_price + (record.volume_usd or 0)
+
+
+def bench(decode: Callable[[bytes], float], bodies: List[bytes], rounds: int) -> float:
+    """Лучший результат из нескольких прогонов, тиков в секунду"""
+    best = 0.0
+    for _ in range(rounds):
+        started = time.perf_counter()
+        for body in bodies:
+            decode(body)
+        best = max(best, len(bodies) / (time.perf_counter() - started))
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=100000)
+    parser.add_argument("--rounds", type=int, default=3)
+    args = parser.parse_args()
+
+    logger.setLevel(logging.INFO)
+    logger.addHandler(logging.NullHandler())
+    logger.propagate = False
+
+    bodies = make_bodies(args.ticks)
+    decoder = "orjson" if "orjson" in sys.modules else "json"
+    print(f"{args.ticks} ticks x {args.rounds} rounds | decoder: {decoder}")
+
+    legacy = bench(legacy_decode, bodies, args.rounds)
+    record = bench(record_decode, bodies, args.rounds)
+
+    print(f"{'legacy':8} {legacy:12,.0f} ticks/s")
+    print(f"{'record':8} {record:12,.0f} ticks/s")
+    print(f"Speedup: {record / legacy:.1f}x")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
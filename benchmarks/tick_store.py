@@ -0,0 +1,136 @@
+"""Бенчмарк: память и скорость сканирования TickStore.
+
+Синтетические тики как у потока ticker.*.100ms: время с шагом ~100 мс и
+случайными пропусками, цена маркировки — случайное блуждание с округлением
+(2 знака у фьючерсов, 4 — у опционов в BTC). Сравнивает:
+  * store  — TickStore (delta-of-delta + XOR, блоки по TICK_STORE_BLOCK_SIZE);
+  * arrays — array('q') + array('d'), 16 байт на тик;
+  * tuples — список кортежей (время, цена), как держал бы тики Python.
+
+Запуск:
+    python -m benchmarks.tick_store --ticks 1000000 --instruments 20
+"""
+
+import argparse
+import random
+import sys
+import time
+import tracemalloc
+from array import array
+from typing import Callable, Dict, List, Tuple
+
+from app.services.tick_store import TickStore
+
+Series = Dict[str, Tuple[List[int], List[float]]]
+
+
+def make_series(ticks: int, instruments: int) -> Series:
+    rng = random.Random(1)
+    per_instrument = ticks // instruments
+    series: Series = {}
+    for n in range(instruments):
+        option = n % 2 == 1
+        price = rng.uniform(0.01, 0.2) if option else rng.uniform(2000, 70000)
+        digits = 4 if option else 2
+        ts = 1_760_000_000_000 + rng.randrange(100)
+        timestamps, prices = [], []
+        for _ in range(per_instrument):
+            ts += rng.choice((100, 100, 100, 101, 99, 200, 1000))
+            # Цена маркировки меняется не на каждом тике
+            if rng.random() < 0.4:
+                price = max(price + rng.gauss(0, price * 1e-4), 10**-digits)
+            timestamps.append(ts)
+            prices.append(round(price, digits))
+        series[f"INSTRUMENT-{n}"] = (timestamps, prices)
+    return series
+
+
+def measure(build: Callable[[], object]) -> Tuple[object, int]:
+    """Объект и занятая им память (tracemalloc)"""
+    tracemalloc.start()
+    result = build()
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return result, size
+
+
+def build_store(series: Series, block_size: int) -> TickStore:
+    store = TickStore(block_size=block_size, retention_hours=0)
+    for name, (timestamps, prices) in series.items():
+        for ts, price in zip(timestamps, prices):
+            store.add(name, ts, price)
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--ticks", type=int, default=1_000_000)
+    parser.add_argument("--instruments", type=int, default=20)
+    parser.add_argument("--block-size", type=int, default=1024)
+    args = parser.parse_args()
+
+    series = make_series(args.ticks, args.instruments)
+    total = sum(len(timestamps) for timestamps, _ in series.values())
+    print(f"{total:,} ticks | {args.instruments} instruments | block {args.block_size}")
+
+    # tracemalloc замедляет выделение памяти: скорость записи меряем отдельно
+    started = time.perf_counter()
+    build_store(series, args.block_size)
+    store_seconds = time.perf_counter() - started
+
+    store, store_bytes = measure(lambda: build_store(series, args.block_size))
+    _, array_bytes = measure(
+        lambda: {
+            name: (array("q", timestamps), array("d", prices))
+            for name, (timestamps, prices) in series.items()
+        }
+    )
+    _, tuple_bytes = measure(
+        lambda: {
+            name: list(zip(timestamps, prices))
+            for name, (timestamps, prices) in series.items()
+        }
+    )
+
+    per_million = 1_000_000 / total
+    print("\nMemory per million ticks:")
+    for name, size in (
+        ("store", store_bytes),
+        ("arrays", array_bytes),
+        ("tuples", tuple_bytes),
+    ):
+        print(f"  {name:8} {size * per_million / 2**20:10.1f} MiB")
+    print(f"  store data only: {store.stats()['bytes_per_tick']:.2f} bytes/tick")
+    print(f"Ingest: {total / store_seconds:,.0f} ticks/s")
+
+    names = list(series)
+    started = time.perf_counter()
+    scanned = sum(len(store.scan(name)) for name in names)
+    full_scan = scanned / (time.perf_counter() - started)
+
+    # Узкое окно: 1% ряда в середине, блоки вне окна пропускаются
+    started = time.perf_counter()
+    windows = 0
+    for name in names:
+        timestamps = series[name][0]
+        middle = len(timestamps) // 2
+        window = max(len(timestamps) // 100, 1)
+        start, end = timestamps[middle], timestamps[middle + window - 1]
+        windows += len(store.scan(name, start, end))
+    window_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    candles = sum(len(store.downsample(name, 60_000)) for name in names)
+    downsample = scanned / (time.perf_counter() - started)
+
+    print("\nScan throughput:")
+    print(f"  full scan  {full_scan:12,.0f} ticks/s")
+    print(
+        f"  1% window  {windows:12,} ticks in {window_seconds * 1000:.1f}ms "
+        f"({window_seconds / len(names) * 1000:.2f}ms per instrument)"
+    )
+    print(f"  downsample {downsample:12,.0f} ticks/s -> {candles:,} 1m candles")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
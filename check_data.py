@@ -7,7 +7,7 @@ from datetime import datetime, timedelta
 
 from sqlalchemy import desc, func
 
-from app.db.models import Price
+from app.db.models import Instrument, Price, PriceCandle
 from app.db.session import SessionLocal
 
 db = SessionLocal()
@@ -16,8 +16,12 @@ try:
     print("📊 Deribit Price Collector - Data Report")
     print("=" * 60)
 
-    # Общая статистика
-    total = db.query(Price).count()
+    # Общая статистика по дневным свечам, без полного просмотра prices
+    total = (
+        db.query(func.coalesce(func.sum(PriceCandle.ticks), 0))
+        .filter(PriceCandle.resolution == "1d")
+        .scalar()
+    )
     print(f"Всего записей: {total}")
 
     if total > 0:
@@ -27,22 +31,27 @@ try:
         recent = db.query(Price).order_by(desc(Price.timestamp)).limit(5).all()
         for p in recent:
             time_str = p.timestamp.strftime("%H:%M:%S")
-            print(f"{time_str} | {p.instrument_name:15} | ${p.price:10.2f}")
+            print(f"{time_str} | {p.instrument.name:15} | ${p.price:10.2f}")
 
         # Статистика по инструментам
         print("\n📊 Статистика по инструментам:")
         print("-" * 60)
         stats = (
             db.query(
-                Price.instrument_name,
-                func.count(Price.id).label("count"),
-                func.min(Price.timestamp).label("first"),
-                func.max(Price.timestamp).label("last"),
-                func.min(Price.price).label("min_price"),
-                func.max(Price.price).label("max_price"),
-                func.avg(Price.price).label("avg_price"),
+                Instrument.name.label("instrument_name"),
+                func.sum(PriceCandle.ticks).label("count"),
+                func.min(PriceCandle.open_time).label("first"),
+                func.max(PriceCandle.close_time).label("last"),
+                func.min(PriceCandle.low).label("min_price"),
+                func.max(PriceCandle.high).label("max_price"),
+                (func.sum(PriceCandle.price_sum) / func.sum(PriceCandle.ticks)).label(
+                    "avg_price"
+                ),
             )
-            .group_by(Price.instrument_name)
+            .select_from(PriceCandle)
+            .join(Instrument, PriceCandle.instrument_id == Instrument.id)
+            .filter(PriceCandle.resolution == "1d")
+            .group_by(Instrument.name)
             .all()
         )
 
@@ -1,14 +1,31 @@
 import sys
-from datetime import datetime
+from datetime import datetime, timezone
+from typing import Optional
 
-from fastapi import Depends, FastAPI, HTTPException, Query
-from sqlalchemy.orm import Session
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
 
 # Добавляем путь
 sys.path.append(".")
 
-from app.db.models import Price
-from app.db.session import get_db
+from app.core.config import split_csv
+from app.db.models import Instrument, Price
+from app.db.session import get_read_db, read_router, read_session
+from app.services.arrow_ipc import (
+    ARROW_MEDIA_TYPE,
+    arrow_available,
+    ticks_to_ipc,
+    wants_arrow,
+)
+from app.services.candles import CANDLE_RESOLUTIONS, query_candles_async
+from app.services.latest_prices import get_latest, staleness, store_latest
+from app.services.pagination import decode_cursor
+from app.services.price_export import EXPORT_MEDIA_TYPES, stream_prices
+from app.services.price_service import SNAPSHOT_MAX_TICKERS, AsyncPriceService
+from app.services.stats import estimated_rows_async, instrument_stats_async
 
 app = FastAPI(title="Deribit Price Collector", version="1.0.0")
 
@@ -29,27 +46,49 @@ async def health_check():
         "timestamp": datetime.now().isoformat(),
         "database": "connected",
         "redis": "connected",
+        "read_routing": read_router.status(),
     }
 
 
 @app.get("/api/stats")
-async def get_stats(db: Session = Depends(get_db)):
-    """Статистика для dashboard"""
+async def get_stats(
+    approximate: bool = Query(False),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Статистика для dashboard (из instrument_stats, без count по prices)"""
     try:
-        # Общее количество записей
-        total_records = db.query(Price).count()
-        print(f"DEBUG: Total records in prices table: {total_records}")
-
-        # Количество уникальных инструментов
-        instruments = db.query(Price.instrument_name).distinct().count()
-        print(f"DEBUG: Unique instruments: {instruments}")
-
-        return {
-            "total_records": total_records,
-            "instruments_tracked": instruments,
+        # Одна строка на инструмент, независимо от размера prices
+        rows = await instrument_stats_async(db)
+        instruments = [
+            {
+                "name": row.instrument_name,
+                "count": row.ticks,
+                "first_timestamp": row.first_timestamp.isoformat(),
+                "last_timestamp": row.last_timestamp.isoformat(),
+                "min_price": row.min_price,
+                "max_price": row.max_price,
+                "last_price": row.last_price,
+            }
+            for row in rows
+        ]
+
+        stats = {
+            "total_records": sum(row.ticks for row in rows),
+            "instruments_tracked": len(rows),
+            "instruments": instruments,
+            "time_range": {
+                "oldest": min(
+                    (i["first_timestamp"] for i in instruments), default=None
+                ),
+                "newest": max((i["last_timestamp"] for i in instruments), default=None),
+            },
             "uptime": "100%",
             "last_update": datetime.now().isoformat(),
         }
+        if approximate:
+            # Оценка планировщика: строки, которые сейчас лежат в prices
+            stats["estimated_rows"] = await estimated_rows_async(db)
+        return stats
     except Exception as e:
         import traceback
 
@@ -64,45 +103,43 @@ async def get_stats(db: Session = Depends(get_db)):
 
 @app.get("/api/prices")
 async def get_prices(
-    limit: int = Query(10, ge=1, le=100), db: Session = Depends(get_db)
+    limit: int = Query(10, ge=1, le=100), db: AsyncSession = Depends(get_read_db)
 ):
     """Последние цены для dashboard"""
     try:
-        prices = db.query(Price).order_by(Price.timestamp.desc()).limit(limit).all()
+        # Только типизированные колонки: исходный ответ API лежит в price_payloads
+        result = await db.execute(
+            select(
+                Instrument.name.label("instrument_name"),
+                Instrument.source,
+                Price.price,
+                Price.timestamp,
+                Price.base_volume,
+                Price.price_change,
+            )
+            .select_from(Price)
+            .join(Instrument, Price.instrument_id == Instrument.id)
+            .order_by(Price.timestamp.desc())
+            .limit(limit)
+        )
+        prices = result.all()
 
         print(f"DEBUG: Found {len(prices)} prices from database")
 
         result = []
         for price in prices:
-            # Извлекаем данные из additional_data
-            additional = price.additional_data or {}
-            stats = additional.get("stats", {})
-
-            # Используем правильное время из API
-            api_timestamp = additional.get("timestamp")
-            if api_timestamp:
-                # Конвертируем из миллисекунд
-                from datetime import datetime
-
-                time_value = datetime.fromtimestamp(api_timestamp / 1000).isoformat()
-            else:
-                time_value = (
-                    price.timestamp.isoformat()
-                    if price.timestamp
-                    else datetime.now().isoformat()
-                )
-
-            # Извлекаем объем и изменение цены
-            volume = stats.get("volume", 0)
-            price_change = stats.get("price_change", 0)  # Процентное изменение
-
             result.append(
                 {
-                    "time": time_value,
+                    # Время биржи из ответа API
+                    "time": (
+                        price.timestamp.isoformat()
+                        if price.timestamp
+                        else datetime.now().isoformat()
+                    ),
                     "instrument": price.instrument_name,
                     "price": float(price.price) if price.price else 0,
-                    "24h_change": float(price_change),  # Теперь реальные данные!
-                    "volume": float(volume),  # Теперь реальные данные!
+                    "24h_change": float(price.price_change or 0),
+                    "volume": float(price.base_volume or 0),
                     "source": price.source if price.source else "deribit",
                 }
             )
@@ -122,69 +159,262 @@ async def get_prices(
 
 
 @app.get("/api/prices/all")
-def get_all_prices(
+async def get_all_prices(
+    request: Request,
+    response: Response,
     instrument: str = Query(
         ..., description="Инструмент (BTC-PERPETUAL или ETH-PERPETUAL)"
     ),
     # Изменили ticker на instrument
     skip: int = 0,
     limit: int = 100,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(
+        None, description="Курсор из заголовка X-Next-Cursor или X-Prev-Cursor"
+    ),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Получение всех сохраненных данных по указанному инструменту"""
-    prices = (
-        db.query(Price)
-        .filter(Price.instrument_name == instrument)
-        .order_by(Price.timestamp.desc())
-        .offset(skip)
-        .limit(limit)
-        .all()
+    """Получение всех сохраненных данных по указанному инструменту.
+
+    С date_from/date_to запрос читает только партиции нужных дней; дни
+    старше самой старой партиции дочитываются из архива Parquet.
+    Страницы от новых к старым: с cursor следующая страница ищется по
+    индексу от курсора (skip не нужен), курсоры соседних страниц — в
+    заголовках X-Next-Cursor (старше) и X-Prev-Cursor (новее).
+    С Accept: application/vnd.apache.arrow.stream ответ — Arrow IPC.
+    """
+    try:
+        page_cursor = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    page = await AsyncPriceService(db).get_prices_page(
+        instrument,
+        cursor=page_cursor,
+        skip=skip,
+        limit=limit,
+        date_from=date_from,
+        date_to=date_to,
     )
+    if wants_arrow(request.headers.get("accept")):
+        return Response(
+            ticks_to_ipc(page.items, instrument),
+            media_type=ARROW_MEDIA_TYPE,
+            headers=page.headers(),
+        )
+    response.headers.update(page.headers())
+    return [
+        {"instrument_name": tick.pop("ticker"), **tick, "source": "deribit"}
+        for tick in page.items
+    ]
 
-    result = []
-    for price in prices:
-        result.append(
-            {
-                "id": price.id,
-                "instrument_name": price.instrument_name,  # Изменили ticker на instrument_name
-                "price": price.price,
-                "timestamp": price.timestamp,
-                "source": price.source,
-                "mark_iv": price.mark_iv,
-                "volume": price.volume,
-            }
+
+@app.get("/api/prices/export")
+async def export_prices(
+    instrument: str = Query(
+        ..., description="Инструмент (BTC-PERPETUAL или ETH-PERPETUAL)"
+    ),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    fmt: str = Query("ndjson", alias="format", description="ndjson, csv или arrow"),
+):
+    """Потоковая выгрузка тиков за диапазон дат, от старых к новым.
+
+    Строки идут серверным курсором и отдаются по мере чтения, память не
+    растет с шириной диапазона; старые дни дочитываются из архива Parquet.
+    """
+    if fmt not in EXPORT_MEDIA_TYPES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown format, expected one of {list(EXPORT_MEDIA_TYPES)}",
         )
+    if fmt == "arrow" and not arrow_available():
+        raise HTTPException(status_code=406, detail="Arrow format requires pyarrow")
 
-    return result
+    start = (
+        datetime.fromtimestamp(date_from, tz=timezone.utc)
+        if date_from is not None
+        else None
+    )
+    end = (
+        datetime.fromtimestamp(date_to, tz=timezone.utc)
+        if date_to is not None
+        else None
+    )
+    return StreamingResponse(
+        stream_prices(read_session, instrument, start, end, fmt),
+        media_type=EXPORT_MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="{instrument}.{fmt}"'},
+    )
 
 
 @app.get("/api/prices/latest")
-def get_latest_price(
+async def get_latest_price(
     instrument: str = Query(
         ..., description="Инструмент (BTC-PERPETUAL или ETH-PERPETUAL)"
     ),
     # Изменили ticker на instrument
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_read_db),
 ):
-    """Получение последней цены инструмента"""
-    price = (
-        db.query(Price)
-        .filter(Price.instrument_name == instrument)
-        .order_by(Price.timestamp.desc())
-        .first()
-    )
+    """Получение последней цены инструмента (из кэша Redis, при промахе — из БД)"""
+    tick = await get_latest(instrument)
+    if tick is None:
+        price = await db.scalar(
+            select(Price)
+            .join(Price.instrument)
+            .options(contains_eager(Price.instrument))
+            .where(Instrument.name == instrument)
+            .order_by(Price.timestamp.desc())
+            .limit(1)
+        )
+
+        if not price:
+            raise HTTPException(status_code=404, detail="Price not found")
+
+        tick = {
+            "id": price.id,
+            "instrument_name": price.instrument.name,
+            "price": price.price,
+            "timestamp": price.timestamp,
+            "mark_iv": price.mark_iv,
+            "volume": price.volume,
+            "base_volume": price.base_volume,
+            "price_change": price.price_change,
+        }
+        await store_latest(instrument, tick)
+
+    return {
+        "id": tick["id"],
+        "instrument_name": tick["instrument_name"],
+        "price": tick["price"],
+        "timestamp": tick["timestamp"],
+        "source": "deribit",
+        "mark_iv": tick["mark_iv"],
+        "volume": tick["volume"],
+        **staleness(tick),
+    }
+
 
-    if not price:
-        raise HTTPException(status_code=404, detail="Price not found")
+@app.get("/api/prices/snapshot")
+async def get_prices_snapshot(
+    instruments: Optional[str] = Query(
+        None, description="Инструменты через запятую; без параметра — все"
+    ),
+    at: Optional[int] = Query(
+        None, description="Цены на момент (UNIX timestamp); без параметра — последние"
+    ),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Последние цены (или цены на момент at) нескольких инструментов за один запрос"""
+    names = split_csv(instruments) if instruments is not None else None
+    if names is not None and len(names) > SNAPSHOT_MAX_TICKERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many instruments, at most {SNAPSHOT_MAX_TICKERS}",
+        )
+
+    ticks = await AsyncPriceService(db).get_snapshot(names, at=at)
+    return {
+        "at": datetime.fromtimestamp(at, tz=timezone.utc) if at is not None else None,
+        "count": len(ticks),
+        "prices": [
+            {"instrument_name": tick.pop("ticker"), **tick, "source": "deribit"}
+            for tick in ticks
+        ],
+    }
+
+
+@app.get("/api/prices/resample")
+async def get_resampled_prices(
+    instrument: str = Query(
+        ..., description="Инструмент (BTC-PERPETUAL или ETH-PERPETUAL)"
+    ),
+    bucket: str = Query("1m", description="Ширина интервала: 15s, 5m, 4h, 1d"),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """OHLC по интервалам произвольной ширины, посчитанные в БД.
+
+    Ширина, кратная свече (1m/5m/1h/1d), собирается из price_candles,
+    остальные — date_bin по тикам. Без date_from — последние 500 интервалов.
+    """
+    try:
+        bars, source = await AsyncPriceService(db).get_resampled(
+            instrument, bucket, date_from=date_from, date_to=date_to
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return {
+        "instrument_name": instrument,
+        "bucket": bucket,
+        "source": source,
+        "count": len(bars),
+        "bars": [dict(bar._mapping) for bar in bars],
+    }
+
+
+@app.get("/api/candles")
+async def get_candles(
+    instrument: str = Query(
+        ..., description="Инструмент (BTC-PERPETUAL или ETH-PERPETUAL)"
+    ),
+    resolution: str = Query("1h", description="Длительность свечи: 1m, 5m, 1h, 1d"),
+    date_from: Optional[int] = Query(
+        None, description="Начальная дата (UNIX timestamp)"
+    ),
+    date_to: Optional[int] = Query(None, description="Конечная дата (UNIX timestamp)"),
+    limit: int = Query(500, ge=1, le=5000),
+    db: AsyncSession = Depends(get_read_db),
+):
+    """Свечи OHLCV из price_candles, без чтения сырых тиков"""
+    if resolution not in CANDLE_RESOLUTIONS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown resolution, expected one of {list(CANDLE_RESOLUTIONS)}",
+        )
+
+    candles = await query_candles_async(
+        db,
+        instrument,
+        resolution,
+        date_from=(
+            datetime.fromtimestamp(date_from, tz=timezone.utc)
+            if date_from is not None
+            else None
+        ),
+        date_to=(
+            datetime.fromtimestamp(date_to, tz=timezone.utc)
+            if date_to is not None
+            else None
+        ),
+        limit=limit,
+    )
 
     return {
-        "id": price.id,
-        "instrument_name": price.instrument_name,  # Изменили ticker на instrument_name
-        "price": price.price,
-        "timestamp": price.timestamp,
-        "source": price.source,
-        "mark_iv": price.mark_iv,
-        "volume": price.volume,
+        "instrument": instrument,
+        "resolution": resolution,
+        "data": [
+            {
+                "time": candle.bucket.isoformat(),
+                "open": candle.open,
+                "high": candle.high,
+                "low": candle.low,
+                "close": candle.close,
+                "volume": candle.volume,
+                "ticks": candle.ticks,
+            }
+            for candle in candles
+        ],
+        "count": len(candles),
     }
 
 
@@ -0,0 +1,229 @@
+"""Курсоры и порядок страниц истории (keyset + архив)"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import DateTime, create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.types import TypeDecorator
+
+import minimal_api
+from app.api.v1.endpoints import prices as v1_prices
+from app.core.config import settings
+from app.db.models import Instrument, Price
+from app.db.session import get_read_db
+from app.services import price_service
+from app.services.pagination import (
+    PageCursor,
+    decode_cursor,
+    encode_cursor,
+    keyset,
+)
+from app.services.price_service import PriceService
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+class UTCDateTime(TypeDecorator):
+    # SQLite теряет часовой пояс: храним UTC, читаем обратно aware
+    impl = DateTime
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+
+    def process_result_value(self, value, dialect):
+        return value.replace(tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def db(monkeypatch, tmp_path):
+    monkeypatch.setattr(settings, "PRICES_ARCHIVE_PATH", str(tmp_path / "archive"))
+    monkeypatch.setattr(Price.__table__.c.timestamp, "type", UTCDateTime())
+    engine = create_engine("sqlite://")
+    Instrument.__table__.create(engine)
+    with engine.begin() as connection:
+        # Без уникального индекса: нужны строки с одинаковым временем
+        connection.execute(
+            text(
+                "CREATE TABLE prices (id INTEGER, instrument_id INTEGER, "
+                "price FLOAT, timestamp DATETIME, mark_iv FLOAT, volume FLOAT, "
+                "base_volume FLOAT, price_change FLOAT)"
+            )
+        )
+        connection.execute(
+            text("INSERT INTO instruments (id, name) VALUES (1, 'BTC-PERPETUAL')")
+        )
+    with Session(engine) as session:
+        yield session
+
+
+def add_rows(db, rows):
+    db.execute(
+        Price.__table__.insert(),
+        [
+            {"id": price_id, "instrument_id": 1, "price": 1.0, "timestamp": moment}
+            for price_id, moment in rows
+        ],
+    )
+
+
+def walk(service, limit, **kwargs):
+    """Все строки, проходя страницы по X-Next-Cursor, и сами страницы"""
+    pages = [service.get_prices_page("BTC-PERPETUAL", limit=limit, **kwargs)]
+    while pages[-1].next_cursor:
+        cursor = decode_cursor(pages[-1].next_cursor)
+        pages.append(service.get_prices_page("BTC-PERPETUAL", cursor, limit=limit))
+    return [row["id"] for page in pages for row in page.items], pages
+
+
+def test_cursor_round_trip():
+    for cursor in (
+        PageCursor(START + timedelta(microseconds=123457), 42),
+        PageCursor(START, 2**40, before=True),
+        PageCursor(datetime(1970, 1, 1, tzinfo=timezone.utc), 0),
+    ):
+        token = encode_cursor(cursor)
+        assert "=" not in token
+        assert decode_cursor(token) == cursor
+
+
+@pytest.mark.parametrize("token", ["", "!!!", "eDE6Mg", "YTE6", "YWJj", "0J_QuA"])
+def test_decode_rejects_malformed_cursor(token):
+    with pytest.raises(ValueError, match="Invalid cursor"):
+        decode_cursor(token)
+
+
+def test_timestamp_ties_are_ordered_by_id(db, monkeypatch):
+    monkeypatch.setattr(price_service, "hot_horizon", lambda connection: None)
+    # По три тика на каждое время: граница страницы попадает внутрь группы
+    rows = [(i, START + timedelta(seconds=i // 3)) for i in range(1, 13)]
+    add_rows(db, rows)
+    expected = [i for i, _ in sorted(rows, key=lambda r: (r[1], r[0]), reverse=True)]
+
+    ids, pages = walk(PriceService(db), limit=4)
+    assert ids == expected
+
+    # Назад от последней страницы — те же строки в том же порядке
+    back = pages[-1]
+    collected = list(back.items)
+    while back.prev_cursor:
+        cursor = decode_cursor(back.prev_cursor)
+        back = PriceService(db).get_prices_page("BTC-PERPETUAL", cursor, limit=4)
+        collected[:0] = back.items
+    assert [row["id"] for row in collected] == expected
+
+
+def test_keyset_seeks_on_timestamp_and_id():
+    cursor = PageCursor(START, 7)
+    sql = str(keyset(price_service._ticks(), cursor, 0, 11))
+    assert "(prices.timestamp, prices.id) <" in sql
+    assert "ORDER BY prices.timestamp DESC, prices.id DESC" in sql
+
+
+def archive_reader(rows):
+    """read_archived_prices по списку строк (архив старше горизонта)"""
+
+    def read(instrument, date_from, date_to, limit=None, oldest_first=False):
+        found = [
+            {"id": price_id, "instrument_name": instrument, "timestamp": moment}
+            for price_id, moment in sorted(rows, key=lambda r: r[1])
+            if (date_from is None or moment >= date_from)
+            and (date_to is None or moment <= date_to)
+        ]
+        if not oldest_first:
+            found.reverse()
+        return found[:limit]
+
+    return read
+
+
+def test_pages_continue_into_archive(db, monkeypatch):
+    horizon = START + timedelta(days=1)
+    hot = [(100 + i, horizon + timedelta(minutes=i)) for i in range(5)]
+    cold = [(i, START + timedelta(minutes=i)) for i in range(7)]
+    add_rows(db, hot)
+    monkeypatch.setattr(price_service, "hot_horizon", lambda connection: horizon)
+    monkeypatch.setattr(price_service, "read_archived_prices", archive_reader(cold))
+    expected = [i for i, _ in sorted(hot + cold, key=lambda r: r[1], reverse=True)]
+    service = PriceService(db)
+
+    assert walk(service, limit=3)[0] == expected
+
+    # OFFSET за концом БД пропускает остаток в архиве
+    for skip in range(0, len(expected) + 1, 2):
+        page = service.get_prices_page("BTC-PERPETUAL", skip=skip, limit=2)
+        assert [row["id"] for row in page.items] == expected[skip : skip + 2]
+
+    # Назад из архива — сначала архив, затем строки БД
+    cursor = PageCursor(cold[2][1], cold[2][0], before=True)
+    page = service.get_prices_page("BTC-PERPETUAL", cursor, limit=6)
+    assert [row["id"] for row in page.items] == [101, 100, 6, 5, 4, 3]
+    assert page.prev_cursor and page.next_cursor
+
+
+def test_late_tick_does_not_hide_archived_days(db, monkeypatch, tmp_path):
+    pytest.importorskip("pyarrow")
+    first = START.date()
+    cold = [(i, START + timedelta(days=i, hours=1)) for i in range(10)]
+    directory = tmp_path / "archive" / "BTC-PERPETUAL"
+    directory.mkdir(parents=True)
+    for offset in range(10):
+        (directory / f"{first + timedelta(days=offset)}.parquet").touch()
+
+    # Дни 0–9 выгружены; опоздавший тик дня 2 пересоздал его партицию
+    hot_day = START + timedelta(days=10)
+    hot = [(100 + i, hot_day + timedelta(minutes=i)) for i in range(3)]
+    late = (99, START + timedelta(days=2, hours=5))
+    add_rows(db, hot + [late])
+    partitions_from = START + timedelta(days=2)
+    monkeypatch.setattr(price_service, "hot_horizon", lambda c: partitions_from)
+    monkeypatch.setattr(price_service, "read_archived_prices", archive_reader(cold))
+
+    ids, _ = walk(PriceService(db), limit=4)
+    # Опоздавший тик появится после выгрузки его дня в архив
+    expected = [i for i, _ in sorted(hot + cold, key=lambda r: r[1], reverse=True)]
+    assert ids == expected
+
+
+def test_archive_respects_date_range(db, monkeypatch):
+    horizon = START + timedelta(days=1)
+    cold = [(i, START + timedelta(hours=i)) for i in range(10)]
+    add_rows(db, [(100, horizon + timedelta(hours=1))])
+    monkeypatch.setattr(price_service, "hot_horizon", lambda connection: horizon)
+    monkeypatch.setattr(price_service, "read_archived_prices", archive_reader(cold))
+
+    page = PriceService(db).get_prices_page(
+        "BTC-PERPETUAL",
+        limit=10,
+        date_from=int((START + timedelta(hours=3)).timestamp()),
+        date_to=int((START + timedelta(hours=5)).timestamp()),
+    )
+    assert [row["id"] for row in page.items] == [5, 4, 3]
+
+
+@pytest.mark.parametrize(
+    "path",
+    [
+        "/api/prices/all?instrument=BTC-PERPETUAL&cursor=not-a-cursor",
+        "/api/v1/prices/all?ticker=BTC-PERPETUAL&cursor=not-a-cursor",
+    ],
+)
+def test_malformed_cursor_is_bad_request(path):
+    app = minimal_api.app
+    if path.startswith("/api/v1"):
+        app = FastAPI()
+        app.include_router(v1_prices.router, prefix="/api/v1/prices")
+
+    async def no_db():
+        yield None
+
+    app.dependency_overrides[get_read_db] = no_db
+    try:
+        response = TestClient(app).get(path)
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
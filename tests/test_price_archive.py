@@ -0,0 +1,155 @@
+"""Архив Parquet: имя инструмента не выводит за каталог архива"""
+
+from datetime import date, datetime, timedelta, timezone
+
+import pytest
+
+from app.core.config import settings
+from app.db import partitions
+from app.services import price_archive
+from app.services.price_archive import (
+    archive_dir,
+    archive_file,
+    archive_horizon,
+    read_archived_prices,
+)
+
+pa = pytest.importorskip("pyarrow")
+pq = pytest.importorskip("pyarrow.parquet")
+
+
+def write_day(path, price=100.0):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    timestamp = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+    table = pa.Table.from_pylist(
+        [
+            {
+                "id": 1,
+                "timestamp": timestamp,
+                "price": price,
+                "mark_iv": None,
+                "volume": None,
+                "base_volume": None,
+                "price_change": None,
+                "payload": None,
+            }
+        ],
+        schema=price_archive._schema(),
+    )
+    pq.write_table(table, path)
+
+
+@pytest.fixture
+def archive_root(tmp_path, monkeypatch):
+    root = tmp_path / "archive"
+    root.mkdir()
+    monkeypatch.setattr(settings, "PRICES_ARCHIVE_PATH", str(root))
+    return root
+
+
+@pytest.mark.parametrize(
+    "name", ["..", "../..", "../secret", "/etc", "BTC/../../x", "", ".hidden"]
+)
+def test_rejects_names_outside_archive(archive_root, name):
+    with pytest.raises(ValueError):
+        archive_dir(name)
+
+
+def test_rejects_symlink_out_of_archive(archive_root, tmp_path):
+    (tmp_path / "elsewhere").mkdir()
+    (archive_root / "LINK").symlink_to(tmp_path / "elsewhere")
+    with pytest.raises(ValueError):
+        archive_dir("LINK")
+
+
+def test_reads_valid_instrument(archive_root):
+    write_day(archive_file("BTC-27DEC24-50000-C", date(2026, 1, 5)))
+    rows = read_archived_prices("BTC-27DEC24-50000-C")
+    assert [row["price"] for row in rows] == [100.0]
+
+
+def test_traversal_does_not_read_outside_files(archive_root, tmp_path):
+    # Файл вне архива, куда ведет ../outside
+    write_day(tmp_path / "outside" / "2026-01-05.parquet", price=666.0)
+    assert read_archived_prices("../outside") == []
+    assert read_archived_prices(str(tmp_path / "outside")) == []
+
+
+def test_late_ticks_are_merged_into_archived_day(tmp_path):
+    path = tmp_path / "2026-01-05.parquet"
+    tmp = tmp_path / "2026-01-05.tmp"
+    schema = price_archive._schema()
+
+    def table(rows):
+        return pa.Table.from_pylist(
+            [
+                {
+                    **dict.fromkeys(schema.names),
+                    "id": i,
+                    "price": price,
+                    "timestamp": datetime(2026, 1, 5, hour, tzinfo=timezone.utc),
+                }
+                for i, hour, price in rows
+            ],
+            schema=schema,
+        )
+
+    # В архиве часы 10 и 12; повторная выгрузка часа 12 и опоздавший час 11
+    pq.write_table(table([(1, 10, 1.0), (2, 12, 2.0)]), path)
+    pq.write_table(table([(2, 12, 2.0), (3, 11, 1.5)]), tmp)
+
+    price_archive._merge_existing(tmp, path)
+
+    merged = pq.read_table(tmp).to_pylist()
+    assert [row["id"] for row in merged] == [1, 3, 2]
+
+
+def test_expired_partitions_are_left_to_archive(monkeypatch):
+    class NoConnection:
+        def execute(self, *args, **kwargs):
+            raise AssertionError("partitions must not be dropped")
+
+    monkeypatch.setattr(settings, "PRICES_ARCHIVE_AFTER_DAYS", 30)
+    assert partitions.drop_expired_partitions(NoConnection(), retention_days=7) == []
+
+
+def test_retention_applies_without_pyarrow(monkeypatch):
+    class Connection:
+        def __init__(self):
+            self.dropped = []
+
+        def execute(self, statement, params=None):
+            sql = str(statement)
+            if sql.startswith("DROP TABLE"):
+                self.dropped.append(sql.split()[-1])
+                return None
+            parent = params["parent"]
+            return [(f"{parent}_p20000101",), (f"{parent}_default",)]
+
+    monkeypatch.setattr(settings, "PRICES_ARCHIVE_AFTER_DAYS", 30)
+    monkeypatch.setattr(partitions.importlib.util, "find_spec", lambda name: None)
+    connection = Connection()
+
+    dropped = partitions.drop_expired_partitions(connection, retention_days=7)
+    assert dropped == ["prices_p20000101", "price_payloads_p20000101"]
+    assert connection.dropped == dropped
+
+
+def test_horizon_stays_after_archived_days(archive_root):
+    def midnight(day):
+        return datetime.combine(day, datetime.min.time(), tzinfo=timezone.utc)
+
+    first = date(2026, 1, 1)
+    for offset in range(10):
+        write_day(archive_file("BTC-PERPETUAL", first + timedelta(days=offset)))
+    after_archive = midnight(first + timedelta(days=10))
+
+    # Опоздавший тик третьего дня пересоздал его партицию: горизонт не уходит
+    # назад, иначе дни 4–10 пропали бы из ответов
+    assert archive_horizon("BTC-PERPETUAL", midnight(date(2026, 1, 3))) == (
+        after_archive
+    )
+    later = midnight(date(2026, 2, 1))
+    assert archive_horizon("BTC-PERPETUAL", later) == later
+    assert archive_horizon("BTC-PERPETUAL", None) == after_archive
+    assert archive_horizon("ETH-PERPETUAL", later) == later
@@ -0,0 +1,131 @@
+"""Потоковая выгрузка истории"""
+
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+
+from app.api.v1.endpoints import prices as v1_prices
+from app.db import session as db_session
+from app.services import price_export
+from app.services.arrow_ipc import tick_schema, ticks_batch, ticks_to_ipc
+
+START = datetime(2024, 3, 1, tzinfo=timezone.utc)
+
+
+def ticks(first, count):
+    return [
+        {
+            "id": i,
+            "instrument_name": "BTC-PERPETUAL",
+            "timestamp": START + timedelta(seconds=i, microseconds=7),
+            "price": 60000.0 + i,
+            "mark_iv": None,
+            "volume": 1.5 * i,
+            "base_volume": 0.1,
+            "price_change": -0.25,
+        }
+        for i in range(first, first + count)
+    ]
+
+
+def columns(rows):
+    names = ("id", "timestamp", "price", "mark_iv", "volume", "price_change")
+    return [{name: row[name] for name in names} for row in rows]
+
+
+@asynccontextmanager
+async def no_session():
+    yield None
+
+
+def test_stream_opens_one_session(monkeypatch):
+    opened = []
+
+    @asynccontextmanager
+    async def session():
+        opened.append(True)
+        yield None
+
+    async def stream(factory, ticker, start, end, fmt):
+        async with factory():
+            yield f'{{"ticker": "{ticker}"}}\n'.encode()
+
+    monkeypatch.setattr(db_session, "read_session", session)
+    monkeypatch.setattr(v1_prices, "read_session", session)
+    monkeypatch.setattr(v1_prices, "stream_prices", stream)
+    app = FastAPI()
+    app.include_router(v1_prices.router, prefix="/api/v1/prices")
+
+    response = TestClient(app).get(
+        "/api/v1/prices/by_date", params={"ticker": "BTC-PERPETUAL", "format": "ndjson"}
+    )
+    assert response.status_code == 200
+    assert response.text == '{"ticker": "BTC-PERPETUAL"}\n'
+    # Одна сессия на выгрузку: у потока нет второй, от зависимости
+    assert len(opened) == 1
+
+
+def test_ticks_to_ipc_is_read_by_pyarrow():
+    pa = pytest.importorskip("pyarrow")
+    rows = ticks(1, 3)
+
+    reader = pa.ipc.open_stream(ticks_to_ipc(rows, "BTC-PERPETUAL"))
+    table = reader.read_all()
+    assert reader.schema.metadata == {b"instrument": b"BTC-PERPETUAL"}
+    assert table.to_pylist() == columns(rows)
+
+    empty = pa.ipc.open_stream(ticks_to_ipc([])).read_all()
+    assert empty.num_rows == 0
+    assert empty.schema.names[:2] == ["id", "timestamp"]
+
+
+@pytest.mark.parametrize("batches", [[], [ticks(1, 2), ticks(3, 4)]])
+@pytest.mark.asyncio
+async def test_arrow_export_is_read_by_pyarrow(monkeypatch, batches):
+    pa = pytest.importorskip("pyarrow")
+
+    async def rows(db, instrument, start, end):
+        for batch in batches:
+            yield batch
+
+    monkeypatch.setattr(price_export, "_rows", rows)
+    chunks = [
+        chunk
+        async for chunk in price_export.stream_prices(
+            no_session, "BTC-PERPETUAL", fmt="arrow"
+        )
+    ]
+
+    reader = pa.ipc.open_stream(b"".join(chunks))
+    read = list(reader)
+    assert [batch.num_rows for batch in read] == [len(batch) for batch in batches]
+    expected = [row for batch in batches for row in batch]
+    assert [row for batch in read for row in batch.to_pylist()] == columns(expected)
+
+
+def test_ticks_batch_from_result_rows():
+    pytest.importorskip("pyarrow")
+    with create_engine("sqlite://").connect() as connection:
+        rows = connection.execute(
+            text(
+                "SELECT 7 AS id, 'BTC-PERPETUAL' AS ticker, NULL AS timestamp, "
+                "2.5 AS price, NULL AS mark_iv, 3.0 AS volume, "
+                "-1.0 AS price_change"
+            )
+        ).all()
+
+    batch = ticks_batch(rows, tick_schema())
+    assert batch.to_pylist() == [
+        {
+            "id": 7,
+            "timestamp": None,
+            "price": 2.5,
+            "mark_iv": None,
+            "volume": 3.0,
+            "price_change": -1.0,
+        }
+    ]
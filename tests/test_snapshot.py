@@ -0,0 +1,67 @@
+"""Срез последних цен: один вид ответа из кэша и из БД"""
+
+from datetime import datetime, timezone
+
+import pytest
+
+from app.services import price_service
+from app.services.latest_prices import decode_tick, encode_tick
+from app.services.price_service import AsyncPriceService
+
+MOMENT = datetime(2026, 1, 5, 12, tzinfo=timezone.utc)
+
+
+class Row:
+    def __init__(self, **values):
+        self._mapping = values
+        self.ticker = values["ticker"]
+
+
+class FakeSession:
+    """AsyncSession, отдающая строки среза из БД"""
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    async def execute(self, query):
+        return self.rows
+
+
+@pytest.mark.asyncio
+async def test_cached_and_db_ticks_have_same_fields(monkeypatch):
+    cached = decode_tick(
+        encode_tick(
+            "BTC-PERPETUAL",
+            {"id": 1, "price": 60000.0, "timestamp": MOMENT, "base_volume": 2.0},
+        )
+    )
+
+    async def get_latest_many(names):
+        return {"BTC-PERPETUAL": cached}
+
+    async def store_latest_many(ticks):
+        pass
+
+    monkeypatch.setattr(price_service, "get_latest_many", get_latest_many)
+    monkeypatch.setattr(price_service, "store_latest_many", store_latest_many)
+    # Строка БД без base_volume, как у старых запросов
+    db = FakeSession(
+        [
+            Row(
+                id=2,
+                ticker="ETH-PERPETUAL",
+                price=3000.0,
+                timestamp=MOMENT,
+                mark_iv=None,
+                volume=10.0,
+                price_change=0.5,
+            )
+        ]
+    )
+
+    ticks = await AsyncPriceService(db).get_snapshot(["BTC-PERPETUAL", "ETH-PERPETUAL"])
+
+    btc, eth = ticks
+    assert list(btc) == list(eth)
+    assert btc["cached_at"] is not None and btc["base_volume"] == 2.0
+    assert eth["cached_at"] is None and eth["base_volume"] is None
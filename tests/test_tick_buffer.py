@@ -0,0 +1,186 @@
+"""Буфер записи: файл при недоступной БД и перенос его в БД"""
+
+import asyncio
+import json
+
+import pytest
+from sqlalchemy.exc import DataError, OperationalError
+
+from app.services.price_storage import BulkWriteResult
+from app.services.tick_buffer import TickBuffer
+from app.services.ticks import TickerRecord
+
+
+class FakeDB:
+    """Запись пачки как bulk_insert_prices: повторы по (инструмент, время)"""
+
+    def __init__(self):
+        self.rows = {}
+        self.writes = 0
+        self.fail_on = set()  # номера вызовов, на которых БД «падает»
+        self.reject_on = set()  # номера вызовов, на которых пачка неверна
+        self.down = False
+
+    def write(self, batch):
+        self.writes += 1
+        if self.down or self.writes in self.fail_on:
+            raise OperationalError("INSERT", {}, ConnectionError("database is down"))
+        if self.writes in self.reject_on:
+            raise DataError("INSERT", {}, ValueError("bad tick"))
+
+        new = 0
+        for record in batch:
+            key = (record.instrument_name, record.timestamp_ms)
+            if key not in self.rows:
+                self.rows[key] = record.mark_price
+                new += 1
+        return BulkWriteResult(new, 0.001, "values", duplicates=len(batch) - new)
+
+
+def ticks(start, count, name="BTC-PERPETUAL"):
+    return [
+        TickerRecord(name, 1_700_000_000_000 + i, 40000.0 + i, raw={"i": i})
+        for i in range(start, start + count)
+    ]
+
+
+async def wait_for(condition, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not condition():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.01)
+
+
+@pytest.mark.asyncio
+async def test_spill_then_replay_without_duplicates(tmp_path):
+    db = FakeDB()
+    spill = tmp_path / "spill" / "prices.jsonl"
+    buffer = TickBuffer(
+        db.write, max_batch=5, max_latency=0, spill_path=str(spill), retry_interval=0
+    )
+
+    db.down = True
+    await buffer.put_many(ticks(0, 5))
+    await wait_for(lambda: buffer.spilled == 5)
+
+    assert buffer.spilling
+    assert len(spill.read_text().splitlines()) == 5
+    assert db.rows == {}
+
+    # БД вернулась: файл переносится перед следующей пачкой, повторы пропускаются
+    db.down = False
+    await buffer.put_many(ticks(5, 5) + ticks(0, 2))
+    await buffer.close()
+
+    assert not spill.exists()
+    assert not buffer.spilling
+    assert buffer.replayed == 5
+    assert buffer.flushed == 5
+    assert buffer.duplicates == 2
+    assert sorted(ts for _, ts in db.rows) == [1_700_000_000_000 + i for i in range(10)]
+
+
+@pytest.mark.asyncio
+async def test_replay_interrupted_keeps_remaining_lines(tmp_path):
+    db = FakeDB()
+    spill = tmp_path / "prices.jsonl"
+    buffer = TickBuffer(
+        db.write, max_batch=3, max_latency=0, spill_path=str(spill), retry_interval=0
+    )
+
+    db.down = True
+    await buffer.put_many(ticks(0, 6))
+    await wait_for(lambda: buffer.spilled == 6)
+
+    # Первая часть файла переносится, на второй БД снова падает
+    db.down = False
+    db.fail_on = {db.writes + 2}
+    await buffer.put_many(ticks(6, 1))
+    await wait_for(lambda: buffer.spilled == 7)
+
+    assert len(db.rows) == 3
+    remaining = spill.read_text().splitlines()
+    assert len(remaining) == 4  # непереданная часть и новая пачка
+
+    await buffer.put_many(ticks(7, 1))
+    await buffer.close()
+
+    assert not spill.exists()
+    assert len(db.rows) == 8
+    assert buffer.dropped == 0
+
+
+@pytest.mark.asyncio
+async def test_leftover_spill_file_is_replayed_on_start(tmp_path):
+    db = FakeDB()
+    spill = tmp_path / "prices.jsonl"
+    first = TickBuffer(db.write, max_latency=0, spill_path=str(spill))
+    db.down = True
+    await first.put_many(ticks(0, 4))
+    await first.close()
+    assert first.spilled == 4
+
+    # Новый процесс находит файл и переносит его при первой записи
+    db.down = False
+    second = TickBuffer(db.write, max_latency=0, spill_path=str(spill))
+    assert second.spilling
+    await second.put_many(ticks(4, 1))
+    await second.close()
+
+    assert not spill.exists()
+    assert second.replayed == 4
+    assert len(db.rows) == 5
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_does_not_start_spilling(tmp_path):
+    db = FakeDB()
+    spill = tmp_path / "prices.jsonl"
+    buffer = TickBuffer(
+        db.write, max_batch=3, max_latency=0, spill_path=str(spill), retry_interval=0
+    )
+
+    # Пачку отвергает БД: она уходит в .rejected, буфер пишет дальше
+    db.reject_on = {1}
+    await buffer.put_many(ticks(0, 3))
+    await wait_for(lambda: buffer.rejected == 3)
+    assert not buffer.spilling
+
+    await buffer.put_many(ticks(3, 3))
+    await buffer.close()
+
+    assert not spill.exists()
+    assert len(spill.with_suffix(".rejected").read_text().splitlines()) == 3
+    assert sorted(ts for _, ts in db.rows) == [
+        1_700_000_000_000 + i for i in range(3, 6)
+    ]
+    assert buffer.spilled == 0
+
+
+@pytest.mark.asyncio
+async def test_replay_skips_rejected_chunk(tmp_path):
+    db = FakeDB()
+    spill = tmp_path / "prices.jsonl"
+    buffer = TickBuffer(
+        db.write, max_batch=2, max_latency=0, spill_path=str(spill), retry_interval=0
+    )
+
+    db.down = True
+    await buffer.put_many(ticks(0, 6))
+    await wait_for(lambda: buffer.spilled == 6)
+
+    # Вторая пачка файла неверна: она откладывается, остальные переносятся
+    db.down = False
+    db.reject_on = {db.writes + 2}
+    await buffer.put_many(ticks(6, 1))
+    await buffer.close()
+
+    assert not spill.exists()
+    assert not buffer.spilling
+    assert buffer.rejected == 2
+    assert len(db.rows) == 5
+    rejected = spill.with_suffix(".rejected").read_text().splitlines()
+    assert [json.loads(line)[1] for line in rejected] == [
+        1_700_000_000_002,
+        1_700_000_000_003,
+    ]
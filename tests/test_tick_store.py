@@ -0,0 +1,130 @@
+"""Кодек блоков хранилища тиков: delta-of-delta для времени и XOR для цены"""
+
+import random
+import struct
+
+import pytest
+
+from app.services.tick_store import (
+    MAX_TIMESTAMP,
+    TickSeries,
+    TickStore,
+    decode_block,
+    encode_block,
+)
+
+START = 1_700_000_000_000
+
+
+def bits(value):
+    return struct.unpack(">Q", struct.pack(">d", value))[0]
+
+
+def assert_round_trip(timestamps, prices):
+    decoded_ts, decoded_prices = decode_block(
+        encode_block(timestamps, prices), len(timestamps)
+    )
+    assert decoded_ts == timestamps
+    # Побитово: NaN != NaN, а -0.0 == 0.0
+    assert [bits(p) for p in decoded_prices] == [bits(p) for p in prices]
+
+
+def test_single_point():
+    assert_round_trip([START], [42000.5])
+
+
+def test_repeated_values_and_regular_interval():
+    timestamps = [START + 1000 * i for i in range(500)]
+    assert_round_trip(timestamps, [42000.0] * 500)
+    # Повтор значения и шага — по одному биту на поле
+    assert len(encode_block(timestamps, [42000.0] * 500)) < 16 + 500 // 4 + 8
+
+
+def test_special_floats():
+    prices = [
+        1.0,
+        float("nan"),
+        float("nan"),
+        float("inf"),
+        float("-inf"),
+        -0.0,
+        0.0,
+        5e-324,
+        1.7976931348623157e308,
+        -1.0,
+    ]
+    assert_round_trip([START + i for i in range(len(prices))], prices)
+
+
+def test_full_width_xor():
+    # XOR занимает все 64 бита (длина окна 64 кодируется как 0)
+    prices = [struct.unpack(">d", struct.pack(">Q", v))[0] for v in (1, 1 << 63 | 1)]
+    assert_round_trip([START + i for i in range(10)], prices * 5)
+
+
+def from_dods(dods):
+    """Время точек по разностям второго порядка"""
+    timestamps, delta = [START], 0
+    for dod in dods:
+        delta += dod
+        timestamps.append(timestamps[-1] + delta)
+    return timestamps
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    [
+        # Границы всех размеров delta-of-delta: 7, 9, 12 бит и 64 бита
+        from_dods([63, -64, 64, -65, 255, -256, 256, -257]),
+        from_dods([2047, -2048, 2048, -2049, 0, 0, 10**9, -(10**9)]),
+        # Время назад внутри блока тоже кодируется
+        from_dods([-5, -5, 100]),
+        # Большие разности и время у границ допустимого диапазона
+        [0, 1, MAX_TIMESTAMP - 2, MAX_TIMESTAMP - 1],
+        [MAX_TIMESTAMP - 1, 0, MAX_TIMESTAMP - 1],
+    ],
+)
+def test_large_and_irregular_deltas(timestamps):
+    assert_round_trip(timestamps, [float(i) for i in range(len(timestamps))])
+
+
+def test_random_walk():
+    rng = random.Random(7)
+    timestamps, prices = [START], [42000.0]
+    for _ in range(5000):
+        timestamps.append(timestamps[-1] + rng.choice([1, 100, 1000, 1001, 65000]))
+        prices.append(round(prices[-1] + rng.gauss(0, 5), 1))
+    assert_round_trip(timestamps, prices)
+
+
+@pytest.mark.parametrize(
+    "timestamps",
+    [[-1], [-START], [MAX_TIMESTAMP], [START, -1], [START, 1 << 64]],
+)
+def test_rejects_out_of_range_timestamps(timestamps):
+    with pytest.raises(ValueError):
+        encode_block(timestamps, [1.0] * len(timestamps))
+
+
+@pytest.mark.parametrize("timestamps, prices", [([], []), ([START], [1.0, 2.0])])
+def test_rejects_malformed_block(timestamps, prices):
+    with pytest.raises(ValueError):
+        encode_block(timestamps, prices)
+
+
+def test_series_rejects_out_of_range_and_stays_readable():
+    series = TickSeries(block_size=4)
+    assert not series.append(-5, 1.0)
+    for i in range(10):
+        assert series.append(START + i, float(i))
+    assert not series.append(START + 5, 99.0)  # опоздавший тик
+    assert len(series) == 10
+
+
+def test_store_scan_across_sealed_blocks():
+    store = TickStore(block_size=8, retention_hours=0)
+    for i in range(30):
+        store.add("BTC-PERPETUAL", START + i * 10, 100.0 + i)
+    points = store.scan("BTC-PERPETUAL", START + 55, START + 205)
+    assert points == [(START + i * 10, 100.0 + i) for i in range(6, 21)]
+    assert store.stats()["points"] == 30